@@ -1,8 +1,16 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 from utils.ai_service import AIService
 from utils.pdf_processor import PDFProcessor
+from utils.embeddings import get_query_batcher
+from utils.corpus_manager import CorpusManager
+from utils.chunker import assemble_context
+from utils.metrics import (finish_request_timing, registry, server_timing_header, service_collector,
+                           start_request_timing)
+from config import Config
 import os
+import json
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -11,9 +19,44 @@ load_dotenv()
 app = Flask(__name__)
 CORS(app)
 
-# Initialize services
-ai_service = AIService()
+# Initialize services (the embedding model itself is loaded lazily on first use)
 pdf_processor = PDFProcessor()
+ai_service = AIService(pdf_processor)
+
+# Picks up added or replaced textbook PDFs without a restart
+corpus_manager = CorpusManager(pdf_processor, Config.CORPUS_POLL_INTERVAL, on_reload=ai_service.invalidate_textbook)
+
+# Cache, embedding batch and LLM token figures are read from the services on each scrape
+registry.register_collector(service_collector(ai_service, pdf_processor, get_query_batcher))
+
+@app.before_request
+def start_corpus_manager():
+    """Start the textbook watcher in each worker process on its first request"""
+    corpus_manager.ensure_started()
+
+@app.before_request
+def start_timing():
+    """Collect per-stage timings for this request"""
+    g.request_started = time.perf_counter()
+    start_request_timing()
+
+@app.after_request
+def record_timing(response):
+    """Record request latency and optionally report the stage breakdown to the client"""
+    started = g.pop('request_started', None)
+    timings = finish_request_timing()
+    if started is None:
+        return response
+    
+    # Streamed responses are measured until the headers go out, not to the last token
+    elapsed = time.perf_counter() - started
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    registry.request_seconds.observe(elapsed, endpoint)
+    registry.requests_total.inc(1, endpoint, str(response.status_code))
+    
+    if Config.TIMING_HEADER:
+        response.headers['Server-Timing'] = server_timing_header(timings, elapsed)
+    return response
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -23,6 +66,11 @@ def health_check():
         "message": "Samacheer AI Learning Backend is running"
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics for this worker process"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """Main chat endpoint for homework help"""
@@ -50,6 +98,119 @@ def chat():
             "message": f"Error processing request: {str(e)}"
         }), 500
 
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Answer cache hit/miss counts"""
+    if ai_service.answer_cache is None:
+        return jsonify({"success": True, "enabled": False})
+    
+    return jsonify({
+        "success": True,
+        "enabled": True,
+        **ai_service.answer_cache.stats()
+    })
+
+@app.route('/api/llm/stats', methods=['GET'])
+def llm_stats():
+    """LLM backends per route plus call, retry, rate limit and token counters"""
+    return jsonify({
+        "success": True,
+        "backends": {route: backend.name for route, backend in ai_service.backends.items()},
+        "chat_fallback": ai_service.chat_fallback.name if ai_service.chat_fallback else None,
+        **ai_service.llm_stats.as_dict()
+    })
+
+@app.route('/api/corpus/stats', methods=['GET'])
+def corpus_stats():
+    """Textbook hot-reload status, content/index cache memory use and shared cold loads"""
+    return jsonify({
+        "success": True,
+        **corpus_manager.stats(),
+        **pdf_processor.cache_stats(),
+        "single_flight": pdf_processor.single_flight.stats()
+    })
+
+@app.route('/api/embeddings/stats', methods=['GET'])
+def embedding_stats():
+    """Query embedding batch statistics"""
+    batcher = get_query_batcher()
+    if batcher is None:
+        return jsonify({"success": True, "enabled": False})
+    
+    return jsonify({
+        "success": True,
+        "enabled": True,
+        **batcher.stats()
+    })
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Streaming chat endpoint: answer tokens as Server-Sent Events"""
+    data = request.get_json(silent=True)
+    
+    if not data or 'message' not in data:
+        return jsonify({
+            "success": False,
+            "message": "Message is required"
+        }), 400
+    
+    question = data['message']
+    subject = data.get('subject', 'social')
+    class_level = data.get('class', '10')
+    
+    def generate():
+        for event in ai_service.stream_answer(question, subject, class_level):
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+@app.route('/api/chat/batch', methods=['POST'])
+def chat_batch():
+    """Batch chat endpoint for worksheets: each answer as a Server-Sent Event when it is ready"""
+    data = request.get_json(silent=True)
+    questions = data.get('questions') if isinstance(data, dict) else None
+    
+    if (not isinstance(questions, list) or not questions
+            or not all(isinstance(question, str) and question.strip() for question in questions)):
+        return jsonify({
+            "success": False,
+            "message": "A non-empty list of questions is required"
+        }), 400
+    
+    if len(questions) > Config.CHAT_BATCH_MAX_QUESTIONS:
+        return jsonify({
+            "success": False,
+            "message": f"At most {Config.CHAT_BATCH_MAX_QUESTIONS} questions can be sent in one batch"
+        }), 400
+    
+    subject = data.get('subject', 'social')
+    class_level = data.get('class', '10')
+    
+    def generate():
+        answered = 0
+        # Results arrive in completion order; each carries its index in the request
+        for result in ai_service.answer_batch(questions, subject, class_level):
+            answered += result["success"]
+            yield f"event: result\ndata: {json.dumps(result)}\n\n"
+        summary = {"success": True, "count": len(questions), "answered": answered}
+        yield f"event: done\ndata: {json.dumps(summary)}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 @app.route('/api/textbook/structure', methods=['GET'])
 def get_textbook_structure():
     """Get textbook chapter structure"""
@@ -82,7 +243,14 @@ def search_textbook():
         subject = data.get('subject', 'social')
         class_level = data.get('class', '10')
         
-        content = pdf_processor.search_content(query, subject, class_level)
+        # subject "all", or lists of subjects/classes, search every matching book in parallel
+        if subject == 'all' or 'subjects' in data or 'classes' in data:
+            result = search_books(query, data)
+            return jsonify(result), 200 if result["success"] else 400
+        
+        content = pdf_processor.search_content(query, subject, class_level,
+                                               top_k=data.get('top_k'), threshold=data.get('threshold'),
+                                               mode=data.get('mode'))
         
         return jsonify({
             "success": True,
@@ -97,6 +265,41 @@ def search_textbook():
             "message": f"Error searching textbook: {str(e)}"
         }), 500
 
+def book_filter(value):
+    """A subjects or classes filter as a list of strings, or None if it is malformed"""
+    # A single subject or class is accepted on its own, e.g. "classes": "10"
+    if not isinstance(value, list):
+        value = [value]
+    if not all(isinstance(item, (str, int)) and not isinstance(item, bool) for item in value):
+        return None
+    return [str(item) for item in value]
+
+def search_books(query, data):
+    """Cross-book search response: one merged ranking with each result's book and pages"""
+    filters = {}
+    for key in ('subjects', 'classes'):
+        if data.get(key) is None:
+            continue
+        filters[key] = book_filter(data[key])
+        if filters[key] is None:
+            return {
+                "success": False,
+                "message": f"{key} must be a string or number, or a list of them"
+            }
+    
+    shards = pdf_processor.available_shards(filters.get('subjects'), filters.get('classes'))
+    results = pdf_processor.search_shards(query, shards, top_k=data.get('top_k'),
+                                          threshold=data.get('threshold'), mode=data.get('mode'))
+    
+    return {
+        "success": True,
+        "content": assemble_context(results, Config.CONTEXT_TOKEN_BUDGET),
+        "results": results,
+        "query": query,
+        "subject": "all",
+        "books": [f"{subject}_{class_level}" for subject, class_level in shards]
+    }
+
 @app.route('/api/quiz/generate', methods=['POST'])
 def generate_quiz():
     """Generate quiz questions from textbook content"""
@@ -106,6 +309,7 @@ def generate_quiz():
         subject = data.get('subject', 'social')
         topic = data.get('topic', '')
         count = data.get('count', 5)
+        class_level = data.get('class', '10')
         
         if not topic:
             return jsonify({
@@ -113,7 +317,18 @@ def generate_quiz():
                 "message": "Topic is required for quiz generation"
             }), 400
         
-        result = ai_service.generate_quiz_questions(subject, topic, count)
+        try:
+            count = int(count)
+        except (TypeError, ValueError):
+            count = 0
+        
+        if not 1 <= count <= Config.QUIZ_MAX_QUESTIONS:
+            return jsonify({
+                "success": False,
+                "message": f"Count must be between 1 and {Config.QUIZ_MAX_QUESTIONS}"
+            }), 400
+        
+        result = ai_service.generate_quiz_questions(subject, topic, count, class_level)
         return jsonify(result)
         
     except Exception as e:
@@ -130,6 +345,7 @@ def extract_content():
         
         subject = data.get('subject', 'social')
         topic = data.get('topic', '')
+        class_level = data.get('class', '10')
         
         if not topic:
             return jsonify({
@@ -137,7 +353,7 @@ def extract_content():
                 "message": "Topic is required"
             }), 400
         
-        content = pdf_processor.get_topic_content(subject, topic)
+        content = pdf_processor.get_topic_content(subject, topic, class_level)
         
         return jsonify({
             "success": True,
@@ -0,0 +1,162 @@
+import json
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.wsgi import WSGIMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+from app import app as flask_app, ai_service, corpus_manager, search_books
+from utils.async_ai_service import AsyncAIService
+
+# Async serving mode: run with
+#   gunicorn -k uvicorn.workers.UvicornWorker -c gunicorn.conf.py asgi:app
+# The chat and search routes are served natively on the event loop; every other
+# route falls through to the Flask app.
+async_ai_service = AsyncAIService(ai_service)
+
+
+class ReleasingStreamingResponse(StreamingResponse):
+    """Streaming response that frees its admission slot however it ends.
+
+    Releasing in the body generator's finally misses responses whose body never
+    starts, e.g. when the client disconnects before the first event.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            async_ai_service.release()
+
+
+def overloaded() -> JSONResponse:
+    return JSONResponse({
+        "success": False,
+        "message": "Server is busy, please retry shortly"
+    }, status_code=503, headers={"Retry-After": "1"})
+
+
+async def read_json(request: Request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+async def health_check(request: Request) -> JSONResponse:
+    """Health check endpoint"""
+    return JSONResponse({
+        "status": "healthy",
+        "message": "Samacheer AI Learning Backend is running",
+        "inflight": async_ai_service.inflight
+    })
+
+
+async def chat(request: Request) -> JSONResponse:
+    """Main chat endpoint for homework help"""
+    data = await read_json(request)
+
+    if not data or 'message' not in data:
+        return JSONResponse({
+            "success": False,
+            "message": "Message is required"
+        }, status_code=400)
+
+    if not async_ai_service.try_acquire():
+        return overloaded()
+
+    try:
+        result = await async_ai_service.generate_answer(
+            data['message'], data.get('subject', 'social'), data.get('class', '10')
+        )
+        return JSONResponse(result)
+    except Exception as e:
+        return JSONResponse({
+            "success": False,
+            "message": f"Error processing request: {str(e)}"
+        }, status_code=500)
+    finally:
+        async_ai_service.release()
+
+
+async def chat_stream(request: Request):
+    """Streaming chat endpoint: answer tokens as Server-Sent Events"""
+    data = await read_json(request)
+
+    if not data or 'message' not in data:
+        return JSONResponse({
+            "success": False,
+            "message": "Message is required"
+        }, status_code=400)
+
+    if not async_ai_service.try_acquire():
+        return overloaded()
+
+    async def generate():
+        async for event in async_ai_service.stream_answer(
+            data['message'], data.get('subject', 'social'), data.get('class', '10')
+        ):
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return ReleasingStreamingResponse(generate(), media_type='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+
+async def search_textbook(request: Request) -> JSONResponse:
+    """Search textbook content"""
+    data = await read_json(request)
+
+    if not data or 'query' not in data:
+        return JSONResponse({
+            "success": False,
+            "message": "Search query is required"
+        }, status_code=400)
+
+    if not async_ai_service.try_acquire():
+        return overloaded()
+
+    try:
+        query = data['query']
+        subject = data.get('subject', 'social')
+        if subject == 'all' or 'subjects' in data or 'classes' in data:
+            result = await async_ai_service.run_cpu(search_books, query, data)
+            return JSONResponse(result, status_code=200 if result["success"] else 400)
+
+        content = await async_ai_service.search_content(query, subject, data.get('class', '10'),
+                                                        top_k=data.get('top_k'), threshold=data.get('threshold'),
+                                                        mode=data.get('mode'))
+
+        return JSONResponse({
+            "success": True,
+            "content": content,
+            "query": query,
+            "subject": subject
+        })
+    except Exception as e:
+        return JSONResponse({
+            "success": False,
+            "message": f"Error searching textbook: {str(e)}"
+        }, status_code=500)
+    finally:
+        async_ai_service.release()
+
+
+app = Starlette(
+    routes=[
+        Route('/health', health_check, methods=['GET']),
+        Route('/api/chat', chat, methods=['POST']),
+        Route('/api/chat/stream', chat_stream, methods=['POST']),
+        Route('/api/textbook/search', search_textbook, methods=['POST']),
+        Mount('/', app=WSGIMiddleware(flask_app)),
+    ],
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])
+    ],
+    # The async routes bypass Flask's before_request hook, so start the textbook watcher here
+    on_startup=[corpus_manager.ensure_started]
+)
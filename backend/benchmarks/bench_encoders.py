@@ -0,0 +1,189 @@
+"""Benchmark: embedding backends (torch, ONNX, ONNX int8) for startup, memory, latency and retrieval parity.
+
+Run from the backend directory after exporting the ONNX graphs:
+
+    python -m utils.onnx_encoder
+    python -m benchmarks.bench_encoders [--backends torch onnx onnx-int8] [--top-k 5] [--output encoders.json]
+
+Chunks come from the bundled textbook, or a synthetic one when it cannot be read.
+Each backend runs in a fresh process so its import time and RSS are its own.
+Parity compares every backend against torch: the cosine between the two
+embeddings of each chunk, and how many of torch's top-k chunks per question the
+backend also ranks in its top-k.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.bench_pipeline import BUNDLED_PDF, git_revision, pdf_problem, percentile, rss_mb
+from benchmarks.synthetic import synthetic_pages, synthetic_questions, write_pdf
+
+# Backend name -> environment read by Config in the benchmark process
+BACKENDS = {
+    "torch": {"EMBEDDING_BACKEND": "torch", "EMBEDDING_QUANTIZE": "none"},
+    "onnx": {"EMBEDDING_BACKEND": "onnx", "EMBEDDING_QUANTIZE": "none"},
+    "onnx-int8": {"EMBEDDING_BACKEND": "onnx", "EMBEDDING_QUANTIZE": "int8"}
+}
+
+
+def load_chunks(pdf_path: str, pages: int, seed: int) -> List[str]:
+    """Textbook chunks exactly as the index would embed them"""
+    from utils.corpus import TextbookArtifact
+    from utils.pdf_processor import PDFProcessor
+
+    work_dir = tempfile.mkdtemp(prefix='bench-encoders-')
+    try:
+        if pdf_problem(pdf_path) is not None:
+            pdf_path = os.path.join(work_dir, 'synthetic.pdf')
+            write_pdf(pdf_path, synthetic_pages(pages, seed=seed))
+        return TextbookArtifact.build(PDFProcessor(), pdf_path).chunks()[0]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_backend(backend: str, chunks: List[str], questions: List[str], options: Dict[str, Any],
+                output_dir: str) -> Dict[str, Any]:
+    """Measure one backend; runs in its own process"""
+    os.environ.update(BACKENDS[backend])
+    result = {"backend": backend}
+    baseline_rss = rss_mb()
+
+    # Startup is what a worker pays before its first query: imports plus weights
+    started = time.perf_counter()
+    from utils.embeddings import get_embedding_model
+    try:
+        model = get_embedding_model()
+    except (ImportError, OSError, ValueError) as e:
+        return dict(result, skipped=str(e))
+    result["load_sec"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    model.encode(["first query"], show_progress_bar=False)
+    result["first_encode_ms"] = (time.perf_counter() - started) * 1000
+    result["loaded_rss_mb"] = rss_mb() - baseline_rss
+
+    # Single queries, as the request path encodes them without batching
+    timings = []
+    for question in questions:
+        started = time.perf_counter()
+        model.encode([question], show_progress_bar=False)
+        timings.append((time.perf_counter() - started) * 1000)
+    result.update({"query_p50_ms": percentile(timings, 50), "query_p99_ms": percentile(timings, 99)})
+
+    started = time.perf_counter()
+    chunk_embeddings = model.encode(chunks, batch_size=options["batch_size"], show_progress_bar=False)
+    result["chunks_per_sec"] = len(chunks) / (time.perf_counter() - started)
+    result["peak_rss_mb"] = rss_mb() - baseline_rss
+
+    np.save(os.path.join(output_dir, f"{backend}.chunks.npy"), normalize(chunk_embeddings))
+    np.save(os.path.join(output_dir, f"{backend}.questions.npy"),
+            normalize(model.encode(questions, show_progress_bar=False)))
+    return result
+
+
+def normalize(embeddings: Any) -> np.ndarray:
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    return embeddings / np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+
+
+def parity(reference_dir: str, backend: str, top_k: int) -> Dict[str, float]:
+    """Agreement of a backend's embeddings and rankings with the torch reference"""
+    load = lambda name, kind: np.load(os.path.join(reference_dir, f"{name}.{kind}.npy"))
+    ref_chunks, ref_questions = load('torch', 'chunks'), load('torch', 'questions')
+    chunks, questions = load(backend, 'chunks'), load(backend, 'questions')
+
+    cosines = (ref_chunks * chunks).sum(axis=1)
+    ref_top = np.argsort(-(ref_questions @ ref_chunks.T), axis=1)[:, :top_k]
+    top = np.argsort(-(questions @ chunks.T), axis=1)[:, :top_k]
+    overlap = [len(set(a) & set(b)) / top_k for a, b in zip(ref_top, top)]
+
+    return {
+        "chunk_cosine_mean": float(cosines.mean()),
+        "chunk_cosine_min": float(cosines.min()),
+        f"top{top_k}_overlap": float(np.mean(overlap)),
+        "top1_agreement": float(np.mean(ref_top[:, 0] == top[:, 0]))
+    }
+
+
+def print_results(results: List[Dict[str, Any]], top_k: int) -> None:
+    # (result key, header, width, decimals)
+    columns = [("load_sec", "load s", 7, 2), ("first_encode_ms", "1st ms", 8, 1), ("loaded_rss_mb", "load MB", 8, 1),
+               ("peak_rss_mb", "peak MB", 8, 1), ("query_p50_ms", "q p50", 7, 2), ("query_p99_ms", "q p99", 7, 2),
+               ("chunks_per_sec", "chunks/s", 9, 1), ("chunk_cosine_mean", "cos mean", 9, 4),
+               (f"top{top_k}_overlap", f"top{top_k} ovl", 9, 3), ("top1_agreement", "top1", 6, 3)]
+    print(f"{'backend':<10} " + ' '.join(f"{header:>{width}}" for _, header, width, _ in columns))
+
+    for result in results:
+        if "skipped" in result:
+            print(f"{result['backend']:<10} skipped: {result['skipped']}")
+            continue
+        print(f"{result['backend']:<10} " + ' '.join(
+            f"{result[key]:>{width}.{decimals}f}" if key in result else f"{'-':>{width}}"
+            for key, _, width, decimals in columns))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', nargs='+', choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument('--pdf', default=BUNDLED_PDF, help="textbook whose chunks are embedded")
+    parser.add_argument('--pages', type=int, default=40, help="synthetic pages when --pdf cannot be read")
+    parser.add_argument('--questions', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=32, help="chunks per encode call")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write machine-readable results to this JSON file")
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.pdf, args.pages, args.seed)
+    questions = synthetic_questions(args.questions, args.seed)
+    print(f"{len(chunks)} chunks, {len(questions)} questions")
+
+    options = {"batch_size": args.batch_size}
+    embeddings_dir = tempfile.mkdtemp(prefix='bench-encoders-')
+    results = []
+    try:
+        # A fresh process per backend: torch and onnxruntime imports are part of the cost
+        context = get_context('spawn')
+        for backend in args.backends:
+            with context.Pool(1) as pool:
+                results.append(pool.apply(run_backend, (backend, chunks, questions, options, embeddings_dir)))
+
+        measured = {result["backend"] for result in results if "skipped" not in result}
+        if 'torch' in measured:
+            for result in results:
+                if result["backend"] in measured and result["backend"] != 'torch':
+                    result.update(parity(embeddings_dir, result["backend"], args.top_k))
+        else:
+            print("torch backend not measured; skipping parity")
+    finally:
+        shutil.rmtree(embeddings_dir, ignore_errors=True)
+
+    print_results(results, args.top_k)
+
+    if args.output:
+        report = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "chunks": len(chunks),
+            "options": dict(options, questions=args.questions, top_k=args.top_k, seed=args.seed),
+            "results": results
+        }
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,323 @@
+"""Benchmark: PDF ingestion, retrieval and topic lookup on the bundled textbook and scaled synthetic corpora.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_pipeline [--scales 1 10 100] [--queries 200] [--output results.json]
+    python -m benchmarks.bench_pipeline --compare before.json after.json
+
+Each corpus runs in a fresh process so peak RSS is per corpus. The LLM is
+replaced by a stub; pass --embedding hashing to replace the embedding model
+too and measure only the code around it.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+# Must be set before config is imported: no OpenAI key needed, no on-disk caches
+os.environ.setdefault('LLM_BACKEND', 'extractive')
+os.environ.setdefault('ANSWER_CACHE_BACKEND', 'none')
+os.environ.setdefault('QUIZ_BANK_PATH', '')
+os.environ.setdefault('EMBED_BATCH_MAX_SIZE', '1')
+
+from benchmarks.synthetic import VOCABULARY, synthetic_pages, synthetic_questions, write_pdf  # noqa: E402
+
+BUNDLED_PDF = os.path.join(os.path.dirname(__file__), '..', '..', 'public', 'textbooks',
+                           'tn-class-10-social-science-official.pdf')
+
+# Pages in the unscaled synthetic corpus when the bundled PDF cannot be read
+DEFAULT_BASE_PAGES = 40
+
+# Metrics compared by --compare, and whether a larger value is better
+COMPARED_METRICS = {
+    "extract_pages_per_sec": True,
+    "ingest_pages_per_sec": True,
+    "ingest_peak_rss_mb": False,
+    "structure_ms": False,
+    "index_build_sec": False,
+    "search_p50_ms": False,
+    "search_p99_ms": False,
+    "search_qps": True,
+    "topic_p50_ms": False,
+    "topic_p99_ms": False,
+    "chat_p50_ms": False,
+    "chat_p99_ms": False,
+    "peak_rss_mb": False
+}
+
+
+class HashingEncoder:
+    """Stand-in embedding model: hashed bag of words, a few microseconds per text"""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def encode(self, texts: List[str], **kwargs: Any) -> np.ndarray:
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                embeddings[row, zlib.crc32(word.encode('utf-8')) % self.dim] += 1.0
+        return embeddings
+
+
+class StubLLM:
+    """Chat backend that answers instantly, or after a fixed delay, without any network call"""
+
+    name = 'stub'
+    generative = True
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def complete(self, messages: List[Dict[str, str]], **params: Any) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        return "**Answer from Samacheer Kalvi Textbook:**\nA stub answer.\n\n**Textbook Reference:**\n[Chapter 1, Page 1]"
+
+    def stream(self, messages: List[Dict[str, str]], **params: Any):
+        yield self.complete(messages, **params)
+
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def rss_mb() -> float:
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (2 ** 20 if sys.platform == 'darwin' else 1024)
+
+
+def latencies_ms(func: Callable[[str], Any], inputs: List[str]) -> List[float]:
+    timings = []
+    for item in inputs:
+        started = time.perf_counter()
+        func(item)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def pdf_problem(path: str) -> Optional[str]:
+    """Why a file cannot be benchmarked as a PDF, or None if it can"""
+    if not os.path.exists(path):
+        return "file not found"
+    with open(path, 'rb') as file:
+        header = file.read(1024)
+    if not header.startswith(b'%PDF'):
+        kind = "HTML document" if b'<html' in header.lower() or b'<!doctype' in header.lower() else "unknown format"
+        return f"not a PDF ({kind})"
+    return None
+
+
+def run_corpus(corpus: Dict[str, Any], options: Dict[str, Any]) -> Dict[str, Any]:
+    """Benchmark one corpus; runs in its own process"""
+    from utils import embeddings
+    from utils.ai_service import AIService
+    from utils.corpus import TextbookArtifact
+    from utils.pdf_processor import PDFProcessor
+
+    work_dir = tempfile.mkdtemp(prefix='bench-')
+    try:
+        processor = PDFProcessor()
+        processor.textbook_dir = work_dir
+        processor.index_dir = os.path.join(work_dir, '.index')
+        if options["embedding"] == 'hashing':
+            processor.model_name = 'bench-hashing'
+            embeddings._models[processor.model_name] = HashingEncoder()
+
+        pdf_path = os.path.join(work_dir, 'tn-class-10-social-science.pdf')
+        if corpus["source"] == 'synthetic':
+            write_pdf(pdf_path, synthetic_pages(corpus["pages"], seed=options["seed"]))
+        else:
+            shutil.copyfile(corpus["source"], pdf_path)
+
+        # Model weights, imports and the PDF bytes are not what we are measuring
+        processor.model.encode(["warm up"])
+        baseline_rss = rss_mb()
+        result = {"corpus": corpus["name"], "pdf_bytes": os.path.getsize(pdf_path)}
+
+        # Full ingest as `python -m utils.ingest` does it, first so its peak memory is its own
+        started = time.perf_counter()
+        TextbookArtifact.compile(processor, pdf_path, processor.index_dir, 'social_10')
+        ingest_seconds = time.perf_counter() - started
+        ingest_rss = rss_mb()
+
+        started = time.perf_counter()
+        pages = processor.extract_pages(pdf_path)
+        extract_seconds = time.perf_counter() - started
+        full_text = processor._join_pages(pages)
+
+        started = time.perf_counter()
+        structure = processor._structure_content(full_text, 'social')
+        structure_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        index = processor.get_chunk_index('social', '10')
+        index_seconds = time.perf_counter() - started
+
+        result.update({
+            "pages": len(pages),
+            "text_chars": len(full_text),
+            "chapters": len(structure["chapters"]),
+            "chunks": len(index),
+            "extract_pages_per_sec": len(pages) / extract_seconds,
+            "structure_ms": structure_seconds * 1000,
+            "ingest_pages_per_sec": len(pages) / ingest_seconds,
+            "ingest_peak_rss_mb": ingest_rss - baseline_rss,
+            "index_build_sec": index_seconds
+        })
+
+        queries = synthetic_questions(options["queries"], options["seed"])
+        search = lambda query: processor.search_content(query, 'social', '10')
+        for query in queries[:10]:
+            search(query)
+
+        timings = latencies_ms(search, queries)
+        result.update({"search_p50_ms": percentile(timings, 50), "search_p99_ms": percentile(timings, 99)})
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            list(pool.map(search, queries))
+        result["search_qps"] = len(queries) / (time.perf_counter() - started)
+
+        # Headings resolve through the dict; free-text topics fall back to substring search
+        topic_index = processor.load_textbook_content('social', '10')["content"]["topic_index"]
+        rng = random.Random(options["seed"])
+        headings = list(topic_index.headings) or ["war"]
+        topics = [rng.choice(headings) if i % 2 else rng.choice(VOCABULARY) for i in range(options["queries"])]
+        timings = latencies_ms(lambda topic: processor.get_topic_content('social', topic, '10'), topics)
+        result.update({"topic_p50_ms": percentile(timings, 50), "topic_p99_ms": percentile(timings, 99)})
+
+        ai_service = AIService(processor)
+        ai_service.backends["chat"] = StubLLM(options["llm_latency"])
+        ai_service.chat_fallback = None
+        timings = latencies_ms(lambda query: ai_service.generate_answer(query, 'social', '10'), queries)
+        result.update({"chat_p50_ms": percentile(timings, 50), "chat_p99_ms": percentile(timings, 99)})
+
+        result.update({"baseline_rss_mb": baseline_rss, "peak_rss_mb": rss_mb()})
+        return result
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    # (result key, header, width, decimals)
+    columns = [("pages", "pages", 6, 0), ("chunks", "chunks", 7, 0), ("ingest_pages_per_sec", "ingest p/s", 10, 1),
+               ("index_build_sec", "index s", 8, 2), ("search_p50_ms", "srch p50", 8, 2),
+               ("search_p99_ms", "srch p99", 8, 2), ("search_qps", "qps", 8, 1), ("topic_p99_ms", "topic p99", 9, 3),
+               ("chat_p99_ms", "chat p99", 8, 2), ("peak_rss_mb", "peak MB", 8, 1)]
+    print(f"{'corpus':<14} " + ' '.join(f"{header:>{width}}" for _, header, width, _ in columns))
+
+    for result in results:
+        if "skipped" in result:
+            print(f"{result['corpus']:<14} skipped: {result['skipped']}")
+            continue
+        print(f"{result['corpus']:<14} " + ' '.join(f"{result[key]:>{width}.{decimals}f}"
+                                                    for key, _, width, decimals in columns))
+
+
+def compare(before_path: str, after_path: str) -> None:
+    """Print per-metric changes between two result files"""
+    with open(before_path) as file:
+        before = {result["corpus"]: result for result in json.load(file)["results"]}
+    with open(after_path) as file:
+        after = {result["corpus"]: result for result in json.load(file)["results"]}
+
+    print(f"{'corpus':<14} {'metric':<24} {'before':>12} {'after':>12} {'change':>9}")
+    for name in after:
+        if name not in before:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = before[name].get(metric), after[name].get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old * 100 if old else 0.0
+            worse = change < 0 if higher_is_better else change > 0
+            flag = ' !' if worse and abs(change) >= 10 else ''
+            print(f"{name:<14} {metric:<24} {old:>12.3f} {new:>12.3f} {change:>+8.1f}%{flag}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pdf', default=BUNDLED_PDF, help="real textbook to benchmark and to size the synthetic corpora")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--base-pages', type=int, default=DEFAULT_BASE_PAGES,
+                        help="pages at scale 1 when --pdf cannot be read")
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8, help="threads for the QPS measurement")
+    parser.add_argument('--embedding', choices=('model', 'hashing'), default='model',
+                        help="real sentence-transformers model or a hashing stand-in")
+    parser.add_argument('--llm-latency', type=float, default=0.0, help="seconds the stub LLM sleeps per answer")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write machine-readable results to this JSON file")
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help="diff two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    options = {key: getattr(args, key) for key in ('queries', 'concurrency', 'embedding', 'llm_latency', 'seed')}
+    corpora = []
+    results = []
+
+    base_pages = args.base_pages
+    problem = pdf_problem(args.pdf)
+    if problem is None:
+        corpora.append({"name": "bundled", "source": os.path.abspath(args.pdf)})
+        from PyPDF2 import PdfReader
+        base_pages = len(PdfReader(args.pdf).pages)
+    else:
+        print(f"Skipping {args.pdf}: {problem}; synthetic corpora use {base_pages} pages at scale 1")
+        results.append({"corpus": "bundled", "skipped": problem})
+
+    for scale in args.scales:
+        corpora.append({"name": f"synthetic-{scale}x", "source": "synthetic", "pages": base_pages * scale})
+
+    # A fresh process per corpus keeps peak RSS and warm caches from leaking between runs
+    context = get_context('spawn')
+    for corpus in corpora:
+        with context.Pool(1) as pool:
+            results.append(pool.apply(run_corpus, (corpus, options)))
+
+    print_results(results)
+
+    if args.output:
+        report = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "options": options,
+            "results": results
+        }
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
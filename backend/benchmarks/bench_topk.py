@@ -0,0 +1,74 @@
+"""Microbenchmark: top-k retrieval engine vs. the previous cosine_similarity + argsort path.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_topk [--dim 384] [--queries 200]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from utils.chunk_index import normalize_embeddings
+from utils.retrieval import DenseRetriever
+
+try:
+    from sklearn.metrics.pairwise import cosine_similarity
+except ImportError:
+    def cosine_similarity(a, b):
+        # Same work sklearn does: normalize both sides on every call, then multiply
+        return normalize_embeddings(a) @ normalize_embeddings(b).T
+
+
+def previous_search(query: np.ndarray, chunk_embeddings: np.ndarray, k: int, threshold: float):
+    """The original search_content scoring: re-normalize everything, then sort every score"""
+    similarities = cosine_similarity(query[None, :], chunk_embeddings)[0]
+    top_indices = np.argsort(similarities)[-k:][::-1]
+    return [int(idx) for idx in top_indices if similarities[idx] > threshold]
+
+
+def time_per_query(func, queries: np.ndarray) -> float:
+    started = time.perf_counter()
+    for query in queries:
+        func(query)
+    return (time.perf_counter() - started) / len(queries) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=3)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 5000, 50000])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'chunks':>8} {'path':<22} {'us/query':>10} {'matrix MB':>10} {'top-k agree':>12}")
+
+    for size in args.sizes:
+        raw = rng.standard_normal((size, args.dim)).astype(np.float32)
+        embeddings = normalize_embeddings(raw)
+        queries = normalize_embeddings(rng.standard_normal((args.queries, args.dim)))
+        # Threshold 0 so random data still returns k results to compare
+        reference = [previous_search(q, raw, args.k, 0.0) for q in queries]
+
+        baseline = time_per_query(lambda q: previous_search(q, raw, args.k, 0.0), queries)
+        print(f"{size:>8} {'cosine_similarity+sort':<22} {baseline:>10.1f} {raw.nbytes / 2**20:>10.2f} {'-':>12}")
+
+        for dtype in ('float32', 'float16', 'int8'):
+            retriever = DenseRetriever(embeddings, dtype)
+            results = [[idx for idx, _ in retriever.search(q, args.k, 0.0)[0]] for q in queries]
+            agreement = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(results, reference)])
+            elapsed = time_per_query(lambda q: retriever.search(q, args.k, 0.0), queries)
+            print(f"{size:>8} {'dot+argpartition ' + dtype:<22} {elapsed:>10.1f} "
+                  f"{retriever.nbytes / 2**20:>10.2f} {agreement:>12.3f}")
+
+        retriever = DenseRetriever(embeddings, 'float32')
+        started = time.perf_counter()
+        retriever.search(queries, args.k, 0.0)
+        batched = (time.perf_counter() - started) / len(queries) * 1e6
+        print(f"{size:>8} {'batched float32':<22} {batched:>10.1f} {retriever.nbytes / 2**20:>10.2f} {'-':>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,313 @@
+"""Load generator: replays a mix of chat, search, quiz and extract requests at a target rate.
+
+Run from the backend directory against a running server:
+
+    python -m benchmarks.load_test --url http://127.0.0.1:5000 --rps 20 --duration 60 --output load.json
+
+or let it start the server once per worker configuration (pair with benchmarks.stub_openai):
+
+    OPENAI_BASE_URL=http://127.0.0.1:8090/v1 OPENAI_API_KEY=stub \\
+        python -m benchmarks.load_test --server-cmd "gunicorn -c gunicorn.conf.py app:app" \\
+        --configs WEB_CONCURRENCY=1 WEB_CONCURRENCY=4 --rps 20 --duration 60
+
+Arrivals are open loop: requests are sent on schedule whether or not earlier ones
+have finished, and latency is measured from the scheduled send time, so a slow
+server shows up as latency rather than as a lower request rate.
+"""
+import argparse
+import json
+import os
+import random
+import shlex
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import requests
+
+from benchmarks.synthetic import VOCABULARY, synthetic_questions
+
+DEFAULT_MIX = "chat=0.5,search=0.3,quiz=0.1,extract=0.1"
+
+# Endpoint name -> path; every endpoint takes a JSON POST
+ENDPOINTS = {
+    "chat": "/api/chat",
+    "search": "/api/textbook/search",
+    "quiz": "/api/quiz/generate",
+    "extract": "/api/content/extract"
+}
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint in mix: {name} (expected {', '.join(ENDPOINTS)})")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def parse_config(spec: str) -> Dict[str, str]:
+    """"WEB_CONCURRENCY=4,ASYNC_LLM_CONCURRENCY=32" -> environment overrides"""
+    return dict(part.split('=', 1) for part in spec.split(',') if part)
+
+
+class Workload:
+    """Request bodies for each endpoint, drawn from questions and the book's real topics"""
+
+    def __init__(self, subject: str, class_level: str, topics: List[str], seed: int):
+        self.subject = subject
+        self.class_level = class_level
+        self.questions = synthetic_questions(500, seed)
+        self.topics = topics or VOCABULARY
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def body(self, endpoint: str) -> Dict[str, Any]:
+        with self._lock:
+            question = self._rng.choice(self.questions)
+            topic = self._rng.choice(self.topics)
+        common = {"subject": self.subject, "class": self.class_level}
+        if endpoint == "chat":
+            return dict(common, message=question)
+        if endpoint == "search":
+            return dict(common, query=question)
+        if endpoint == "quiz":
+            return dict(common, topic=topic, count=5)
+        return dict(common, topic=topic)
+
+
+def fetch_topics(url: str, subject: str, class_level: str) -> List[str]:
+    """Topic headings from the textbook structure, so quiz and extract hit real content"""
+    try:
+        structure = requests.get(f"{url}/api/textbook/structure", params={"subject": subject, "class": class_level},
+                                 timeout=120).json()
+    except (requests.RequestException, ValueError) as e:
+        print(f"Error fetching textbook structure: {str(e)}")
+        return []
+    return [topic for chapter in structure.get("chapters", []) for topic in chapter.get("topics", [])]
+
+
+class Recorder:
+    """Latency samples and failures per endpoint"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {name: [] for name in ENDPOINTS}
+        self.errors: Dict[str, Dict[str, int]] = {name: {} for name in ENDPOINTS}
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, latency: float, error: Optional[str]) -> None:
+        with self._lock:
+            self.latencies[endpoint].append(latency)
+            if error is not None:
+                self.errors[endpoint][error] = self.errors[endpoint].get(error, 0) + 1
+
+    def summary(self, duration: float) -> Dict[str, Any]:
+        endpoints = {}
+        for name, latencies in self.latencies.items():
+            if not latencies:
+                continue
+            errors = sum(self.errors[name].values())
+            endpoints[name] = _latency_summary(latencies, errors, duration)
+            endpoints[name]["errors_by_kind"] = self.errors[name]
+
+        everything = [latency for latencies in self.latencies.values() for latency in latencies]
+        total_errors = sum(sum(errors.values()) for errors in self.errors.values())
+        overall = _latency_summary(everything, total_errors, duration) if everything else {}
+        overall["dropped"] = self.dropped
+        return {"endpoints": endpoints, "overall": overall}
+
+
+def _latency_summary(latencies: List[float], errors: int, duration: float) -> Dict[str, Any]:
+    values = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / duration,
+        "errors": errors,
+        "error_rate": errors / len(latencies),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p90_ms": float(np.percentile(values, 90)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "max_ms": float(values.max())
+    }
+
+
+def send(session_pool: threading.local, url: str, endpoint: str, body: Dict[str, Any],
+         timeout: float) -> Optional[str]:
+    """Send one request and classify the outcome; None means success"""
+    session = getattr(session_pool, 'session', None)
+    if session is None:
+        session = session_pool.session = requests.Session()
+
+    try:
+        response = session.post(url + ENDPOINTS[endpoint], json=body, timeout=timeout)
+    except requests.Timeout:
+        return "timeout"
+    except requests.RequestException:
+        return "connection"
+
+    if response.status_code >= 400:
+        return f"http_{response.status_code}"
+    try:
+        if response.json().get("success") is False:
+            return "failed"
+    except ValueError:
+        return "invalid_json"
+    return None
+
+
+def run_load(url: str, workload: Workload, mix: Dict[str, float], rps: float, duration: float, warmup: float,
+             max_inflight: int, timeout: float, poisson: bool, seed: int) -> Dict[str, Any]:
+    """Drive traffic for warmup + duration seconds, recording only after the warmup"""
+    rng = random.Random(seed)
+    names, weights = zip(*mix.items())
+    recorder = Recorder()
+    sessions = threading.local()
+    slots = threading.BoundedSemaphore(max_inflight)
+    pool = ThreadPoolExecutor(max_workers=max_inflight)
+
+    started = time.perf_counter()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+    next_send = started
+
+    def task(endpoint: str, scheduled: float) -> None:
+        try:
+            error = send(sessions, url, endpoint, workload.body(endpoint), timeout)
+            if scheduled >= measure_from:
+                recorder.record(endpoint, time.perf_counter() - scheduled, error)
+        finally:
+            slots.release()
+
+    while next_send < stop_at:
+        delay = next_send - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+        endpoint = rng.choices(names, weights)[0]
+        # Client-side saturation is reported, never silently turned into a lower rate
+        if slots.acquire(blocking=False):
+            pool.submit(task, endpoint, next_send)
+        elif next_send >= measure_from:
+            recorder.dropped += 1
+
+        next_send += rng.expovariate(rps) if poisson else 1.0 / rps
+
+    pool.shutdown(wait=True)
+    return recorder.summary(duration)
+
+
+def wait_until_healthy(url: str, timeout: float, process: subprocess.Popen) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            if requests.get(f"{url}/health", timeout=2).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def start_server(command: str, config: Dict[str, str]) -> subprocess.Popen:
+    env = dict(os.environ, **config)
+    return subprocess.Popen(shlex.split(command), env=env, cwd=os.path.join(os.path.dirname(__file__), '..'))
+
+
+def stop_server(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def print_run(label: str, summary: Dict[str, Any]) -> None:
+    print(f"\n{label}")
+    print(f"{'endpoint':<10} {'requests':>9} {'rps':>7} {'errors':>7} {'err %':>6} "
+          f"{'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    rows: List[Tuple[str, Dict[str, Any]]] = list(summary["endpoints"].items())
+    if summary["overall"].get("requests"):
+        rows.append(("overall", summary["overall"]))
+    for name, stats in rows:
+        print(f"{name:<10} {stats['requests']:>9} {stats['rps']:>7.1f} {stats['errors']:>7} "
+              f"{stats['error_rate'] * 100:>6.1f} {stats['p50_ms']:>9.1f} {stats['p90_ms']:>9.1f} "
+              f"{stats['p99_ms']:>9.1f} {stats['max_ms']:>9.1f}")
+    if summary["overall"]["dropped"]:
+        print(f"{summary['overall']['dropped']} requests not sent: --max-inflight reached")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--rps', type=float, default=10, help="target requests per second across all endpoints")
+    parser.add_argument('--duration', type=float, default=60, help="measured seconds per configuration")
+    parser.add_argument('--warmup', type=float, default=10, help="unmeasured seconds before each measurement")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"default {DEFAULT_MIX}")
+    parser.add_argument('--poisson', action='store_true', help="exponential inter-arrival times instead of fixed")
+    parser.add_argument('--max-inflight', type=int, default=256, help="client-side cap on concurrent requests")
+    parser.add_argument('--timeout', type=float, default=120, help="per-request timeout in seconds")
+    parser.add_argument('--subject', default='social')
+    parser.add_argument('--class', dest='class_level', default='10')
+    parser.add_argument('--server-cmd', help="start the server with this command for each configuration")
+    parser.add_argument('--configs', type=parse_config, nargs='+',
+                        help="environment overrides per run, e.g. WEB_CONCURRENCY=4 (needs --server-cmd)")
+    parser.add_argument('--startup-timeout', type=float, default=180)
+    parser.add_argument('--label', help="name for this run in the report when not using --configs")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write machine-readable results to this JSON file")
+    args = parser.parse_args()
+
+    if args.configs and not args.server_cmd:
+        parser.error("--configs requires --server-cmd")
+
+    configs = args.configs or [{}]
+    runs = []
+
+    for config in configs:
+        label = ','.join(f"{key}={value}" for key, value in config.items()) or args.label or args.url
+        process = None
+        if args.server_cmd:
+            process = start_server(args.server_cmd, config)
+            if not wait_until_healthy(args.url, args.startup_timeout, process):
+                print(f"Server for {label} did not become healthy; skipping")
+                stop_server(process)
+                runs.append({"label": label, "config": config, "skipped": "server did not start"})
+                continue
+
+        try:
+            workload = Workload(args.subject, args.class_level,
+                                fetch_topics(args.url, args.subject, args.class_level), args.seed)
+            summary = run_load(args.url, workload, args.mix, args.rps, args.duration, args.warmup,
+                               args.max_inflight, args.timeout, args.poisson, args.seed)
+        finally:
+            if process is not None:
+                stop_server(process)
+
+        print_run(label, summary)
+        runs.append(dict({"label": label, "config": config}, **summary))
+
+    if args.output:
+        report = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "url": args.url,
+            "options": {"rps": args.rps, "duration": args.duration, "warmup": args.warmup, "mix": args.mix,
+                        "poisson": args.poisson, "max_inflight": args.max_inflight, "seed": args.seed},
+            "runs": runs
+        }
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+"""Stub OpenAI-compatible chat completions server for load tests.
+
+Run from the backend directory, then point the app at it:
+
+    python -m benchmarks.stub_openai --port 8090 --latency lognormal:800:0.5 --error-rate 0.01
+    OPENAI_BASE_URL=http://127.0.0.1:8090/v1 OPENAI_API_KEY=stub gunicorn -c gunicorn.conf.py app:app
+
+Latency specs (milliseconds until the first byte):
+    fixed:MS  uniform:LOW:HIGH  normal:MEAN:SD  lognormal:MEDIAN:SIGMA
+Streamed responses then emit one word every --token-ms.
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Tuple
+
+ANSWER_WORDS = (
+    "The treaty was signed after years of conflict between the colonial powers and the local rulers. "
+    "Trade routes shifted, new taxes were imposed on the peasants and the national movement grew stronger. "
+    "Historians point to economic pressure, rising nationalism and the weakness of the old empires as the main causes."
+).split()
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Sampler returning a delay in seconds for a latency spec such as "lognormal:800:0.5" """
+    kind, *params = spec.split(':')
+    try:
+        values = [float(value) for value in params]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid latency spec: {spec}")
+
+    if kind == 'fixed' and len(values) == 1:
+        return lambda rng: values[0] / 1000
+    if kind == 'uniform' and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == 'normal' and len(values) == 2:
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1])) / 1000
+    if kind == 'lognormal' and len(values) == 2:
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1]) / 1000
+    raise argparse.ArgumentTypeError(f"Invalid latency spec: {spec}")
+
+
+class StubState:
+    """Settings and counters shared by all handler threads"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.latency = args.latency
+        self.token_delay = args.token_ms / 1000
+        self.completion_words = args.completion_words
+        self.error_rate = args.error_rate
+        self.rate_limit_rate = args.rate_limit_rate
+        self.retry_after = args.retry_after
+        self.abort_rate = args.abort_rate
+        self.counts = {"requests": 0, "streamed": 0, "errors": 0, "rate_limited": 0, "aborted": 0}
+        self._rng = random.Random(args.seed)
+        self._lock = threading.Lock()
+
+    def draw(self) -> Tuple[float, float]:
+        """(injected failure roll, first byte delay) for one request"""
+        with self._lock:
+            self.counts["requests"] += 1
+            return self._rng.random(), self.latency(self._rng)
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.counts[key] += 1
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state: StubState = None
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if self.path.rstrip('/') in ('/v1/models', '/models'):
+            self._send_json(200, {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "stub"}]})
+        elif self.path == '/stats':
+            self._send_json(200, self.state.counts)
+        else:
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+            return
+
+        state = self.state
+        roll, delay = state.draw()
+
+        # Failures are decided up front so the rates hold regardless of latency
+        if roll < state.rate_limit_rate:
+            state.count("rate_limited")
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                            {"Retry-After": str(state.retry_after)})
+            return
+        roll -= state.rate_limit_rate
+        if roll < state.error_rate:
+            state.count("errors")
+            time.sleep(delay)
+            self._send_json(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+            return
+        roll -= state.error_rate
+
+        messages = body.get("messages", [])
+        content = self._completion(messages)
+        model = body.get("model", "stub")
+        time.sleep(delay)
+
+        if body.get("stream"):
+            state.count("streamed")
+            self._stream(content, model, abort=roll < state.abort_rate)
+            return
+
+        prompt_tokens = sum(len(message.get("content", "")) for message in messages) // 4
+        completion_tokens = len(content.split())
+        self._send_json(200, {
+            "id": f"chatcmpl-stub-{time.monotonic_ns()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens}
+        })
+
+    def _completion(self, messages: List[Dict[str, str]]) -> str:
+        prompt = ' '.join(message.get("content", "") for message in messages)
+
+        # Quiz prompts get a JSON array the quiz parser accepts
+        match = re.search(r'Create (\d+) multiple choice', prompt)
+        if match:
+            nonce = time.monotonic_ns()
+            return json.dumps([{
+                "question": f"Stub question {nonce}-{i}: what was a cause of the conflict?",
+                "options": ["Trade", "Taxes", "Nationalism", "All of these"],
+                "correct_answer": 3,
+                "explanation": "All three contributed.",
+                "page_reference": "Page 1"
+            } for i in range(int(match.group(1)))])
+
+        words = [ANSWER_WORDS[i % len(ANSWER_WORDS)] for i in range(self.state.completion_words)]
+        return "**Answer from Samacheer Kalvi Textbook:**\n" + ' '.join(words)
+
+    def _stream(self, content: str, model: str, abort: bool) -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        words = content.split(' ')
+        created = int(time.time())
+        for position, word in enumerate(words):
+            if abort and position == len(words) // 2:
+                # Drop the connection mid-stream, as an overloaded upstream would
+                self.state.count("aborted")
+                self.close_connection = True
+                return
+            delta = word if position == 0 else ' ' + word
+            self._write_event({"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": created,
+                               "model": model,
+                               "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}]})
+            if self.state.token_delay:
+                time.sleep(self.state.token_delay)
+
+        self._write_event({"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": created,
+                           "model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        self._write_chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_event(self, payload: Dict[str, Any]) -> None:
+        self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode('utf-8'))
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _send_json(self, status: int, payload: Any, headers: Dict[str, str] = None) -> None:
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def make_server(args: argparse.Namespace) -> ThreadingHTTPServer:
+    handler = type('BoundStubHandler', (StubHandler,), {"state": StubState(args)})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency', type=parse_latency, default=parse_latency('lognormal:800:0.5'),
+                        help="delay before the first byte, e.g. fixed:200 or lognormal:800:0.5 (ms)")
+    parser.add_argument('--token-ms', type=float, default=20, help="delay between streamed words")
+    parser.add_argument('--completion-words', type=int, default=150, help="words per chat answer")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with a 500")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="fraction answered with a 429")
+    parser.add_argument('--retry-after', type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument('--abort-rate', type=float, default=0.0, help="fraction of streams cut off halfway")
+    parser.add_argument('--seed', type=int, default=0)
+    return parser
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    server = make_server(args)
+    print(f"Stub OpenAI server listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Synthetic textbook PDFs for benchmarks, written without any PDF library.
+
+Pages follow the layout the chunker and structure parser expect: a
+"Chapter N" heading on each chapter's first page, numbered "N.M Title"
+sections and plain sentences in between.
+"""
+import random
+import textwrap
+from typing import List
+
+# History/geography flavoured vocabulary so BM25 and the embeddings see realistic overlap
+VOCABULARY = (
+    "war treaty empire colonial revolution nationalism trade river monsoon plateau constitution "
+    "parliament economy growth soil agriculture industry famine reform movement congress british "
+    "french dutch portuguese coast delta forest mineral railway irrigation harbour census "
+    "democracy election federal rights duties court revenue tax peasant labour union strike"
+).split()
+
+TITLE_WORDS = ("Causes", "Effects", "Rise", "Decline", "Growth", "Features", "Role", "Impact")
+
+WORDS_PER_PAGE = 350
+PAGES_PER_CHAPTER = 12
+SECTIONS_PER_PAGE = 2
+
+
+def synthetic_pages(page_count: int, seed: int = 0) -> List[str]:
+    """Text of each page of a deterministic synthetic textbook"""
+    rng = random.Random(seed)
+    pages = []
+
+    for page_index in range(page_count):
+        chapter = page_index // PAGES_PER_CHAPTER + 1
+        page_in_chapter = page_index % PAGES_PER_CHAPTER
+        parts = []
+
+        if page_in_chapter == 0:
+            parts.append(f"Chapter {chapter} {_title(rng)}")
+
+        words_per_section = WORDS_PER_PAGE // SECTIONS_PER_PAGE
+        for section in range(SECTIONS_PER_PAGE):
+            number = page_in_chapter * SECTIONS_PER_PAGE + section + 1
+            parts.append(f"{chapter}.{number} {_title(rng)}")
+            parts.append(_sentences(rng, words_per_section, 1700 + chapter * 3 + page_in_chapter))
+
+        pages.append('\n'.join(parts))
+
+    return pages
+
+
+def synthetic_questions(count: int, seed: int = 0) -> List[str]:
+    """Student-style questions drawn from the synthetic vocabulary"""
+    rng = random.Random(seed)
+    templates = ("What were the causes of the {} {}?", "Explain the role of {} in {}.",
+                 "How did the {} affect {}?", "Describe the {} and {} of the period.")
+    return [rng.choice(templates).format(rng.choice(VOCABULARY), rng.choice(VOCABULARY)) for _ in range(count)]
+
+
+def _title(rng: random.Random) -> str:
+    return f"{rng.choice(TITLE_WORDS)} Of The {rng.choice(VOCABULARY).title()} {rng.choice(VOCABULARY).title()}"
+
+
+def _sentences(rng: random.Random, word_count: int, year: int) -> str:
+    sentences = []
+    while word_count > 0:
+        length = rng.randint(8, 20)
+        words = [rng.choice(VOCABULARY) for _ in range(length)]
+        if rng.random() < 0.2:
+            words += ["in", str(year)]
+        sentences.append(' '.join(words).capitalize() + '.')
+        word_count -= length
+    return ' '.join(sentences)
+
+
+def write_pdf(path: str, pages: List[str], line_width: int = 95) -> None:
+    """Write plain-text pages as a minimal PDF that PyPDF2 can extract"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+    ]
+    page_refs = []
+
+    for text in pages:
+        lines = []
+        for paragraph in text.split('\n'):
+            lines.extend(textwrap.wrap(paragraph, line_width) or [''])
+
+        stream = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td"]
+        for line in lines:
+            escaped = line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+            stream.append(f"({escaped}) Tj T*")
+        stream.append("ET")
+        content = '\n'.join(stream).encode('latin-1', 'replace')
+
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        content_ref = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref)
+        page_refs.append(len(objects))
+
+    kids = ' '.join(f"{ref} 0 R" for ref in page_refs).encode()
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_refs)
+
+    with open(path, 'wb') as file:
+        file.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(file.tell())
+            file.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+        xref = file.tell()
+        file.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            file.write(b"%010d 00000 n \n" % offset)
+        file.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
@@ -11,23 +11,91 @@ class Config:
     
     # OpenAI configuration
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
+    OPENAI_BASE_URL = os.environ.get('OPENAI_BASE_URL')  # e.g. a local stub server; unset uses api.openai.com
+    LLM_MODEL = os.environ.get('LLM_MODEL', 'gpt-4')
+    LLM_BACKEND = os.environ.get('LLM_BACKEND', 'openai')  # openai, local or extractive
+    LLM_BACKEND_CHAT = os.environ.get('LLM_BACKEND_CHAT', LLM_BACKEND)
+    LLM_BACKEND_QUIZ = os.environ.get('LLM_BACKEND_QUIZ', LLM_BACKEND)
+    LLM_FALLBACK_CHAT = os.environ.get('LLM_FALLBACK_CHAT', '')  # e.g. extractive; empty means errors surface
+    LOCAL_LLM_URL = os.environ.get('LOCAL_LLM_URL', 'http://127.0.0.1:8080/v1')  # llama.cpp / vLLM server
+    LOCAL_LLM_MODEL = os.environ.get('LOCAL_LLM_MODEL', 'local-model')
+    LOCAL_LLM_API_KEY = os.environ.get('LOCAL_LLM_API_KEY', 'local')
+    LLM_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', 30))  # seconds per call, and the longest wait for the rate limiter
+    LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', 3))
+    LLM_BACKOFF_BASE = float(os.environ.get('LLM_BACKOFF_BASE', 0.5))  # seconds; doubles per retry with full jitter
+    LLM_BACKOFF_MAX = float(os.environ.get('LLM_BACKOFF_MAX', 20))
+    LLM_MAX_CONNECTIONS = int(os.environ.get('LLM_MAX_CONNECTIONS', 100))  # keep-alive pool size per client
+    LLM_REQUESTS_PER_MINUTE = float(os.environ.get('LLM_REQUESTS_PER_MINUTE', 0))  # 0 disables the limiter
+    LLM_TOKENS_PER_MINUTE = float(os.environ.get('LLM_TOKENS_PER_MINUTE', 0))
     
     # PDF processing configuration
     MAX_PDF_SIZE = 50 * 1024 * 1024  # 50MB
     PDF_TIMEOUT = 60  # seconds
+    PDF_EXTRACT_WORKERS = int(os.environ.get('PDF_EXTRACT_WORKERS', 1))  # >1 extracts pages in a process pool
+    TEXTBOOK_DIR = os.environ.get('TEXTBOOK_DIR', 'public/textbooks')
+    
+    # Embedding index configuration
+    EMBEDDING_MODEL = os.environ.get('EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+    EMBEDDING_BACKEND = os.environ.get('EMBEDDING_BACKEND', 'torch')  # torch (sentence-transformers) or onnx
+    EMBEDDING_QUANTIZE = os.environ.get('EMBEDDING_QUANTIZE', 'none')  # none or int8; onnx backend only
+    ONNX_MODEL_DIR = os.environ.get('ONNX_MODEL_DIR', 'models/onnx')  # written by `python -m utils.onnx_encoder`
+    ONNX_THREADS = int(os.environ.get('ONNX_THREADS', 0))  # intra-op threads per worker; 0 lets ONNX Runtime decide
+    # Loading the model in the gunicorn master before fork shares its pages between workers,
+    # but imports torch in a process that then forks; off by default, see gunicorn.conf.py
+    PRELOAD_MODEL = os.environ.get('PRELOAD_MODEL', 'false').lower() == 'true'
+    TORCH_THREADS = int(os.environ.get('TORCH_THREADS', 0))  # intra-op threads per worker; 0 keeps torch's default
+    EMBED_BATCH_MAX_SIZE = int(os.environ.get('EMBED_BATCH_MAX_SIZE', 32))  # 1 disables query micro-batching
+    EMBED_BATCH_MAX_WAIT_MS = float(os.environ.get('EMBED_BATCH_MAX_WAIT_MS', 5))
+    INDEX_DIR = os.environ.get('INDEX_DIR', os.path.join(TEXTBOOK_DIR, '.index'))
+    CONTENT_CACHE_MAX_BYTES = int(os.environ.get('CONTENT_CACHE_MAX_BYTES', 256 * 1024 * 1024))  # per process, LRU by book
+    INDEX_CACHE_MAX_BYTES = int(os.environ.get('INDEX_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+    CORPUS_POLL_INTERVAL = float(os.environ.get('CORPUS_POLL_INTERVAL', 30))  # seconds between textbook checks; 0 disables hot reload
+    BUILD_LOCK_TIMEOUT = float(os.environ.get('BUILD_LOCK_TIMEOUT', 600))  # seconds to wait for another worker's build; 0 disables the lock
+    
+    # Retrieval configuration
+    CHUNK_WORDS = int(os.environ.get('CHUNK_WORDS', 200))  # target words per chunk, split at sentence ends
+    CHUNK_OVERLAP_WORDS = int(os.environ.get('CHUNK_OVERLAP_WORDS', 40))  # trailing sentences repeated in the next chunk
+    CONTEXT_TOKEN_BUDGET = int(os.environ.get('CONTEXT_TOKEN_BUDGET', 800))  # textbook tokens sent with each question
+    RETRIEVAL_TOP_K = int(os.environ.get('RETRIEVAL_TOP_K', 5))
+    RETRIEVAL_THRESHOLD = float(os.environ.get('RETRIEVAL_THRESHOLD', 0.3))
+    RETRIEVAL_DTYPE = os.environ.get('RETRIEVAL_DTYPE', 'float32')  # float32, float16 or int8
+    # dense, bm25, hybrid or shortlist; hybrid applies RETRIEVAL_THRESHOLD to BM25 hits too
+    SEARCH_MODE = os.environ.get('SEARCH_MODE', 'hybrid')
+    SEARCH_CANDIDATES = int(os.environ.get('SEARCH_CANDIDATES', 100))  # per-ranking depth for hybrid/shortlist
+    SHARD_SEARCH_WORKERS = int(os.environ.get('SHARD_SEARCH_WORKERS', min(8, os.cpu_count() or 1)))  # books scored in parallel by cross-book search
     
     # Cache configuration
     CACHE_TIMEOUT = 3600  # 1 hour
+    ANSWER_CACHE_BACKEND = os.environ.get('ANSWER_CACHE_BACKEND', 'memory')  # memory, sqlite or none
+    ANSWER_CACHE_PATH = os.environ.get('ANSWER_CACHE_PATH', 'cache/answers.sqlite3')
+    ANSWER_CACHE_MAX_BYTES = int(os.environ.get('ANSWER_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    ANSWER_CACHE_SIMILARITY = float(os.environ.get('ANSWER_CACHE_SIMILARITY', 0))  # 0 disables near-duplicate reuse
+    
+    # Quiz question bank configuration (an empty path disables the bank)
+    QUIZ_BANK_PATH = os.environ.get('QUIZ_BANK_PATH', 'cache/quiz_bank.sqlite3')
+    QUIZ_BANK_MIN_SIZE = int(os.environ.get('QUIZ_BANK_MIN_SIZE', 20))  # top up in the background below this
+    QUIZ_BANK_BATCH = int(os.environ.get('QUIZ_BANK_BATCH', 10))  # questions requested per LLM call
+    QUIZ_MAX_QUESTIONS = int(os.environ.get('QUIZ_MAX_QUESTIONS', 20))  # per /api/quiz/generate request
     
     # Logging configuration
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
     
+    # Metrics configuration (per-stage timings are always exported on /metrics)
+    TIMING_HEADER = os.environ.get('TIMING_HEADER', 'false').lower() == 'true'  # add a Server-Timing header to responses
+    
     # CORS configuration
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', 'http://localhost:3000').split(',')
     
+    # Async serving configuration (asgi.py)
+    ASYNC_MAX_INFLIGHT = int(os.environ.get('ASYNC_MAX_INFLIGHT', 500))  # requests admitted before returning 503
+    ASYNC_LLM_CONCURRENCY = int(os.environ.get('ASYNC_LLM_CONCURRENCY', 100))  # concurrent OpenAI calls
+    ASYNC_CPU_WORKERS = int(os.environ.get('ASYNC_CPU_WORKERS', 8))  # retrieval threads; their encodes share micro-batches
+    
     # API configuration
     MAX_SEARCH_RESULTS = 10
     MAX_RESPONSE_LENGTH = 2000
+    CHAT_BATCH_MAX_QUESTIONS = int(os.environ.get('CHAT_BATCH_MAX_QUESTIONS', 100))  # per /api/chat/batch request
+    CHAT_BATCH_CONCURRENCY = int(os.environ.get('CHAT_BATCH_CONCURRENCY', 8))  # LLM calls in flight per batch
     
     @staticmethod
     def init_app(app):
@@ -0,0 +1,36 @@
+import os
+import sys
+import threading
+
+from config import Config
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+# Import the app once in the master so workers share its memory copy-on-write
+preload_app = True
+
+
+def when_ready(server):
+    """Load the embedding model in the master so forked workers share its pages (PRELOAD_MODEL=true)"""
+    if Config.PRELOAD_MODEL:
+        from utils.embeddings import preload_embedding_model
+        server.log.info("Preloading embedding model %s", Config.EMBEDDING_MODEL)
+        preload_embedding_model()
+
+
+def post_fork(server, worker):
+    """Give each worker its own torch thread pool when the master preloaded the model"""
+    # The master never encodes, so its pool was not started; setting the thread
+    # count here makes torch build a fresh pool in the child rather than inherit state
+    torch = sys.modules.get('torch')
+    if torch is not None:
+        torch.set_num_threads(Config.TORCH_THREADS or torch.get_num_threads())
+
+
+def post_worker_init(worker):
+    """Warm the model in the background when it was not preloaded, so /health answers immediately"""
+    if not Config.PRELOAD_MODEL:
+        from utils.embeddings import preload_embedding_model
+        threading.Thread(target=preload_embedding_model, daemon=True).start()
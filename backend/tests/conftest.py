@@ -0,0 +1,45 @@
+import os
+import sys
+import zlib
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.synthetic import synthetic_pages, write_pdf  # noqa: E402
+from utils import embeddings  # noqa: E402
+from utils.pdf_processor import PDFProcessor  # noqa: E402
+
+TEST_MODEL = 'test-hashing'
+
+
+class HashingEncoder:
+    """Bag-of-words stand-in for the sentence-transformers model"""
+
+    def encode(self, texts, **kwargs):
+        vectors = np.zeros((len(texts), 64), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, zlib.crc32(word.encode('utf-8')) % 64] += 1.0
+        return vectors
+
+
+@pytest.fixture
+def textbook_dir(tmp_path):
+    """A directory holding a small synthetic class 10 social science textbook"""
+    directory = tmp_path / 'textbooks'
+    directory.mkdir()
+    write_pdf(str(directory / 'tn-class-10-social-science.pdf'), synthetic_pages(12, seed=0))
+    return directory
+
+
+@pytest.fixture
+def processor(textbook_dir, tmp_path, monkeypatch):
+    """PDFProcessor over textbook_dir with the hashing encoder and a private index directory"""
+    monkeypatch.setitem(embeddings._models, TEST_MODEL, HashingEncoder())
+    processor = PDFProcessor()
+    processor.textbook_dir = str(textbook_dir)
+    processor.index_dir = str(tmp_path / 'index')
+    processor.model_name = TEST_MODEL
+    return processor
@@ -0,0 +1,25 @@
+import multiprocessing
+
+from utils.answer_cache import SQLiteCacheBackend
+
+
+def test_sqlite_backend_opens_a_connection_per_process(tmp_path):
+    backend = SQLiteCacheBackend(str(tmp_path / 'answers.sqlite3'), ttl=60, max_bytes=1024 * 1024)
+    backend.set('parent', 'social_10', {"answer": "from the master"})
+    parent_connection = backend._conn
+
+    def child(results):
+        backend.set('child', 'social_10', {"answer": "from a worker"})
+        results.put((backend._conn is not parent_connection, backend.get('parent'), len(backend)))
+
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    process = context.Process(target=child, args=(results,))
+    process.start()
+    separate_connection, inherited, child_size = results.get(timeout=10)
+    process.join(timeout=10)
+
+    assert process.exitcode == 0
+    assert separate_connection
+    assert inherited == {"answer": "from the master"} and child_size == 2
+    assert backend.get('child') == {"answer": "from a worker"}
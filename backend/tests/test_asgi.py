@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from config import Config
+
+
+@pytest.fixture
+def asgi(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    monkeypatch.setattr(Config, 'QUIZ_BANK_PATH', '')
+    monkeypatch.setattr(Config, 'ANSWER_CACHE_BACKEND', 'none')
+    import asgi
+    return asgi
+
+
+def test_stream_slot_is_released_when_client_disconnects_before_body(asgi):
+    async def body():
+        yield "event: token\ndata: {}\n\n"
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        raise OSError("client went away")
+
+    async def scenario():
+        assert asgi.async_ai_service.try_acquire()
+        before = asgi.async_ai_service.inflight
+        response = asgi.ReleasingStreamingResponse(body(), media_type='text/event-stream')
+        with pytest.raises(OSError):
+            await response({"type": "http"}, receive, send)
+        return before, asgi.async_ai_service.inflight
+
+    before, after = asyncio.run(scenario())
+    assert after == before - 1
+
+
+def test_search_passes_retrieval_options(asgi, monkeypatch):
+    from starlette.testclient import TestClient
+
+    calls = []
+    monkeypatch.setattr(asgi.async_ai_service.pdf_processor, 'search_content',
+                        lambda *args, **kwargs: calls.append((args, kwargs)) or "content")
+
+    response = TestClient(asgi.app).post('/api/textbook/search', json={
+        "query": "colonial trade", "subject": "social", "class": "10",
+        "top_k": 3, "threshold": 0.2, "mode": "bm25"
+    })
+
+    assert response.json()["content"] == "content"
+    assert calls == [(("colonial trade", "social", "10"), {"top_k": 3, "threshold": 0.2, "mode": "bm25"})]
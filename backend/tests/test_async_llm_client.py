@@ -0,0 +1,54 @@
+import asyncio
+from types import SimpleNamespace
+
+from utils.llm_client import AsyncLLMClient
+
+
+class SlowCompletions:
+    """Stands in for the OpenAI call: one slow completion per prompt"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, messages, **params):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return SimpleNamespace(usage=None, choices=[SimpleNamespace(message=SimpleNamespace(content="answer"))])
+
+
+def make_client():
+    client = AsyncLLMClient(api_key='test')
+    client._create = SlowCompletions()
+    return client
+
+
+def test_cancelled_owner_does_not_cancel_coalesced_callers():
+    async def scenario():
+        client = make_client()
+        messages = [{"role": "user", "content": "What is a monsoon?"}]
+
+        owner = asyncio.ensure_future(client.chat(messages))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(client.chat(messages))
+        await asyncio.sleep(0)
+
+        owner.cancel()
+        assert await follower == "answer"
+        assert owner.cancelled()
+        assert client._create.calls == 1
+        assert client.stats.as_dict()["coalesced"] == 1
+        assert not client._inflight
+
+    asyncio.run(scenario())
+
+
+def test_prompt_is_sent_again_after_the_shared_call_finishes():
+    async def scenario():
+        client = make_client()
+        messages = [{"role": "user", "content": "What is a delta?"}]
+
+        assert await client.chat(messages) == "answer"
+        assert await client.chat(messages) == "answer"
+        assert client._create.calls == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,38 @@
+import numpy as np
+
+from utils.bm25 import BM25Index, tokenize
+
+DOCUMENTS = [
+    "The colonial trade routes carried spices and cotton.",
+    "Photosynthesis in green leaves uses sunlight.",
+    "Colonial rule changed trade and farming in India.",
+    "Rivers carry water to the sea.",
+    "Trade unions formed in the cotton mills."
+]
+
+
+def dense_scores(index, query):
+    scores = np.zeros(len(index), dtype=np.float32)
+    for term in set(tokenize(query)):
+        if term in index.postings:
+            doc_ids, weights = index.postings[term]
+            scores[doc_ids] += weights
+    return scores
+
+
+def test_search_matches_scoring_every_document():
+    index = BM25Index(DOCUMENTS)
+
+    for query in ["colonial trade", "cotton trade mills", "green leaves", "colonial"]:
+        expected = dense_scores(index, query)
+        results = index.search(query, k=3)
+
+        assert np.allclose([score for _, score in results], sorted(expected[expected > 0], reverse=True)[:3])
+        assert all(np.isclose(expected[doc_id], score) for doc_id, score in results)
+
+
+def test_search_without_matching_terms_is_empty():
+    index = BM25Index(DOCUMENTS)
+
+    assert index.search("volcano", k=5) == []
+    assert index.search("the of and", k=5) == []
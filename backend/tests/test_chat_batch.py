@@ -0,0 +1,29 @@
+import pytest
+
+from config import Config
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    monkeypatch.setattr(Config, 'QUIZ_BANK_PATH', '')
+    monkeypatch.setattr(Config, 'ANSWER_CACHE_BACKEND', 'none')
+    import app
+    monkeypatch.setattr(app.ai_service, 'answer_batch', lambda *args: pytest.fail("should not answer"))
+    return app.app.test_client()
+
+
+@pytest.mark.parametrize('body', [
+    ["What is a monsoon?"],
+    "What is a monsoon?",
+    {"questions": []},
+    {"questions": "What is a monsoon?"},
+    {"questions": ["What is a monsoon?", 42]},
+    {"questions": ["What is a monsoon?", {"text": "Why?"}]},
+    {"questions": ["   "]}
+])
+def test_malformed_batch_is_rejected_with_json(client, body):
+    response = client.post('/api/chat/batch', json=body)
+
+    assert response.status_code == 400
+    assert response.get_json() == {"success": False, "message": "A non-empty list of questions is required"}
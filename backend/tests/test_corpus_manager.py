@@ -0,0 +1,82 @@
+import os
+
+from benchmarks.synthetic import synthetic_pages, write_pdf
+from utils.corpus_manager import CorpusManager
+from utils.quiz_bank import QuizBank
+
+PDF_NAME = 'tn-class-10-social-science.pdf'
+
+QUESTION = {"question": "Who ruled?", "options": ["A", "B", "C", "D"], "correct_answer": 0,
+            "explanation": "", "page_reference": ""}
+
+
+def replace_pdf(textbook_dir, seed):
+    path = str(textbook_dir / PDF_NAME)
+    write_pdf(path, synthetic_pages(12, seed=seed))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def poll(manager):
+    # A changed PDF is only picked up once its size and mtime hold still for a poll
+    manager.poll_once()
+    return manager.poll_once()
+
+
+def test_unloaded_book_is_not_built_on_poll(processor, textbook_dir, monkeypatch):
+    loads = []
+    monkeypatch.setattr(processor, '_load_textbook', lambda *args: loads.append(args))
+    manager = CorpusManager(processor, poll_interval=0)
+
+    assert poll(manager) == []
+    assert loads == []
+    assert processor.content_cache.peek('social_10') is None
+
+
+def test_reload_swaps_content_and_clears_quiz_bank(processor, textbook_dir, tmp_path):
+    bank = QuizBank(str(tmp_path / 'quiz.sqlite3'))
+    bank.add('social', 'colonial', [QUESTION])
+    bank.add('science', 'colonial', [QUESTION])
+    reloaded = []
+    manager = CorpusManager(processor, poll_interval=0,
+                            on_reload=lambda subject, class_level: (reloaded.append((subject, class_level)),
+                                                                    bank.invalidate(subject, class_level)))
+
+    before = processor.load_textbook_content('social', '10')["pdf_sha256"]
+    poll(manager)
+    replace_pdf(textbook_dir, seed=1)
+
+    assert poll(manager) == ['social_10']
+    assert processor.load_textbook_content('social', '10')["pdf_sha256"] != before
+    assert reloaded == [('social', '10')]
+    assert bank.count('social', 'colonial') == 0
+    assert bank.count('science', 'colonial') == 1
+
+
+def test_failed_reload_is_retried(processor, textbook_dir, monkeypatch):
+    manager = CorpusManager(processor, poll_interval=0)
+    before = processor.load_textbook_content('social', '10')["pdf_sha256"]
+    poll(manager)
+    replace_pdf(textbook_dir, seed=1)
+
+    load_textbook = processor._load_textbook
+    monkeypatch.setattr(processor, '_load_textbook', lambda *args: {"success": False, "message": "busy"})
+    assert poll(manager) == []
+    assert manager.failures == 1
+
+    monkeypatch.setattr(processor, '_load_textbook', load_textbook)
+    assert manager.poll_once() == ['social_10']
+    assert processor.load_textbook_content('social', '10')["pdf_sha256"] != before
+
+
+def test_removed_pdf_drops_index_and_saved_artifacts(processor, textbook_dir):
+    manager = CorpusManager(processor, poll_interval=0)
+    assert processor.get_chunk_index('social', '10') is not None
+    processor.content_cache.pop('social_10')
+    poll(manager)
+
+    os.remove(textbook_dir / PDF_NAME)
+    manager.poll_once()
+
+    assert 'social_10' not in processor.embeddings_cache
+    assert [name for name in os.listdir(processor.index_dir) if not name.endswith('.lock')] == []
@@ -0,0 +1,55 @@
+import numpy as np
+
+from utils.chunk_index import ChunkIndex
+
+CHUNKS = [
+    "Monsoon rain floods the delta every year.",
+    "The monsoon festival is celebrated with songs.",
+    "Volcanoes erupt lava and ash.",
+    "Delta farmers plant rice after the rain."
+]
+
+# Hand-picked embeddings: the query is close to the first and last chunk only
+VECTORS = {
+    CHUNKS[0]: [1.0, 0.1, 0.0],
+    CHUNKS[1]: [0.0, 0.0, 1.0],
+    CHUNKS[2]: [0.0, 1.0, 0.0],
+    CHUNKS[3]: [0.8, 0.3, 0.0],
+}
+QUERY = "monsoon rain"
+QUERY_VECTOR = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+
+
+class TableEncoder:
+    def encode(self, texts, **kwargs):
+        return np.array([VECTORS[text] for text in texts], dtype=np.float32)
+
+
+def make_index():
+    return ChunkIndex.build(CHUNKS, [(1, 1)] * len(CHUNKS), [None] * len(CHUNKS), TableEncoder(), 'table',
+                            'sha', 'test')
+
+
+def test_hybrid_drops_lexical_hits_below_the_threshold():
+    results = make_index().search(QUERY_VECTOR, top_k=4, threshold=0.3, query_text=QUERY, mode='hybrid')
+
+    assert [idx for idx, _, _ in results] == [0, 3]
+
+
+def test_hybrid_keeps_only_the_dense_match_when_words_match_elsewhere():
+    # The words match chunk 1 only, but its embedding is far from the query's
+    results = make_index().search(np.array([0.0, 0.6, -0.8], dtype=np.float32), top_k=4, threshold=0.3,
+                                  query_text="festival songs", mode='hybrid')
+
+    assert [idx for idx, _, _ in results] == [2]
+
+
+def test_hybrid_reports_cosine_score_and_separate_rrf_score():
+    index = make_index()
+    dense = dict(index.search(QUERY_VECTOR, top_k=4, threshold=0.3))
+    results = index.search(QUERY_VECTOR, top_k=4, threshold=0.3, query_text=QUERY, mode='hybrid')
+
+    records = [index.chunk_record(*match) for match in results]
+    assert [record["score"] for record in records] == [dense[0], dense[3]]
+    assert records[0]["rrf_score"] > records[1]["rrf_score"] > 0
+    assert "rrf_score" not in index.chunk_record(0, dense[0])
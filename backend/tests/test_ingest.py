@@ -0,0 +1,33 @@
+import contextlib
+
+from utils import ingest
+from utils.corpus import TextbookArtifact
+
+PDF_NAME = 'tn-class-10-social-science.pdf'
+
+
+def test_ingest_skips_build_finished_while_waiting_for_lock(processor, textbook_dir, monkeypatch):
+    pdf_path = str(textbook_dir / PDF_NAME)
+
+    @contextlib.contextmanager
+    def contended_lock(path, timeout):
+        # Another process builds the book while this one waits for the lock
+        TextbookArtifact.compile(processor, pdf_path, processor.index_dir, 'social_10')
+        yield True
+
+    monkeypatch.setattr(ingest, 'file_lock', contended_lock)
+    builds = []
+    compile_artifact = TextbookArtifact.compile
+    monkeypatch.setattr(TextbookArtifact, 'compile',
+                        staticmethod(lambda *args, **kwargs: builds.append(args) or compile_artifact(*args, **kwargs)))
+
+    assert ingest.ingest_textbook(processor, 'social', '10', pdf_path) == "up to date"
+    assert len(builds) == 1
+
+
+def test_ingest_force_rebuilds_fresh_artifact(processor, textbook_dir):
+    pdf_path = str(textbook_dir / PDF_NAME)
+
+    assert ingest.ingest_textbook(processor, 'social', '10', pdf_path).startswith("built")
+    assert ingest.ingest_textbook(processor, 'social', '10', pdf_path) == "up to date"
+    assert ingest.ingest_textbook(processor, 'social', '10', pdf_path, force=True).startswith("built")
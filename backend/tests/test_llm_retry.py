@@ -0,0 +1,25 @@
+import httpx
+import openai
+import pytest
+
+from utils.llm_client import retry_after, retry_delay
+
+
+def rate_limit_error(headers):
+    request = httpx.Request('POST', 'https://api.example.com/v1/chat/completions')
+    response = httpx.Response(429, headers=headers, request=request)
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+@pytest.mark.parametrize('value', ['soon', 'Mon, 99 Foo 2026', '   ', '1.5.7'])
+def test_junk_retry_after_falls_back_to_backoff(value):
+    error = rate_limit_error({'retry-after': value})
+
+    assert retry_after(error) is None
+    assert 0 <= retry_delay(error, attempt=1, base=1.0, cap=20.0) <= 2.0
+
+
+def test_retry_after_seconds_and_milliseconds():
+    assert retry_after(rate_limit_error({'retry-after': '3'})) == 3.0
+    assert retry_after(rate_limit_error({'retry-after-ms': '250', 'retry-after': '3'})) == 0.25
+    assert retry_after(rate_limit_error({'retry-after': 'Wed, 21 Oct 2015 07:28:00 GMT'})) == 0.0
@@ -0,0 +1,92 @@
+import multiprocessing
+
+import pytest
+
+from config import Config
+from utils.quiz_bank import QuizBank
+
+
+def make_question(number):
+    return {"question": f"Question {number}?", "options": ["A", "B", "C", "D"], "correct_answer": 0,
+            "explanation": "", "page_reference": ""}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    monkeypatch.setattr(Config, 'QUIZ_BANK_PATH', '')
+    monkeypatch.setattr(Config, 'ANSWER_CACHE_BACKEND', 'none')
+    import app
+    return app.app.test_client(), app.ai_service
+
+
+@pytest.mark.parametrize('count', [0, -1, Config.QUIZ_MAX_QUESTIONS + 1, 'many', None])
+def test_quiz_count_out_of_range_is_rejected(client, monkeypatch, count):
+    test_client, ai_service = client
+    monkeypatch.setattr(ai_service, 'generate_quiz_questions', lambda *args: pytest.fail("should not generate"))
+
+    response = test_client.post('/api/quiz/generate', json={"topic": "colonial", "count": count})
+
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
+
+
+def test_quiz_count_in_range_is_passed_on(client, monkeypatch):
+    test_client, ai_service = client
+    calls = []
+    monkeypatch.setattr(ai_service, 'generate_quiz_questions',
+                        lambda *args: calls.append(args) or {"success": True, "questions": []})
+
+    response = test_client.post('/api/quiz/generate', json={"topic": "colonial", "count": "3"})
+
+    assert response.status_code == 200
+    assert calls == [('social', 'colonial', 3, '10')]
+
+
+def test_quiz_bank_sample_with_negative_count_returns_nothing(tmp_path):
+    bank = QuizBank(str(tmp_path / 'quiz.sqlite3'))
+    bank.add('social', 'colonial', [make_question(number) for number in range(5)])
+
+    assert bank.sample('social', 'colonial', -1) == []
+    assert len(bank.sample('social', 'colonial', 3)) == 3
+
+
+def test_quiz_bank_opens_a_connection_per_process(tmp_path):
+    bank = QuizBank(str(tmp_path / 'quiz.sqlite3'))
+    bank.add('social', 'colonial', [make_question(0)])
+    parent_connection = bank._conn
+
+    def child(results):
+        bank.add('social', 'colonial', [make_question(1)])
+        results.put((bank._conn is not parent_connection, bank.count('social', 'colonial')))
+
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    process = context.Process(target=child, args=(results,))
+    process.start()
+    separate_connection, child_count = results.get(timeout=10)
+    process.join(timeout=10)
+
+    assert process.exitcode == 0
+    assert separate_connection and child_count == 2
+    assert bank._conn is parent_connection
+    assert bank.count('social', 'colonial') == 2
+
+
+def test_failed_generation_serves_the_banked_questions(client, monkeypatch, tmp_path):
+    _, ai_service = client
+    bank = QuizBank(str(tmp_path / 'quiz.sqlite3'))
+    bank.add('social', 'colonial', [make_question(number) for number in range(2)])
+    monkeypatch.setattr(ai_service, 'quiz_bank', bank)
+    monkeypatch.setattr(ai_service, '_schedule_quiz_top_up', lambda *args: None)
+
+    def unavailable(*args):
+        raise ConnectionError("LLM unavailable")
+
+    monkeypatch.setattr(ai_service, '_request_quiz_questions', unavailable)
+
+    result = ai_service.generate_quiz_questions('social', 'colonial', 5)
+    assert result["success"] is True and len(result["questions"]) == 2
+
+    result = ai_service.generate_quiz_questions('social', 'partition', 5)
+    assert result == {"success": False, "message": "Error generating quiz: LLM unavailable"}
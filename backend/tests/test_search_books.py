@@ -0,0 +1,32 @@
+import pytest
+
+from config import Config
+
+
+@pytest.fixture
+def app_module(monkeypatch, textbook_dir, processor):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    monkeypatch.setattr(Config, 'QUIZ_BANK_PATH', '')
+    monkeypatch.setattr(Config, 'ANSWER_CACHE_BACKEND', 'none')
+    import app
+    monkeypatch.setattr(app, 'pdf_processor', processor)
+    return app
+
+
+@pytest.mark.parametrize('filters', [{"classes": "10"}, {"classes": 10}, {"classes": ["10"]},
+                                     {"subjects": "social", "classes": [10]}])
+def test_scalar_or_list_filters_select_the_book(app_module, filters):
+    response = app_module.app.test_client().post('/api/textbook/search',
+                                                 json=dict(filters, query="colonial war", threshold=0.0))
+
+    assert response.status_code == 200
+    assert response.get_json()["books"] == ["social_10"]
+
+
+@pytest.mark.parametrize('filters', [{"classes": {"10": True}}, {"subjects": [["social"]]},
+                                     {"classes": [True]}, {"subjects": 1.5}])
+def test_malformed_filters_are_rejected(app_module, filters):
+    response = app_module.app.test_client().post('/api/textbook/search', json=dict(filters, query="colonial war"))
+
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
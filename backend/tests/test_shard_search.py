@@ -0,0 +1,58 @@
+import pytest
+
+from benchmarks.synthetic import write_pdf
+
+# Only science is about the query; each other book shares one weak word with it
+BOOKS = {
+    'science': "Photosynthesis takes place in green leaves. Chlorophyll absorbs sunlight for photosynthesis.",
+    'mathematics': "The area of a triangle is half the base times the height. Prime numbers use two factors.",
+    'english': "The poem describes a journey across the sea. The narrator remembers the green village.",
+    'social': "The monsoon brings rain to the delta. Farmers in the delta grow rice when the monsoon leaves."
+}
+
+FILENAMES = {
+    'science': 'tn-class-10-science.pdf',
+    'mathematics': 'tn-class-10-mathematics.pdf',
+    'english': 'tn-class-10-english.pdf',
+    'social': 'tn-class-10-social-science.pdf'
+}
+
+
+@pytest.fixture
+def shelf(processor, textbook_dir):
+    """Four books on unrelated topics, each a few pages of its own sentences"""
+    for subject, text in BOOKS.items():
+        pages = [f"Chapter {chapter} {subject.title()}\n" + ' '.join([text] * 6) for chapter in range(1, 4)]
+        write_pdf(str(textbook_dir / FILENAMES[subject]), pages)
+    return processor
+
+
+@pytest.mark.parametrize('mode', ['hybrid', 'dense', 'shortlist', 'bm25'])
+def test_only_the_matching_book_is_returned(shelf, mode):
+    results = shelf.search_shards("how does photosynthesis in green leaves use chlorophyll", top_k=3,
+                                  threshold=0.0, mode=mode)
+
+    assert len(results) == 3
+    assert {result["subject"] for result in results} == {'science'}
+    assert all(result["book"] == "Class 10 Science" for result in results)
+
+
+def test_single_book_matches_search_content_ranking(shelf):
+    results = shelf.search_shards("monsoon rain in the delta", [('social', '10')], top_k=2, threshold=0.0,
+                                  mode='dense')
+    index = shelf.get_chunk_index('social', '10')
+    expected = index.search(shelf.encode_query("monsoon rain in the delta"), top_k=2, threshold=0.0)
+
+    assert [result["text"] for result in results] == [index.chunks[idx] for idx, _ in expected]
+
+
+def test_hybrid_results_keep_cosine_score_and_add_rrf_score(shelf):
+    query = "how does photosynthesis in green leaves use chlorophyll"
+    results = shelf.search_shards(query, top_k=3, threshold=0.3, mode='hybrid')
+    index = shelf.get_chunk_index('science', '10')
+    similarity = dict(index.search(shelf.encode_query(query), top_k=len(index), threshold=-1.0))
+
+    assert results
+    for result in results:
+        assert result["score"] == pytest.approx(similarity[index.chunks.index(result["text"])])
+        assert result["score"] > 0.3 and 0 < result["rrf_score"] < 1
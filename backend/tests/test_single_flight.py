@@ -0,0 +1,24 @@
+from utils.single_flight import file_lock
+
+
+def test_file_lock_yields_false_when_directory_cannot_be_created(tmp_path):
+    blocker = tmp_path / 'not-a-directory'
+    blocker.write_text('')
+
+    with file_lock(str(blocker / 'index' / 'book.lock'), timeout=5) as acquired:
+        assert acquired is False
+
+
+def test_file_lock_acquires_in_writable_directory(tmp_path):
+    with file_lock(str(tmp_path / 'index' / 'book.lock'), timeout=5) as acquired:
+        assert acquired is True
+
+
+def test_search_and_topics_work_with_unwritable_index_dir(processor, tmp_path):
+    blocker = tmp_path / 'blocker'
+    blocker.write_text('')
+    processor.index_dir = str(blocker / 'index')
+
+    assert processor.search_content('colonial trade', 'social', '10', threshold=0.0)
+    assert processor.get_chapter_structure('social', '10')["success"]
+    assert processor.get_topic_content('social', 'colonial', '10')
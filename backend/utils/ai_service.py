@@ -1,92 +1,360 @@
-import openai
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+from config import Config
+from .answer_cache import AnswerCache, create_answer_cache, normalize_question
+from .llm_backends import complete_with_fallback, create_backend, open_stream
+from .llm_client import LLMStats
+from .metrics import record_stage, timed
 from .pdf_processor import PDFProcessor
+from .quiz_bank import QuizBank, create_quiz_bank, parse_quiz_questions
 
-class AIService:
+TAMIL_PATTERN = re.compile(r'[\u0B80-\u0BFF]+')
+
+NO_CONTENT = {
+    "success": False,
+    "message": "No relevant content found in the textbook for this question."
+}
+
+class TamilTextFilter:
+    """Incremental version of AIService._remove_tamil_text for streamed text"""
+    
     def __init__(self):
-        self.client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        self.pdf_processor = PDFProcessor()
+        self._started = False
+        self._pending_space = False
+    
+    def feed(self, text: str) -> str:
+        """Filter the next piece of the stream, returning the text that is safe to emit"""
+        output = []
+        
+        for piece in re.split(r'(\s+)', TAMIL_PATTERN.sub('', text)):
+            if not piece:
+                continue
+            if piece.isspace():
+                # Collapse whitespace, but only emit it once more text follows
+                self._pending_space = True
+                continue
+            if self._pending_space and self._started:
+                output.append(' ')
+            output.append(piece)
+            self._started = True
+            self._pending_space = False
+        
+        return ''.join(output)
+
+
+class AIService:
+    def __init__(self, pdf_processor: Optional[PDFProcessor] = None,
+                 answer_cache: Optional[AnswerCache] = None,
+                 quiz_bank: Optional[QuizBank] = None):
+        # Backends are chosen per route: openai, local (OpenAI-compatible server) or extractive
+        self.llm_stats = LLMStats()
+        api_key = os.getenv('OPENAI_API_KEY')
+        self.backends = {
+            "chat": create_backend(Config.LLM_BACKEND_CHAT, self.llm_stats, api_key),
+            "quiz": create_backend(Config.LLM_BACKEND_QUIZ, self.llm_stats, api_key)
+        }
+        # Answers fall back to this backend (if set) when the chat backend fails
+        self.chat_fallback = create_backend(Config.LLM_FALLBACK_CHAT, self.llm_stats, api_key)
+        # Share the app's processor so there is a single content cache per process
+        self.pdf_processor = pdf_processor or PDFProcessor()
+        self.answer_cache = answer_cache if answer_cache is not None else create_answer_cache()
+        self.quiz_bank = quiz_bank if quiz_bank is not None else create_quiz_bank()
+        self._quiz_top_ups = set()
+        self._quiz_top_up_lock = threading.Lock()
+    
+    def invalidate_textbook(self, subject: str, class_level: str) -> None:
+        """Forget cached answers and quiz questions built from a textbook's previous content"""
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate(subject, class_level)
+        if self.quiz_bank is not None:
+            self.quiz_bank.invalidate(subject, class_level)
         
     def generate_answer(self, question: str, subject: str = "social", class_level: str = "10") -> Dict[str, Any]:
         """Generate answer from textbook content - English only"""
         try:
+            cached, query_embedding = self._lookup_cached_answer(question, subject, class_level)
+            if cached is not None:
+                return cached
+            
             # Get relevant content from textbook
-            relevant_content = self.pdf_processor.search_content(question, subject, class_level)
+            relevant_content = self.pdf_processor.search_content(question, subject, class_level,
+                                                                 query_embedding=query_embedding)
             
             if not relevant_content:
-                return {
+                return dict(NO_CONTENT)
+            
+            return self._complete_answer(question, subject, class_level, relevant_content, query_embedding)
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"Error generating answer: {str(e)}"
+            }
+    
+    def _complete_answer(self, question: str, subject: str, class_level: str, relevant_content: str,
+                         query_embedding: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        """Ask the chat backend to answer from retrieved content, then filter and cache the answer"""
+        with timed('llm'):
+            answer, backend = complete_with_fallback(
+                self.backends["chat"], self.chat_fallback,
+                self._build_answer_messages(question, subject, class_level, relevant_content),
+                max_tokens=1500,
+                temperature=0.3,
+                query=question,
+                context=relevant_content
+            )
+        
+        # Double-check to remove any Tamil text that might have slipped through
+        with timed('tamil_filter'):
+            answer = self._remove_tamil_text(answer)
+        
+        return self._answer_result(question, subject, class_level, answer, query_embedding,
+                                   cache=backend.generative)
+    
+    def answer_batch(self, questions: List[str], subject: str = "social", class_level: str = "10",
+                     concurrency: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Answer a list of questions, yielding each result as soon as it is ready.
+        
+        Every result is shaped like generate_answer's, plus the question's index and
+        text. Identical questions are answered once; retrieval for the whole batch is
+        one encode and one scoring pass, and at most `concurrency` LLM calls run at once.
+        """
+        # Positions of each distinct question in the batch
+        positions: Dict[str, List[int]] = {}
+        for i, question in enumerate(questions):
+            positions.setdefault(normalize_question(question), []).append(i)
+        unique = [questions[indices[0]] for indices in positions.values()]
+        
+        def results_for(question: str, result: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+            for i in positions[normalize_question(question)]:
+                yield dict(result, index=i, question=questions[i])
+        
+        try:
+            cached, pending, query_embeddings = self._lookup_cached_answers(unique, subject, class_level)
+            contexts = self.pdf_processor.search_content_batch(pending, subject, class_level,
+                                                               query_embeddings=query_embeddings)
+        except Exception as e:
+            error = {"success": False, "message": f"Error generating answer: {str(e)}"}
+            for question in unique:
+                yield from results_for(question, error)
+            return
+        
+        for question, result in cached:
+            yield from results_for(question, result)
+        
+        executor = ThreadPoolExecutor(max_workers=max(1, concurrency or Config.CHAT_BATCH_CONCURRENCY),
+                                      thread_name_prefix='chat-batch')
+        try:
+            futures = {}
+            for i, (question, relevant_content) in enumerate(zip(pending, contexts)):
+                if not relevant_content:
+                    yield from results_for(question, NO_CONTENT)
+                    continue
+                query_embedding = query_embeddings[i] if query_embeddings is not None else None
+                future = executor.submit(self._complete_answer, question, subject, class_level,
+                                         relevant_content, query_embedding)
+                futures[future] = question
+            
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"success": False, "message": f"Error generating answer: {str(e)}"}
+                yield from results_for(futures[future], result)
+        finally:
+            # A client that disconnects mid-batch cancels the LLM calls not yet started
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _lookup_cached_answers(self, questions: List[str], subject: str, class_level: str
+                               ) -> Tuple[List[Tuple[str, Dict[str, Any]]], List[str], Optional[np.ndarray]]:
+        """_lookup_cached_answer for a batch: (cached answers, questions left to answer, their embeddings)"""
+        cached = []
+        pending = questions
+        
+        if self.answer_cache is not None:
+            pending = []
+            with timed('answer_cache'):
+                for question in questions:
+                    answer = self.answer_cache.get(subject, class_level, question)
+                    if answer is not None:
+                        cached.append((question, answer))
+                    else:
+                        pending.append(question)
+        
+        semantic = self.answer_cache is not None and self.answer_cache.semantic
+        if not pending or (Config.SEARCH_MODE == 'bm25' and not semantic):
+            return cached, pending, None
+        
+        # One model call for the whole batch drives both the near-duplicate lookup and retrieval
+        query_embeddings = self.pdf_processor.encode_queries(pending)
+        
+        if semantic:
+            remaining = []
+            with timed('answer_cache'):
+                for i, question in enumerate(pending):
+                    answer = self.answer_cache.get_similar(subject, class_level, query_embeddings[i])
+                    if answer is not None:
+                        cached.append((question, answer))
+                    else:
+                        remaining.append(i)
+            pending = [pending[i] for i in remaining]
+            query_embeddings = query_embeddings[remaining]
+        
+        if self.answer_cache is not None:
+            for _ in pending:
+                self.answer_cache.record_miss()
+        
+        return cached, pending, query_embeddings
+    
+    def _lookup_cached_answer(self, question: str, subject: str,
+                              class_level: str) -> Tuple[Optional[Dict[str, Any]], Optional[np.ndarray]]:
+        """Check the answer cache, returning (cached answer, query embedding for retrieval)"""
+        if self.answer_cache is None:
+            return None, None
+        
+        with timed('answer_cache'):
+            cached = self.answer_cache.get(subject, class_level, question)
+        if cached is not None:
+            return cached, None
+        
+        # Encode once; the same embedding drives the near-duplicate lookup and retrieval
+        query_embedding = None
+        if self.answer_cache.semantic:
+            query_embedding = self.pdf_processor.encode_query(question)
+            with timed('answer_cache'):
+                cached = self.answer_cache.get_similar(subject, class_level, query_embedding)
+            if cached is not None:
+                return cached, query_embedding
+        
+        self.answer_cache.record_miss()
+        return None, query_embedding
+    
+    def _answer_result(self, question: str, subject: str, class_level: str, answer: str,
+                       query_embedding: Optional[np.ndarray] = None, cache: bool = True) -> Dict[str, Any]:
+        """Build the success response for a filtered answer and store it in the answer cache"""
+        result = {
+            "success": True,
+            "answer": answer,
+            "source": "Official Samacheer Kalvi Textbook",
+            "subject": subject,
+            "class": class_level
+        }
+        
+        # Extractive answers are cheap to rebuild and should not outlive an LLM outage
+        if cache and self.answer_cache is not None:
+            self.answer_cache.set(subject, class_level, question, result, query_embedding)
+        
+        return result
+    
+    def _build_answer_messages(self, question: str, subject: str, class_level: str,
+                               relevant_content: str) -> List[Dict[str, str]]:
+        """Build the chat messages for answering a question from textbook content"""
+        # Create enhanced prompt for better textbook-based answers
+        system_prompt = """You are an advanced AI tutor specializing in Tamil Nadu State Board Class 10 curriculum. 
+        
+        IMPORTANT INSTRUCTIONS:
+        1. Answer ONLY in English - NO Tamil text whatsoever
+        2. Base your answers strictly on the provided textbook content
+        3. Include specific page references and chapter information, taken from the [Chapter, Page] labels on the excerpts
+        4. Provide detailed explanations with examples from the textbook
+        5. Structure your response with clear headings and bullet points
+        6. Include study tips and exam preparation advice
+        7. Reference official Samacheer Kalvi textbook content only
+        
+        Format your response as:
+        **Answer from Samacheer Kalvi Textbook:**
+        [Detailed explanation based on textbook content]
+        
+        **Key Points:**
+        • [Important point 1]
+        • [Important point 2]
+        • [Important point 3]
+        
+        **Textbook Reference:**
+        Chapter: [Chapter name and number]
+        Page: [Page number]
+        
+        **Study Tip:**
+        [Helpful study advice related to the topic]
+        """
+        
+        user_prompt = f"""
+        Question: {question}
+        Subject: {subject.title()}
+        Class: {class_level}
+        
+        Relevant textbook content (each excerpt is labelled with its chapter and pages):
+        {relevant_content}
+        
+        Please provide a comprehensive answer based strictly on this textbook content. 
+        Remember: Answer only in English, no Tamil text.
+        """
+        
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def stream_answer(self, question: str, subject: str = "social", class_level: str = "10") -> Iterator[Dict[str, Any]]:
+        """Stream an answer as token events, ending with a done or error event"""
+        try:
+            cached, query_embedding = self._lookup_cached_answer(question, subject, class_level)
+            if cached is not None:
+                yield {"type": "token", "content": cached["answer"]}
+                yield dict(cached, type="done")
+                return
+            
+            relevant_content = self.pdf_processor.search_content(question, subject, class_level,
+                                                                 query_embedding=query_embedding)
+            
+            if not relevant_content:
+                yield {
+                    "type": "error",
                     "success": False,
                     "message": "No relevant content found in the textbook for this question."
                 }
+                return
             
-            # Create enhanced prompt for better textbook-based answers
-            system_prompt = """You are an advanced AI tutor specializing in Tamil Nadu State Board Class 10 curriculum. 
-            
-            IMPORTANT INSTRUCTIONS:
-            1. Answer ONLY in English - NO Tamil text whatsoever
-            2. Base your answers strictly on the provided textbook content
-            3. Include specific page references and chapter information
-            4. Provide detailed explanations with examples from the textbook
-            5. Structure your response with clear headings and bullet points
-            6. Include study tips and exam preparation advice
-            7. Reference official Samacheer Kalvi textbook content only
-            
-            Format your response as:
-            **Answer from Samacheer Kalvi Textbook:**
-            [Detailed explanation based on textbook content]
-            
-            **Key Points:**
-            • [Important point 1]
-            • [Important point 2]
-            • [Important point 3]
-            
-            **Textbook Reference:**
-            Chapter: [Chapter name and number]
-            Page: [Page number]
-            
-            **Study Tip:**
-            [Helpful study advice related to the topic]
-            """
-            
-            user_prompt = f"""
-            Question: {question}
-            Subject: {subject.title()}
-            Class: {class_level}
-            
-            Relevant textbook content:
-            {relevant_content}
-            
-            Please provide a comprehensive answer based strictly on this textbook content. 
-            Remember: Answer only in English, no Tamil text.
-            """
-            
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=1500,
-                temperature=0.3
-            )
+            llm_started = time.perf_counter()
+            with timed('llm_first_token'):
+                stream, backend = open_stream(
+                    self.backends["chat"], self.chat_fallback,
+                    self._build_answer_messages(question, subject, class_level, relevant_content),
+                    max_tokens=1500,
+                    temperature=0.3,
+                    query=question,
+                    context=relevant_content
+                )
             
-            answer = response.choices[0].message.content
+            # Filter Tamil text as tokens arrive instead of buffering the whole answer
+            tamil_filter = TamilTextFilter()
+            answer_parts = []
+            filter_seconds = 0.0
             
-            # Double-check to remove any Tamil text that might have slipped through
-            answer = self._remove_tamil_text(answer)
+            for delta in stream:
+                filter_started = time.perf_counter()
+                token = tamil_filter.feed(delta)
+                filter_seconds += time.perf_counter() - filter_started
+                if token:
+                    answer_parts.append(token)
+                    yield {"type": "token", "content": token}
             
-            return {
-                "success": True,
-                "answer": answer,
-                "source": "Official Samacheer Kalvi Textbook",
-                "subject": subject,
-                "class": class_level
-            }
+            # Includes time the client took to read each token
+            record_stage('llm_stream', time.perf_counter() - llm_started)
+            record_stage('tamil_filter', filter_seconds)
+            
+            result = self._answer_result(question, subject, class_level, ''.join(answer_parts), query_embedding,
+                                         cache=backend.generative)
+            yield dict(result, type="done")
             
         except Exception as e:
-            return {
+            yield {
+                "type": "error",
                 "success": False,
                 "message": f"Error generating answer: {str(e)}"
             }
@@ -101,53 +369,56 @@ class AIService:
         cleaned_text = re.sub(r'\s+', ' ', cleaned_text).strip()
         return cleaned_text
     
-    def generate_quiz_questions(self, subject: str, topic: str, count: int = 5) -> Dict[str, Any]:
-        """Generate quiz questions from textbook content"""
+    def generate_quiz_questions(self, subject: str, topic: str, count: int = 5,
+                                class_level: str = "10") -> Dict[str, Any]:
+        """Serve quiz questions from the question bank, generating more when it runs low"""
         try:
-            # Get content for the specific topic
-            content = self.pdf_processor.get_topic_content(subject, topic)
+            count = min(max(int(count), 1), Config.QUIZ_MAX_QUESTIONS)
+            
+            if self.quiz_bank is None:
+                questions = self._request_quiz_questions(subject, topic, count, class_level)
+            else:
+                available = self.quiz_bank.count(subject, topic, class_level)
+                questions = []
+                
+                if available < count:
+                    # Not enough banked questions yet, so generate on this request
+                    try:
+                        generated = self._request_quiz_questions(subject, topic,
+                                                                 max(count - available, Config.QUIZ_BANK_BATCH),
+                                                                 class_level)
+                    except Exception as e:
+                        if not available:
+                            raise
+                        # Serve the fewer banked questions rather than failing the request
+                        print(f"Error generating quiz questions for {topic}: {str(e)}")
+                        generated = []
+                    
+                    if generated is None and not available:
+                        questions = None
+                    elif generated:
+                        self.quiz_bank.add(subject, topic, generated, class_level)
+                
+                if questions is not None:
+                    questions = self.quiz_bank.sample(subject, topic, count, class_level)
+                    if self.quiz_bank.count(subject, topic, class_level) < Config.QUIZ_BANK_MIN_SIZE:
+                        self._schedule_quiz_top_up(subject, topic, class_level)
             
-            if not content:
+            if questions is None:
                 return {
                     "success": False,
                     "message": "No content found for this topic."
                 }
             
-            system_prompt = """You are creating quiz questions for Tamil Nadu Class 10 students based on official textbook content.
-            
-            Create multiple choice questions that:
-            1. Are based strictly on the provided textbook content
-            2. Test understanding of key concepts
-            3. Include proper explanations
-            4. Reference specific textbook pages
-            5. Are appropriate for Class 10 level
-            
-            Format each question as JSON with: question, options (array of 4), correct_answer (index), explanation, page_reference
-            """
-            
-            user_prompt = f"""
-            Create {count} multiple choice questions based on this textbook content:
-            
-            Subject: {subject}
-            Topic: {topic}
-            Content: {content}
-            
-            Return as a JSON array of questions.
-            """
-            
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=2000,
-                temperature=0.4
-            )
+            if not questions:
+                return {
+                    "success": False,
+                    "message": "Could not generate valid quiz questions for this topic."
+                }
             
             return {
                 "success": True,
-                "questions": response.choices[0].message.content
+                "questions": questions
             }
             
         except Exception as e:
@@ -155,3 +426,72 @@ class AIService:
                 "success": False,
                 "message": f"Error generating quiz: {str(e)}"
             }
+    
+    def _request_quiz_questions(self, subject: str, topic: str, count: int,
+                                class_level: str = "10") -> Optional[List[Dict[str, Any]]]:
+        """Ask the LLM for quiz questions; None if the topic has no textbook content"""
+        # Get content for the specific topic
+        content = self.pdf_processor.get_topic_content(subject, topic, class_level)
+        
+        if not content:
+            return None
+        
+        # Without a generative backend, quizzes are served from the question bank only
+        if not self.backends["quiz"].generative:
+            return []
+        
+        system_prompt = """You are creating quiz questions for Tamil Nadu Class 10 students based on official textbook content.
+        
+        Create multiple choice questions that:
+        1. Are based strictly on the provided textbook content
+        2. Test understanding of key concepts
+        3. Include proper explanations
+        4. Reference specific textbook pages
+        5. Are appropriate for Class 10 level
+        
+        Format each question as JSON with: question, options (array of 4), correct_answer (index), explanation, page_reference
+        """
+        
+        user_prompt = f"""
+        Create {count} multiple choice questions based on this textbook content:
+        
+        Subject: {subject}
+        Topic: {topic}
+        Content: {content}
+        
+        Return as a JSON array of questions.
+        """
+        
+        with timed('quiz_llm'):
+            content = self.backends["quiz"].complete(
+                [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                max_tokens=2000,
+                temperature=0.4
+            )
+        
+        return parse_quiz_questions(content)
+    
+    def _schedule_quiz_top_up(self, subject: str, topic: str, class_level: str = "10") -> None:
+        """Refill a topic's question bank in the background, once at a time per topic"""
+        key = (subject, class_level, topic.strip().lower())
+        
+        with self._quiz_top_up_lock:
+            if key in self._quiz_top_ups:
+                return
+            self._quiz_top_ups.add(key)
+        
+        threading.Thread(target=self._top_up_quiz_bank, args=(subject, topic, class_level, key), daemon=True).start()
+    
+    def _top_up_quiz_bank(self, subject: str, topic: str, class_level: str, key: Tuple[str, str, str]) -> None:
+        try:
+            generated = self._request_quiz_questions(subject, topic, Config.QUIZ_BANK_BATCH, class_level)
+            if generated:
+                self.quiz_bank.add(subject, topic, generated, class_level)
+        except Exception as e:
+            print(f"Error topping up quiz bank for {topic}: {str(e)}")
+        finally:
+            with self._quiz_top_up_lock:
+                self._quiz_top_ups.discard(key)
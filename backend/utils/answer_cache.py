@@ -0,0 +1,287 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+import numpy as np
+
+from config import Config
+
+
+def normalize_question(question: str) -> str:
+    """Normalize a question so trivial variations share a cache entry"""
+    question = re.sub(r'\s+', ' ', question.lower()).strip()
+    return question.rstrip('?.! ')
+
+
+def _entry_size(value: Dict[str, Any], embedding: Optional[np.ndarray]) -> int:
+    """Approximate memory used by a cached answer"""
+    size = len(json.dumps(value, ensure_ascii=False).encode('utf-8'))
+    if embedding is not None:
+        size += embedding.nbytes
+    return size
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache with a TTL and a byte budget"""
+
+    def __init__(self, ttl: float, max_bytes: int):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry["created"] > self.ttl:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry["value"]
+
+    def set(self, key: str, scope: str, value: Dict[str, Any], embedding: Optional[np.ndarray] = None) -> None:
+        size = _entry_size(value, embedding)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {
+                "scope": scope,
+                "value": value,
+                "embedding": embedding,
+                "size": size,
+                "created": time.time()
+            }
+            self.total_bytes += size
+
+            # Evict least recently used entries until back under budget
+            while self.total_bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+
+    def nearest(self, scope: str, embedding: np.ndarray, threshold: float) -> Optional[Dict[str, Any]]:
+        """Most similar live entry in scope whose cosine similarity is at least threshold"""
+        with self._lock:
+            cutoff = time.time() - self.ttl
+            candidates = [(key, entry) for key, entry in self._entries.items()
+                          if entry["scope"] == scope and entry["embedding"] is not None
+                          and entry["created"] >= cutoff]
+            if not candidates:
+                return None
+
+            similarities = np.stack([entry["embedding"] for _, entry in candidates]) @ embedding
+            best = int(np.argmax(similarities))
+            if similarities[best] < threshold:
+                return None
+
+            key, entry = candidates[best]
+            self._entries.move_to_end(key)
+            return entry["value"]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def clear_scope(self, scope: str) -> None:
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry["scope"] == scope]:
+                self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self.total_bytes -= entry["size"]
+
+
+class SQLiteCacheBackend:
+    """SQLite file cache shared by every worker on the host"""
+
+    def __init__(self, path: str, ttl: float, max_bytes: int):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections must not be used across fork(), so each worker process
+        # opens its own on first use; callers hold self._lock
+        if self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            with conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS answers ("
+                    "key TEXT PRIMARY KEY, scope TEXT, value TEXT, embedding BLOB, "
+                    "size INTEGER, created REAL, accessed REAL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS answers_scope ON answers (scope)")
+                conn.execute("CREATE INDEX IF NOT EXISTS answers_accessed ON answers (accessed)")
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock, self._connection() as conn:
+            row = conn.execute(
+                "SELECT value FROM answers WHERE key = ? AND created >= ?", (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE answers SET accessed = ? WHERE key = ?", (now, key))
+            return json.loads(row[0])
+
+    def set(self, key: str, scope: str, value: Dict[str, Any], embedding: Optional[np.ndarray] = None) -> None:
+        size = _entry_size(value, embedding)
+        if size > self.max_bytes:
+            return
+
+        blob = embedding.astype(np.float32).tobytes() if embedding is not None else None
+        now = time.time()
+
+        with self._lock, self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, scope, json.dumps(value, ensure_ascii=False), blob, size, now, now)
+            )
+            conn.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl,))
+
+            # Evict least recently used entries until back under budget
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM answers").fetchone()[0]
+            if total > self.max_bytes:
+                rows = conn.execute("SELECT key, size FROM answers ORDER BY accessed").fetchall()
+                evicted = []
+                for old_key, old_size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    evicted.append((old_key,))
+                    total -= old_size
+                conn.executemany("DELETE FROM answers WHERE key = ?", evicted)
+
+    def nearest(self, scope: str, embedding: np.ndarray, threshold: float) -> Optional[Dict[str, Any]]:
+        """Most similar live entry in scope whose cosine similarity is at least threshold"""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT key, value, embedding FROM answers "
+                "WHERE scope = ? AND embedding IS NOT NULL AND created >= ?",
+                (scope, time.time() - self.ttl)
+            ).fetchall()
+        if not rows:
+            return None
+
+        matrix = np.stack([np.frombuffer(row[2], dtype=np.float32) for row in rows])
+        similarities = matrix @ embedding
+        best = int(np.argmax(similarities))
+        if similarities[best] < threshold:
+            return None
+
+        with self._lock, self._connection() as conn:
+            conn.execute("UPDATE answers SET accessed = ? WHERE key = ?", (time.time(), rows[best][0]))
+        return json.loads(rows[best][1])
+
+    def clear(self) -> None:
+        with self._lock, self._connection() as conn:
+            conn.execute("DELETE FROM answers")
+
+    def clear_scope(self, scope: str) -> None:
+        with self._lock, self._connection() as conn:
+            conn.execute("DELETE FROM answers WHERE scope = ?", (scope,))
+
+
+class AnswerCache:
+    """Answer cache keyed on (subject, class level, normalized question)"""
+
+    def __init__(self, backend: Any, similarity_threshold: float = 0.0):
+        self.backend = backend
+        # Near-duplicate lookup is disabled when the threshold is 0
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @property
+    def semantic(self) -> bool:
+        return self.similarity_threshold > 0
+
+    @staticmethod
+    def _scope(subject: str, class_level: str) -> str:
+        return f"{subject}_{class_level}"
+
+    def _key(self, subject: str, class_level: str, question: str) -> str:
+        return f"{self._scope(subject, class_level)}:{normalize_question(question)}"
+
+    def get(self, subject: str, class_level: str, question: str) -> Optional[Dict[str, Any]]:
+        """Exact lookup on the normalized question"""
+        value = self.backend.get(self._key(subject, class_level, question))
+        if value is not None:
+            self.hits += 1
+        return value
+
+    def get_similar(self, subject: str, class_level: str,
+                    query_embedding: np.ndarray) -> Optional[Dict[str, Any]]:
+        """Near-duplicate lookup reusing the normalized query embedding from retrieval"""
+        if not self.semantic:
+            return None
+        value = self.backend.nearest(self._scope(subject, class_level), query_embedding, self.similarity_threshold)
+        if value is not None:
+            self.semantic_hits += 1
+        return value
+
+    def record_miss(self) -> None:
+        self.misses += 1
+
+    def set(self, subject: str, class_level: str, question: str, value: Dict[str, Any],
+            query_embedding: Optional[np.ndarray] = None) -> None:
+        self.backend.set(self._key(subject, class_level, question), self._scope(subject, class_level),
+                         value, query_embedding if self.semantic else None)
+
+    def invalidate(self, subject: str, class_level: str) -> None:
+        """Drop every answer for one textbook, e.g. after its PDF was replaced"""
+        self.backend.clear_scope(self._scope(subject, class_level))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.semantic_hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits + self.semantic_hits) / lookups if lookups else 0.0
+        }
+
+
+def create_answer_cache() -> Optional[AnswerCache]:
+    """Build the answer cache selected by Config, or None if caching is disabled"""
+    backend_name = Config.ANSWER_CACHE_BACKEND
+
+    if backend_name == 'memory':
+        backend = MemoryCacheBackend(Config.CACHE_TIMEOUT, Config.ANSWER_CACHE_MAX_BYTES)
+    elif backend_name == 'sqlite':
+        backend = SQLiteCacheBackend(Config.ANSWER_CACHE_PATH, Config.CACHE_TIMEOUT, Config.ANSWER_CACHE_MAX_BYTES)
+    else:
+        return None
+
+    return AnswerCache(backend, similarity_threshold=Config.ANSWER_CACHE_SIMILARITY)
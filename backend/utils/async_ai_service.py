@@ -0,0 +1,142 @@
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, AsyncIterator, Callable
+
+from config import Config
+from .ai_service import AIService, TamilTextFilter
+from .llm_backends import acomplete_with_fallback, aopen_stream
+from .metrics import record_stage, timed
+
+
+class AsyncAIService:
+    """asyncio front end to AIService: LLM calls wait concurrently, CPU work runs in a bounded pool"""
+
+    def __init__(self, ai_service: AIService, llm_concurrency: int = Config.ASYNC_LLM_CONCURRENCY,
+                 cpu_workers: int = Config.ASYNC_CPU_WORKERS, max_inflight: int = Config.ASYNC_MAX_INFLIGHT):
+        self.ai_service = ai_service
+        self.pdf_processor = ai_service.pdf_processor
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        # Embedding and similarity are CPU bound, so only a few run at once
+        self._executor = ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix='retrieval')
+        self._llm_semaphore = asyncio.Semaphore(llm_concurrency)
+
+    def try_acquire(self) -> bool:
+        """Admit a request unless max_inflight are already running (called on the event loop)"""
+        if self.inflight >= self.max_inflight:
+            return False
+        self.inflight += 1
+        return True
+
+    def release(self) -> None:
+        self.inflight -= 1
+
+    async def run_cpu(self, func: Callable, *args, **kwargs) -> Any:
+        """Run blocking retrieval work in the bounded executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def search_content(self, query: str, subject: str, class_level: str = "10", **options: Any) -> str:
+        return await self.run_cpu(self.pdf_processor.search_content, query, subject, class_level, **options)
+
+    async def generate_answer(self, question: str, subject: str = "social", class_level: str = "10") -> Dict[str, Any]:
+        """Async equivalent of AIService.generate_answer"""
+        service = self.ai_service
+        try:
+            cached, query_embedding = await self.run_cpu(service._lookup_cached_answer, question, subject, class_level)
+            if cached is not None:
+                return cached
+
+            relevant_content = await self.run_cpu(self.pdf_processor.search_content, question, subject,
+                                                  class_level, query_embedding=query_embedding)
+
+            if not relevant_content:
+                return {
+                    "success": False,
+                    "message": "No relevant content found in the textbook for this question."
+                }
+
+            with timed('llm'):
+                async with self._llm_semaphore:
+                    answer, backend = await acomplete_with_fallback(
+                        service.backends["chat"], service.chat_fallback,
+                        service._build_answer_messages(question, subject, class_level, relevant_content),
+                        max_tokens=1500,
+                        temperature=0.3,
+                        query=question,
+                        context=relevant_content
+                    )
+
+            with timed('tamil_filter'):
+                answer = service._remove_tamil_text(answer)
+
+            return await self.run_cpu(service._answer_result, question, subject, class_level, answer, query_embedding,
+                                      cache=backend.generative)
+
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"Error generating answer: {str(e)}"
+            }
+
+    async def stream_answer(self, question: str, subject: str = "social",
+                            class_level: str = "10") -> AsyncIterator[Dict[str, Any]]:
+        """Async equivalent of AIService.stream_answer"""
+        service = self.ai_service
+        try:
+            cached, query_embedding = await self.run_cpu(service._lookup_cached_answer, question, subject, class_level)
+            if cached is not None:
+                yield {"type": "token", "content": cached["answer"]}
+                yield dict(cached, type="done")
+                return
+
+            relevant_content = await self.run_cpu(self.pdf_processor.search_content, question, subject,
+                                                  class_level, query_embedding=query_embedding)
+
+            if not relevant_content:
+                yield {
+                    "type": "error",
+                    "success": False,
+                    "message": "No relevant content found in the textbook for this question."
+                }
+                return
+
+            tamil_filter = TamilTextFilter()
+            answer_parts = []
+            filter_seconds = 0.0
+            llm_started = time.perf_counter()
+
+            async with self._llm_semaphore:
+                with timed('llm_first_token'):
+                    stream, backend = await aopen_stream(
+                        service.backends["chat"], service.chat_fallback,
+                        service._build_answer_messages(question, subject, class_level, relevant_content),
+                        max_tokens=1500,
+                        temperature=0.3,
+                        query=question,
+                        context=relevant_content
+                    )
+
+                async for delta in stream:
+                    filter_started = time.perf_counter()
+                    token = tamil_filter.feed(delta)
+                    filter_seconds += time.perf_counter() - filter_started
+                    if token:
+                        answer_parts.append(token)
+                        yield {"type": "token", "content": token}
+
+            record_stage('llm_stream', time.perf_counter() - llm_started)
+            record_stage('tamil_filter', filter_seconds)
+
+            result = await self.run_cpu(service._answer_result, question, subject, class_level,
+                                        ''.join(answer_parts), query_embedding, cache=backend.generative)
+            yield dict(result, type="done")
+
+        except Exception as e:
+            yield {
+                "type": "error",
+                "success": False,
+                "message": f"Error generating answer: {str(e)}"
+            }
@@ -0,0 +1,79 @@
+import math
+import re
+import sys
+from collections import Counter, defaultdict
+from typing import List, Dict, Tuple
+
+import numpy as np
+
+from .retrieval import top_k_indices
+
+# Words, numbers, and dotted or apostrophised forms such as "1.1", "370" or "nation's"
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.'][a-z0-9]+)*")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this "
+    "to was were what when where which who why how with did does do".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords removed"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 inverted index over a fixed list of documents"""
+
+    def __init__(self, documents: List[str], k1: float = 1.5, b: float = 0.75):
+        self.size = len(documents)
+        term_postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        doc_lengths = np.zeros(self.size, dtype=np.float32)
+
+        for doc_id, document in enumerate(documents):
+            counts = Counter(tokenize(document))
+            doc_lengths[doc_id] = sum(counts.values())
+            for term, tf in counts.items():
+                term_postings[term].append((doc_id, tf))
+
+        average_length = float(doc_lengths.mean()) if self.size else 0.0
+        norms = k1 * (1 - b + b * doc_lengths / (average_length or 1.0))
+
+        # Store each posting's final BM25 weight so a query is just a few array adds
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for term, postings in term_postings.items():
+            doc_ids = np.fromiter((doc_id for doc_id, _ in postings), dtype=np.int32, count=len(postings))
+            tfs = np.fromiter((tf for _, tf in postings), dtype=np.float32, count=len(postings))
+            idf = math.log(1 + (self.size - len(postings) + 0.5) / (len(postings) + 0.5))
+            self.postings[term] = (doc_ids, idf * tfs * (k1 + 1) / (tfs + norms[doc_ids]))
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory of the posting arrays and term keys"""
+        return sum(sys.getsizeof(term) + doc_ids.nbytes + weights.nbytes
+                   for term, (doc_ids, weights) in self.postings.items())
+
+    def candidate_scores(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Documents matching at least one query term and their BM25 scores"""
+        postings = [self.postings[term] for term in set(tokenize(query)) if term in self.postings]
+        if not postings:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        if len(postings) == 1:
+            return postings[0]
+
+        # Cost follows the matched postings, not the corpus size. Each posting list is
+        # already in document order, so the stable sort only has to merge them
+        doc_ids = np.concatenate([doc_ids for doc_ids, _ in postings])
+        order = np.argsort(doc_ids, kind='stable')
+        doc_ids = doc_ids[order]
+        starts = np.flatnonzero(np.r_[True, doc_ids[1:] != doc_ids[:-1]])
+        weights = np.concatenate([weights for _, weights in postings])[order]
+        return doc_ids[starts], np.add.reduceat(weights, starts)
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[int, float]]:
+        """Top-k (document, score) pairs with at least one matching term"""
+        doc_ids, scores = self.candidate_scores(query)
+        return [(int(doc_ids[idx]), score) for idx, score in top_k_indices(scores, k, 0.0)]
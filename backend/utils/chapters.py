@@ -0,0 +1,65 @@
+import re
+from typing import List, Tuple
+
+# A line that opens a chapter, e.g. "Chapter 3 The Freedom Struggle"
+CHAPTER_LINE = re.compile(r'(Chapter|CHAPTER)\s+(\d+)', re.IGNORECASE)
+
+# Numbered section lines such as "1.1 Causes of the War"
+SECTION_LINE = re.compile(r'\d+\.\d+')
+
+MAX_TOPICS = 10
+
+# (title, body start, body end, topics) of one chapter
+ChapterSpan = Tuple[str, int, int, List[str]]
+
+
+def is_chapter_heading(line: str) -> bool:
+    """Whether a stripped line opens a new chapter"""
+    return CHAPTER_LINE.match(line) is not None
+
+
+def is_topic(line: str) -> bool:
+    """Whether a stripped line inside a chapter looks like a section heading"""
+    if SECTION_LINE.match(line):
+        return True
+    # Headings in all caps or title case
+    return 10 < len(line) < 100 and (line.isupper() or line.istitle())
+
+
+class ChapterScanner:
+    """Finds chapter spans and their topics one line at a time, as PDFProcessor._chapter_spans does for a whole text"""
+
+    def __init__(self):
+        self.chapters: List[ChapterSpan] = []
+        self._title = None
+        self._body_start = 0
+        self._topics: List[str] = []
+        self._has_content = False
+
+    def feed(self, line: str, start: int, end: int) -> None:
+        """Consume one line spanning [start, end), excluding its newline"""
+        line = line.strip()
+        if not line:
+            return
+
+        if is_chapter_heading(line):
+            self._close(start)
+            self._title = line
+            self._body_start = end + 1
+            self._topics = []
+            self._has_content = False
+        elif self._title is not None:
+            self._has_content = True
+            if len(self._topics) < MAX_TOPICS and is_topic(line):
+                self._topics.append(line)
+
+    def finish(self, end: int) -> List[ChapterSpan]:
+        """Close the last chapter at end and return every chapter that has content"""
+        self._close(end)
+        self._title = None
+        return self.chapters
+
+    def _close(self, end: int) -> None:
+        # Chapters with only a heading are dropped, as _structure_content drops empty content
+        if self._title is not None and self._has_content:
+            self.chapters.append((self._title, self._body_start, end, self._topics))
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import re
+import sys
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from .bm25 import BM25Index
+from .retrieval import DenseRetriever, lexical_floor, reciprocal_rank_fusion, shortlist_search
+
+# Bump when the on-disk layout or chunking changes so stale indexes are rebuilt
+INDEX_VERSION = 2
+
+
+def file_sha256(path: str, block_size: int = 1024 * 1024) -> str:
+    """Compute the SHA-256 hex digest of a file without reading it all at once"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def normalize_embeddings(embeddings: Any) -> np.ndarray:
+    """Return L2-normalized float32 embeddings so cosine similarity is a dot product"""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+
+class ChunkIndex:
+    """Build-once chunk embedding index for a single textbook"""
+
+    def __init__(self, chunks: List[str], page_spans: List[Tuple[int, int]], chapters: List[Optional[str]],
+                 embeddings: np.ndarray, metadata: Dict[str, Any], dtype: str = 'float32'):
+        self.chunks = chunks
+        self.page_spans = page_spans
+        self.chapters = chapters
+        self.embeddings = embeddings
+        self.metadata = metadata
+        # Always stored as float32 on disk; dtype only affects the in-memory scoring copy
+        self.retriever = DenseRetriever(embeddings, dtype)
+        self._bm25 = None
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate private memory: chunk texts, any in-memory scoring matrix and the BM25 postings"""
+        size = sum(sys.getsizeof(chunk) for chunk in self.chunks)
+        if not isinstance(self.retriever.matrix, np.memmap):
+            size += self.retriever.nbytes
+        if self._bm25 is not None:
+            size += self._bm25.nbytes
+        return size
+
+    @property
+    def bm25(self) -> BM25Index:
+        """Inverted index over the same chunks, built on first lexical query"""
+        if self._bm25 is None:
+            self._bm25 = BM25Index(self.chunks)
+        return self._bm25
+
+    def chunk_record(self, idx: int, score: float = 0.0, rrf_score: Optional[float] = None) -> Dict[str, Any]:
+        """A chunk's text with its page and chapter metadata"""
+        first_page, last_page = self.page_spans[idx]
+        record = {
+            "text": self.chunks[idx],
+            "first_page": first_page,
+            "last_page": last_page,
+            "chapter": self.chapters[idx],
+            "score": score
+        }
+        if rrf_score is not None:
+            record["rrf_score"] = rrf_score
+        return record
+
+    @classmethod
+    def build(cls, chunks: List[str], page_spans: List[Tuple[int, int]], chapters: List[Optional[str]],
+              model: Any, model_name: str, pdf_hash: str, chunking: str,
+              dtype: str = 'float32') -> 'ChunkIndex':
+        """Embed every chunk once and wrap the normalized matrix in an index"""
+        if chunks:
+            embeddings = normalize_embeddings(model.encode(chunks, show_progress_bar=False))
+        else:
+            embeddings = np.zeros((0, 0), dtype=np.float32)
+
+        metadata = {
+            "version": INDEX_VERSION,
+            "pdf_sha256": pdf_hash,
+            "model": model_name,
+            "chunking": chunking,
+        }
+        return cls(chunks, page_spans, chapters, embeddings, metadata, dtype)
+
+    @staticmethod
+    def _paths(index_dir: str, name: str, model_name: str) -> Tuple[str, str]:
+        """Embedding matrix and metadata sidecar paths for a textbook/model pair"""
+        model_slug = re.sub(r'[^A-Za-z0-9_.-]+', '-', model_name)
+        base = os.path.join(index_dir, f"{name}.{model_slug}")
+        return f"{base}.npy", f"{base}.json"
+
+    def save(self, index_dir: str, name: str) -> None:
+        """Write the embedding matrix and metadata sidecar atomically"""
+        os.makedirs(index_dir, exist_ok=True)
+        matrix_path, meta_path = self._paths(index_dir, name, self.metadata["model"])
+
+        tmp_matrix = f"{matrix_path}.{os.getpid()}.tmp"
+        with open(tmp_matrix, 'wb') as file:
+            np.save(file, self.embeddings)
+
+        sidecar = dict(self.metadata)
+        sidecar["chunks"] = self.chunks
+        sidecar["page_spans"] = [list(span) for span in self.page_spans]
+        sidecar["chapters"] = self.chapters
+        tmp_meta = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp_meta, 'w', encoding='utf-8') as file:
+            json.dump(sidecar, file, ensure_ascii=False)
+
+        # Replace the matrix first; the sidecar is what marks the index valid
+        os.replace(tmp_matrix, matrix_path)
+        os.replace(tmp_meta, meta_path)
+
+    @classmethod
+    def load(cls, index_dir: str, name: str, pdf_hash: str, model_name: str,
+             chunking: str, dtype: str = 'float32') -> Optional['ChunkIndex']:
+        """Load a saved index, or return None if it is missing or stale"""
+        matrix_path, meta_path = cls._paths(index_dir, name, model_name)
+        if not (os.path.exists(matrix_path) and os.path.exists(meta_path)):
+            return None
+
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as file:
+                sidecar = json.load(file)
+
+            if (sidecar.get("version") != INDEX_VERSION
+                    or sidecar.get("pdf_sha256") != pdf_hash
+                    or sidecar.get("model") != model_name
+                    or sidecar.get("chunking") != chunking):
+                return None
+
+            embeddings = np.load(matrix_path, mmap_mode='r')
+            chunks = sidecar.pop("chunks")
+            page_spans = [tuple(span) for span in sidecar.pop("page_spans")]
+            chapters = sidecar.pop("chapters")
+            if len(chunks) != embeddings.shape[0]:
+                return None
+
+            return cls(chunks, page_spans, chapters, embeddings, sidecar, dtype)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error loading chunk index {meta_path}: {str(e)}")
+            return None
+
+    def search(self, query_embedding: Optional[np.ndarray], top_k: int = 3, threshold: float = 0.3,
+               query_text: str = "", mode: str = 'dense', candidates: int = 100) -> List[Tuple]:
+        """Return (chunk index, score) pairs for a query.
+
+        mode is one of:
+            dense: cosine similarity of the normalized query embedding
+            bm25: lexical BM25 scores only (no embedding needed)
+            hybrid: reciprocal rank fusion of the dense and BM25 rankings, over chunks whose
+                cosine similarity clears threshold; returns (chunk index, cosine, fused score)
+            shortlist: BM25 picks `candidates` chunks, dense similarity re-scores just those
+        """
+        embeddings = None if query_embedding is None else query_embedding[None, :]
+        return self.search_many(embeddings, [query_text], top_k, threshold, mode, candidates)[0]
+
+    def search_many(self, query_embeddings: Optional[np.ndarray], query_texts: List[str], top_k: int = 3,
+                    threshold: float = 0.3, mode: str = 'dense',
+                    candidates: int = 100) -> List[List[Tuple]]:
+        """search() for several queries, with all their dense scoring in one matrix multiply"""
+        if not len(self):
+            return [[] for _ in query_texts]
+
+        if mode == 'bm25':
+            return [self.bm25.search(text, top_k) for text in query_texts]
+
+        if mode == 'hybrid':
+            dense = self.search_batch(query_embeddings, candidates, threshold)
+            fused = []
+            for query, ranking, text in zip(query_embeddings, dense, query_texts):
+                lexical, similarity = lexical_floor(self.retriever, query, ranking,
+                                                    self.bm25.search(text, candidates), threshold)
+                fused.append([(idx, similarity[idx], score)
+                              for idx, score in reciprocal_rank_fusion([ranking, lexical], top_k)])
+            return fused
+
+        results: List[Optional[List[Tuple[int, float]]]] = [None] * len(query_texts)
+        if mode == 'shortlist':
+            for i, text in enumerate(query_texts):
+                results[i] = shortlist_search(self.retriever, self.bm25.search(text, candidates),
+                                              query_embeddings[i], top_k, threshold)
+
+        # Dense mode, and shortlist queries with too little lexical overlap: score the whole book
+        pending = [i for i, matches in enumerate(results) if matches is None]
+        if pending:
+            for i, matches in zip(pending, self.search_batch(query_embeddings[pending], top_k, threshold)):
+                results[i] = matches
+        return results
+
+    def search_batch(self, query_embeddings: np.ndarray, top_k: int = 3,
+                     threshold: float = 0.3) -> List[List[Tuple[int, float]]]:
+        """Score several normalized queries against the index in one matrix multiply"""
+        if not len(self):
+            return [[] for _ in range(len(query_embeddings))]
+
+        return self.retriever.search(query_embeddings, top_k, threshold)
@@ -0,0 +1,148 @@
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# The markers PDFProcessor._join_pages writes between pages
+PAGE_MARKER = re.compile(r'\n--- Page (\d+) ---\n')
+PAGE_MARKER_TEXT = re.compile(r'--- Page \d+ ---')
+
+CHAPTER_HEADING = re.compile(r'(Chapter|CHAPTER)\s+\d+', re.IGNORECASE)
+
+# Split points inside a page: sentence ends, numbered section headings such as
+# "1.2 The Revolt", and the blank lines _clean_text puts before chapter/unit headings
+UNIT_BOUNDARY = re.compile(r'(?<=[.!?])\s+(?=["\'(]?[A-Z0-9])|\s+(?=\d+\.\d+\s+[A-Z])|\n\n+')
+
+WORD = re.compile(r'\S+')
+
+# Rough tokens per whitespace word for English textbook prose with the GPT tokenizers
+TOKENS_PER_WORD = 4 / 3
+
+# A truncated excerpt shorter than this is not worth its label
+MIN_PARTIAL_TOKENS = 50
+
+# (start, end, first page, last page, chapter) span of one chunk
+ChunkSpan = Tuple[int, int, int, int, Optional[str]]
+
+# (start, end, words, page, chapter) of one sentence-like unit
+Unit = Tuple[int, int, int, int, Optional[str]]
+
+
+def page_units(text: str, start: int, end: int, page: int, chapter: Optional[str],
+               max_words: int) -> Iterator[Unit]:
+    """Sentence-like units of one page's text[start:end]; chapter is the one open when the page begins"""
+    position = start
+    pieces = []
+    for boundary in UNIT_BOUNDARY.finditer(text, start, end):
+        pieces.append((position, boundary.start()))
+        position = boundary.end()
+    pieces.append((position, end))
+
+    for piece_start, piece_end in pieces:
+        words = [match.span() for match in WORD.finditer(text, piece_start, piece_end)]
+        if not words:
+            continue
+
+        heading = CHAPTER_HEADING.match(text, words[0][0])
+        if heading:
+            chapter = heading.group(0)
+
+        # Over-long "sentences" (tables, run-on OCR text) are cut into word windows
+        for first in range(0, len(words), max_words):
+            window = words[first:first + max_words]
+            yield (window[0][0], window[-1][1], len(window), page, chapter)
+
+
+def _units(text: str, max_words: int) -> Iterator[Unit]:
+    """Units of a full text with page markers, never crossing a marker"""
+    markers = list(PAGE_MARKER.finditer(text))
+    chapter = None
+
+    for i, marker in enumerate(markers):
+        body_end = markers[i + 1].start() if i + 1 < len(markers) else len(text)
+        for unit in page_units(text, marker.end(), body_end, int(marker.group(1)), chapter, max_words):
+            chapter = unit[4]
+            yield unit
+
+
+def iter_chunk_spans(units: Iterable[Unit], chunk_words: int = 200, overlap_words: int = 40) -> Iterator[ChunkSpan]:
+    """Group a stream of units into chunks, holding only the units of the chunk being built"""
+    current: List[Unit] = []
+    current_words = 0
+
+    for unit in units:
+        new_chapter = current and unit[4] != current[-1][4]
+
+        if current and (new_chapter or current_words + unit[2] > chunk_words):
+            yield (current[0][0], current[-1][1], current[0][3], current[-1][3], current[0][4])
+            if new_chapter:
+                current, current_words = [], 0
+            else:
+                # Carry trailing sentences forward, but always drop at least one
+                keep = []
+                kept_words = 0
+                for previous in reversed(current[1:]):
+                    if kept_words + previous[2] > overlap_words:
+                        break
+                    keep.insert(0, previous)
+                    kept_words += previous[2]
+                current, current_words = keep, kept_words
+
+        current.append(unit)
+        current_words += unit[2]
+
+    if current:
+        yield (current[0][0], current[-1][1], current[0][3], current[-1][3], current[0][4])
+
+
+def chunk_spans(text: str, chunk_words: int = 200, overlap_words: int = 40) -> List[ChunkSpan]:
+    """Group sentences into ~chunk_words chunks that share ~overlap_words with their neighbour.
+
+    Chunks never straddle a chapter heading, and each records the pages it covers.
+    """
+    chunk_words = max(1, chunk_words)
+    return list(iter_chunk_spans(_units(text, chunk_words), chunk_words, overlap_words))
+
+
+def chunk_text(text: str, start: int, end: int) -> str:
+    """Chunk text for a span, without page markers and with whitespace collapsed"""
+    return ' '.join(PAGE_MARKER_TEXT.sub(' ', text[start:end]).split())
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap prompt token estimate from the word count"""
+    return int(len(text.split()) * TOKENS_PER_WORD) + 1
+
+
+def format_reference(chapter: Optional[str], first_page: int, last_page: int, book: Optional[str] = None) -> str:
+    """Bracketed source label such as "[Chapter 3, Pages 41-42]", prefixed with the book when given"""
+    if first_page == last_page:
+        pages = f"Page {first_page}"
+    else:
+        pages = f"Pages {first_page}-{last_page}"
+    return f"[{', '.join(part for part in (book, chapter, pages) if part)}]"
+
+
+def assemble_context(chunks: List[Dict[str, Any]], token_budget: int) -> str:
+    """Pack retrieved chunks, best first, into a prompt token budget with page labels.
+
+    Each chunk is a dict with text, first_page, last_page and chapter keys, plus an
+    optional book key for results merged from several textbooks. The chunk
+    that crosses the budget is truncated if enough room is left, and the rest dropped.
+    """
+    parts = []
+    used = 0
+
+    for chunk in chunks:
+        label = format_reference(chunk.get("chapter"), chunk["first_page"], chunk["last_page"], chunk.get("book"))
+        cost = estimate_tokens(label) + estimate_tokens(chunk["text"])
+
+        if used + cost > token_budget:
+            remaining = token_budget - used - estimate_tokens(label)
+            if remaining >= MIN_PARTIAL_TOKENS:
+                words = chunk["text"].split()[:int(remaining / TOKENS_PER_WORD)]
+                parts.append(f"{label}\n{' '.join(words)} ...")
+            break
+
+        parts.append(f"{label}\n{chunk['text']}")
+        used += cost
+
+    return '\n\n'.join(parts)
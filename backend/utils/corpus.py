@@ -0,0 +1,312 @@
+import io
+import json
+import mmap
+import os
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from .chapters import ChapterScanner
+from .chunk_index import file_sha256
+from .chunker import Unit, chunk_text, iter_chunk_spans, page_units
+from .lru_cache import deep_sizeof
+from .topic_index import compact_structure
+
+# Bump when the artifact layout, cleaning or chunking changes so books are re-ingested
+ARTIFACT_VERSION = 2
+
+
+def _byte_offsets(text: str, char_offsets: List[int]) -> Dict[int, int]:
+    """Map character offsets in text to UTF-8 byte offsets in a single pass"""
+    mapping = {}
+    previous = 0
+    byte_pos = 0
+
+    for offset in sorted(set(char_offsets)):
+        byte_pos += len(text[previous:offset].encode('utf-8'))
+        previous = offset
+        mapping[offset] = byte_pos
+
+    return mapping
+
+
+class TextbookArtifact:
+    """Precompiled textbook: one UTF-8 text buffer plus page, chapter and chunk offsets"""
+
+    def __init__(self, meta: Dict[str, Any], buffer: Any):
+        self.meta = meta
+        # Either bytes (freshly built) or a read-only mmap of the text file
+        self.buffer = buffer
+
+    @property
+    def sha256(self) -> str:
+        return self.meta["source"]["sha256"]
+
+    @property
+    def chunking(self) -> str:
+        return self.meta["chunking"]
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate private memory: the metadata plus the text buffer unless it is memory-mapped"""
+        size = deep_sizeof(self.meta)
+        if not isinstance(self.buffer, mmap.mmap):
+            size += len(self.buffer)
+        return size
+
+    @property
+    def full_text(self) -> str:
+        return self.text(0, len(self.buffer))
+
+    def text(self, start: int, end: int) -> str:
+        """Decode a byte range of the text buffer"""
+        return self.buffer[start:end].decode('utf-8')
+
+    def page_text(self, page_num: int) -> str:
+        """Cleaned text of a single page, or an empty string if it had none"""
+        for number, start, end in self.meta["pages"]:
+            if number == page_num:
+                return self.text(start, end)
+        return ""
+
+    def structured_content(self, subject: str) -> Dict[str, Any]:
+        """Rebuild the chapter/topic structure returned by PDFProcessor._structure_content"""
+        chapters = {}
+
+        for chapter in self.meta["chapters"]:
+            chapters[chapter["title"]] = {
+                "title": chapter["title"],
+                "content": _normalize_lines(self.text(chapter["start"], chapter["end"])),
+                "topics": chapter["topics"]
+            }
+
+        return compact_structure(subject, chapters)
+
+    def chunks(self) -> Tuple[List[str], List[Tuple[int, int]], List[Optional[str]]]:
+        """Chunk texts, the (first, last) page each spans and the chapter each belongs to"""
+        chunks = []
+        page_spans = []
+        chapters = []
+
+        for start, end, first_page, last_page, chapter in self.meta["chunks"]:
+            text = self.text(start, end)
+            chunks.append(chunk_text(text, 0, len(text)))
+            page_spans.append((first_page, last_page))
+            chapters.append(chapter)
+
+        return chunks, page_spans, chapters
+
+    def is_fresh(self, pdf_path: str) -> bool:
+        """Cheap staleness check against the source PDF's size and mtime"""
+        try:
+            stat = os.stat(pdf_path)
+        except OSError:
+            return False
+
+        source = self.meta["source"]
+        return source["size"] == stat.st_size and source["mtime_ns"] == stat.st_mtime_ns
+
+    @staticmethod
+    def _paths(index_dir: str, name: str) -> Tuple[str, str]:
+        base = os.path.join(index_dir, f"{name}.corpus")
+        return f"{base}.txt", f"{base}.json"
+
+    @staticmethod
+    def stored_names(index_dir: str) -> List[str]:
+        """Names of the artifacts saved in index_dir"""
+        try:
+            filenames = os.listdir(index_dir)
+        except OSError:
+            return []
+        return [filename[:-len('.corpus.json')] for filename in filenames if filename.endswith('.corpus.json')]
+
+    @classmethod
+    def build(cls, processor: Any, pdf_path: str, timeout: Optional[float] = None) -> Optional['TextbookArtifact']:
+        """Extract, clean and structure a PDF into an in-memory artifact"""
+        sink = io.BytesIO()
+        meta = cls._stream(processor, pdf_path, sink, timeout)
+        return None if meta is None else cls(meta, sink.getvalue())
+
+    @classmethod
+    def compile(cls, processor: Any, pdf_path: str, index_dir: str, name: str,
+                timeout: Optional[float] = None) -> Optional['TextbookArtifact']:
+        """Build straight into index_dir and memory-map the result; page text never accumulates in memory"""
+        os.makedirs(index_dir, exist_ok=True)
+        text_path, meta_path = cls._paths(index_dir, name)
+        tmp_text = f"{text_path}.{os.getpid()}.tmp"
+
+        try:
+            with open(tmp_text, 'wb') as sink:
+                meta = cls._stream(processor, pdf_path, sink, timeout)
+            if meta is None:
+                return None
+            cls._publish(tmp_text, meta, index_dir, name)
+        finally:
+            if os.path.exists(tmp_text):
+                os.remove(tmp_text)
+
+        return cls.load(index_dir, name)
+
+    @staticmethod
+    def _stream(processor: Any, pdf_path: str, sink: BinaryIO, timeout: Optional[float]) -> Optional[Dict[str, Any]]:
+        """Run pages through cleaning, chapter detection and chunking in one pass, writing text to sink.
+
+        Each stage is a generator, so only the current page and the chunk being
+        built are held in memory. Returns the metadata, or None if no text came out.
+        """
+        page_spans = []
+        scanner = ChapterScanner()
+        chunk_words = max(1, processor.chunk_words)
+        position = 0
+
+        def units() -> Iterator[Unit]:
+            nonlocal position
+            chapter = None
+
+            for page_num, page_text in processor.iter_pages(pdf_path, timeout=timeout):
+                # Same layout as PDFProcessor._join_pages: "\n--- Page N ---\n<text>\n"
+                marker = f"--- Page {page_num} ---"
+                body = page_text.encode('utf-8')
+                text_start = position + len(marker) + 2
+                sink.write(f"\n{marker}\n".encode('utf-8'))
+                sink.write(body)
+                sink.write(b"\n")
+                page_spans.append([page_num, text_start, text_start + len(body)])
+
+                lines = []
+                line_start = 0
+                for line in page_text.split('\n'):
+                    lines.append((line, line_start, line_start + len(line)))
+                    line_start += len(line) + 1
+                units_on_page = list(page_units(page_text, 0, len(page_text), page_num, chapter, chunk_words))
+                if units_on_page:
+                    chapter = units_on_page[-1][4]
+
+                # Character offsets within the page to byte offsets within the buffer
+                if len(body) == len(page_text):
+                    to_bytes = None
+                else:
+                    offsets = [offset for _, start, end in lines for offset in (start, end)]
+                    offsets += [offset for unit in units_on_page for offset in unit[:2]]
+                    to_bytes = _byte_offsets(page_text, offsets)
+
+                def at(offset: int) -> int:
+                    return text_start + (offset if to_bytes is None else to_bytes[offset])
+
+                scanner.feed(marker, position + 1, text_start - 1)
+                for line, start, end in lines:
+                    scanner.feed(line, at(start), at(end))
+
+                position = text_start + len(body) + 1
+
+                for start, end, words, page, unit_chapter in units_on_page:
+                    yield (at(start), at(end), words, page, unit_chapter)
+
+        try:
+            chunk_spans = [list(span) for span in iter_chunk_spans(units(), chunk_words, processor.chunk_overlap)]
+        except Exception as e:
+            print(f"Error extracting text from {pdf_path}: {str(e)}")
+            return None
+        if not page_spans:
+            return None
+
+        stat = os.stat(pdf_path)
+        return {
+            "version": ARTIFACT_VERSION,
+            "source": {
+                "path": os.path.basename(pdf_path),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": file_sha256(pdf_path)
+            },
+            "chunking": processor.chunking,
+            "pages": page_spans,
+            "chapters": [
+                {"title": title, "start": start, "end": end, "topics": topics}
+                for title, start, end, topics in scanner.finish(position)
+            ],
+            "chunks": chunk_spans
+        }
+
+    def save(self, index_dir: str, name: str) -> None:
+        """Write the text buffer and metadata atomically"""
+        os.makedirs(index_dir, exist_ok=True)
+        text_path, _ = self._paths(index_dir, name)
+
+        tmp_text = f"{text_path}.{os.getpid()}.tmp"
+        with open(tmp_text, 'wb') as file:
+            file.write(self.buffer)
+
+        self._publish(tmp_text, self.meta, index_dir, name)
+
+    @classmethod
+    def _publish(cls, tmp_text: str, meta: Dict[str, Any], index_dir: str, name: str) -> None:
+        """Write the metadata and move a finished text buffer file into place"""
+        text_path, meta_path = cls._paths(index_dir, name)
+
+        tmp_meta = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp_meta, 'w', encoding='utf-8') as file:
+            json.dump(meta, file, ensure_ascii=False)
+
+        # The metadata is written last; it is what marks the artifact complete
+        os.replace(tmp_text, text_path)
+        os.replace(tmp_meta, meta_path)
+
+    def save_meta(self, index_dir: str, name: str) -> None:
+        """Rewrite only the metadata, e.g. after refreshing the source mtime"""
+        _, meta_path = self._paths(index_dir, name)
+        tmp_meta = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp_meta, 'w', encoding='utf-8') as file:
+            json.dump(self.meta, file, ensure_ascii=False)
+        os.replace(tmp_meta, meta_path)
+
+    @classmethod
+    def load(cls, index_dir: str, name: str) -> Optional['TextbookArtifact']:
+        """Memory-map a saved artifact, or return None if it is missing or outdated"""
+        text_path, meta_path = cls._paths(index_dir, name)
+        if not (os.path.exists(text_path) and os.path.exists(meta_path)):
+            return None
+
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as file:
+                meta = json.load(file)
+
+            if meta.get("version") != ARTIFACT_VERSION:
+                return None
+
+            with open(text_path, 'rb') as file:
+                if os.fstat(file.fileno()).st_size == 0:
+                    return cls(meta, b"")
+                buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+            return cls(meta, buffer)
+        except (OSError, ValueError) as e:
+            print(f"Error loading corpus artifact {meta_path}: {str(e)}")
+            return None
+
+    @classmethod
+    def load_fresh(cls, index_dir: str, name: str, pdf_path: str) -> Optional['TextbookArtifact']:
+        """Load an artifact that still matches its PDF, checking mtime first and content hash second"""
+        artifact = cls.load(index_dir, name)
+        if artifact is None:
+            return None
+
+        if artifact.is_fresh(pdf_path):
+            return artifact
+
+        # The file was touched (e.g. re-copied); only rebuild if its content changed
+        if artifact.sha256 != file_sha256(pdf_path):
+            return None
+
+        stat = os.stat(pdf_path)
+        artifact.meta["source"]["size"] = stat.st_size
+        artifact.meta["source"]["mtime_ns"] = stat.st_mtime_ns
+        try:
+            artifact.save_meta(index_dir, name)
+        except OSError as e:
+            print(f"Error updating corpus artifact {name}: {str(e)}")
+
+        return artifact
+
+
+def _normalize_lines(text: str) -> str:
+    """Strip lines and drop blank ones, as chapter content is stored"""
+    return '\n'.join(line.strip() for line in text.split('\n') if line.strip())
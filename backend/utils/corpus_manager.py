@@ -0,0 +1,150 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .corpus import TextbookArtifact
+from .pdf_processor import discover_textbooks
+
+
+class CorpusManager:
+    """Polls the textbook directory and hot-swaps changed books into a live PDFProcessor"""
+
+    def __init__(self, processor: Any, poll_interval: float = 30,
+                 on_reload: Optional[Callable[[str, str], None]] = None):
+        self.processor = processor
+        self.poll_interval = poll_interval
+        # Called with (subject, class level) after a book's new content is live
+        self.on_reload = on_reload
+        self.polls = 0
+        self.reloads = 0
+        self.failures = 0
+        self.last_poll = None
+        # (size, mtime_ns) of each PDF as of its last successful check
+        self._known: Dict[str, Tuple[int, int]] = {}
+        # Changed PDFs waiting for their size and mtime to hold still for one poll
+        self._pending: Dict[str, Tuple[int, int]] = {}
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self) -> None:
+        """Start the polling thread in this process if it is not already running"""
+        if self.poll_interval <= 0:
+            return
+        # Threads do not survive fork, so each worker process starts its own
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='corpus-manager', daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"Error polling textbook directory: {str(e)}")
+
+    def poll_once(self) -> List[str]:
+        """Check every textbook once and reload those that changed; returns the reloaded keys"""
+        reloaded = []
+        seen = set()
+
+        for subject, class_level, pdf_path in discover_textbooks(self.processor.textbook_dir):
+            cache_key = f"{subject}_{class_level}"
+            seen.add(cache_key)
+
+            try:
+                stat = os.stat(pdf_path)
+            except OSError:
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+
+            if self._known.get(cache_key) == signature:
+                continue
+
+            # Skip PDFs that are still being copied in; they are picked up on the next poll
+            if self._pending.get(cache_key) != signature:
+                self._pending[cache_key] = signature
+                continue
+            del self._pending[cache_key]
+
+            outcome = self._refresh(subject, class_level, pdf_path)
+            if outcome is None:
+                # Failed reloads are retried on the next poll
+                self._pending[cache_key] = signature
+                continue
+            if outcome:
+                reloaded.append(cache_key)
+            self._known[cache_key] = signature
+
+        # Books whose PDF was removed stop being served, whether loaded, indexed or only on disk
+        removed = set(self.processor.content_cache) | set(self.processor.embeddings_cache) | set(self._known)
+        if os.path.isdir(self.processor.textbook_dir):
+            removed.update(TextbookArtifact.stored_names(self.processor.index_dir))
+        for cache_key in removed - seen:
+            self.processor.remove_textbook(cache_key)
+            self._known.pop(cache_key, None)
+            self._pending.pop(cache_key, None)
+
+        self.polls += 1
+        self.last_poll = time.time()
+        return reloaded
+
+    def _refresh(self, subject: str, class_level: str, pdf_path: str) -> Optional[bool]:
+        """Re-ingest one book off the request path and swap it in if its content changed.
+
+        Returns True if new content went live, False if there was nothing to swap and
+        None if the book could not be loaded.
+        """
+        cache_key = f"{subject}_{class_level}"
+        live = self.processor.content_cache.peek(cache_key)
+
+        # Books this worker has not loaded yet pick up the new PDF lazily on first use
+        if live is None:
+            self.processor.embeddings_cache.pop(cache_key, None)
+            return False
+
+        if live["artifact"].is_fresh(pdf_path):
+            return False
+
+        # Reuses the on-disk artifact if another worker already rebuilt it
+        textbook_data = self.processor._load_textbook(subject, class_level)
+        if not textbook_data.get("success"):
+            self.failures += 1
+            print(f"Error reloading textbook {cache_key}: {textbook_data.get('message')}")
+            return None
+
+        if live["pdf_sha256"] == textbook_data["pdf_sha256"]:
+            return False
+
+        index = None
+        if cache_key in self.processor.embeddings_cache:
+            index = self.processor._load_chunk_index(cache_key, textbook_data)
+
+        # Everything is built before either entry is replaced; requests already
+        # holding the old content or index finish with it undisturbed
+        if index is not None:
+            self.processor.embeddings_cache[cache_key] = index
+        self.processor.content_cache[cache_key] = textbook_data
+
+        self.reloads += 1
+        print(f"Reloaded textbook {cache_key} ({textbook_data['pdf_sha256'][:12]})")
+        if self.on_reload is not None:
+            self.on_reload(subject, class_level)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.poll_interval > 0,
+            "poll_interval": self.poll_interval,
+            "polls": self.polls,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_poll": self.last_poll,
+            "loaded": sorted(self.processor.content_cache)
+        }
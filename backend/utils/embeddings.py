@@ -0,0 +1,176 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from config import Config
+from .chunk_index import normalize_embeddings
+
+# One embedding model per process, shared by every PDFProcessor
+_models: Dict[str, Any] = {}
+_models_lock = threading.Lock()
+
+
+def get_embedding_model(model_name: Optional[str] = None) -> Any:
+    """Return the process-wide embedding model, loading it on first use"""
+    model_name = model_name or Config.EMBEDDING_MODEL
+    model = _models.get(model_name)
+
+    if model is None:
+        with _models_lock:
+            model = _models.get(model_name)
+            if model is None:
+                model = _load_model(model_name)
+                _models[model_name] = model
+
+    return model
+
+
+def _load_model(model_name: str) -> Any:
+    if Config.EMBEDDING_BACKEND == 'onnx':
+        # Needs only onnxruntime and tokenizers; the graph comes from `python -m utils.onnx_encoder`
+        from .onnx_encoder import OnnxEncoder, onnx_model_dir
+        return OnnxEncoder(onnx_model_dir(model_name), Config.EMBEDDING_QUANTIZE, Config.ONNX_THREADS)
+
+    if Config.EMBEDDING_BACKEND != 'torch':
+        raise ValueError(f"Unsupported embedding backend: {Config.EMBEDDING_BACKEND}")
+
+    # Imported here so importing the app does not pull in torch
+    from sentence_transformers import SentenceTransformer
+    if Config.TORCH_THREADS > 0:
+        import torch
+        torch.set_num_threads(Config.TORCH_THREADS)
+    return SentenceTransformer(model_name)
+
+
+def embedding_model_id(model_name: Optional[str] = None) -> str:
+    """Model name recorded with chunk indexes.
+
+    The float ONNX graph reproduces the torch model, so both share indexes; int8
+    embeddings differ slightly and get indexes of their own.
+    """
+    model_name = model_name or Config.EMBEDDING_MODEL
+    if Config.EMBEDDING_BACKEND == 'onnx' and Config.EMBEDDING_QUANTIZE == 'int8':
+        return f"{model_name}+onnx-int8"
+    return model_name
+
+
+def is_model_loaded(model_name: Optional[str] = None) -> bool:
+    """Check whether the embedding model has already been loaded in this process"""
+    return (model_name or Config.EMBEDDING_MODEL) in _models
+
+
+def preload_embedding_model(model_name: Optional[str] = None) -> None:
+    """Load the embedding model ahead of time, e.g. in the gunicorn master before fork"""
+    # Only load the weights; running an encode here would start torch's (or ONNX
+    # Runtime's) thread pools in the master, which do not survive fork()
+    get_embedding_model(model_name)
+
+
+class EmbeddingBatcher:
+    """Collects concurrent query encodes into one batched model call"""
+
+    # Upper bounds of the batch size histogram buckets
+    BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+    def __init__(self, model_name: Optional[str] = None, max_batch_size: int = 32, max_wait_ms: float = 5):
+        self.model_name = model_name or Config.EMBEDDING_MODEL
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.items = 0
+        self.histogram = {bucket: 0 for bucket in self.BUCKETS}
+        self.histogram_overflow = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def encode(self, text: str) -> np.ndarray:
+        """Encode one query, sharing a model call with any concurrent callers"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def _ensure_worker(self) -> None:
+        # Threads do not survive fork, so each worker process starts its own
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='embedding-batcher', daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            self._encode_batch(batch)
+
+    def _encode_batch(self, batch: List[Any]) -> None:
+        texts = [text for text, _ in batch]
+        try:
+            model = get_embedding_model(self.model_name)
+            embeddings = normalize_embeddings(model.encode(texts, batch_size=len(texts), show_progress_bar=False))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future), embedding in zip(batch, embeddings):
+            future.set_result(embedding)
+        self._record(len(batch))
+
+    def _record(self, size: int) -> None:
+        self.batches += 1
+        self.items += size
+        for bucket in self.BUCKETS:
+            if size <= bucket:
+                self.histogram[bucket] += 1
+                return
+        self.histogram_overflow += 1
+
+    def stats(self) -> Dict[str, Any]:
+        histogram = {str(bucket): count for bucket, count in self.histogram.items()}
+        histogram["+Inf"] = self.histogram_overflow
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batch_size_histogram": histogram
+        }
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_query_batcher() -> Optional[EmbeddingBatcher]:
+    """Process-wide query batcher, or None when batching is disabled"""
+    global _batcher
+    if Config.EMBED_BATCH_MAX_SIZE <= 1:
+        return None
+
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = EmbeddingBatcher(max_batch_size=Config.EMBED_BATCH_MAX_SIZE,
+                                            max_wait_ms=Config.EMBED_BATCH_MAX_WAIT_MS)
+    return _batcher
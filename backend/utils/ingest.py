@@ -0,0 +1,86 @@
+"""Precompile textbook PDFs into on-disk corpus artifacts.
+
+Run from the backend directory:
+
+    python -m utils.ingest [--force] [--embeddings]
+
+Every PDF in the textbook directory matching a PDF_FILES name is extracted,
+cleaned, structured and chunked once. The server then only memory-maps the
+results. Books whose PDF is unchanged (by mtime, then content hash) are skipped.
+"""
+import argparse
+import os
+import sys
+import time
+from typing import List, Optional
+
+from config import Config
+from .corpus import TextbookArtifact
+from .pdf_processor import PDFProcessor, discover_textbooks
+from .single_flight import file_lock
+
+
+def ingest_textbook(processor: PDFProcessor, subject: str, class_level: str, pdf_path: str,
+                    force: bool = False, timeout: Optional[float] = None,
+                    embeddings: bool = False) -> str:
+    """Build (or reuse) the artifact for one book and return a short status"""
+    name = f"{subject}_{class_level}"
+    artifact = None if force else TextbookArtifact.load_fresh(processor.index_dir, name, pdf_path)
+    status = "up to date"
+
+    if artifact is None:
+        # Running servers take the same lock, so a book is never extracted twice at once
+        with file_lock(processor._lock_path(name), Config.BUILD_LOCK_TIMEOUT):
+            # Another process may have built it while we waited for the lock
+            if not force:
+                artifact = TextbookArtifact.load_fresh(processor.index_dir, name, pdf_path)
+            if artifact is None:
+                artifact = TextbookArtifact.compile(processor, pdf_path, processor.index_dir, name, timeout=timeout)
+                if artifact is None:
+                    return "failed"
+                status = f"built ({len(artifact.meta['pages'])} pages, {len(artifact.meta['chunks'])} chunks)"
+
+    if embeddings:
+        index = processor.get_chunk_index(subject, class_level)
+        if index is None:
+            return f"{status}, embedding index failed"
+        status = f"{status}, {len(index)} embeddings"
+
+    return status
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Precompile textbook PDFs into corpus artifacts")
+    parser.add_argument('--textbook-dir', default=Config.TEXTBOOK_DIR, help="directory containing textbook PDFs")
+    parser.add_argument('--index-dir', default=Config.INDEX_DIR, help="directory to write artifacts to")
+    parser.add_argument('--force', action='store_true', help="rebuild even if the PDF is unchanged")
+    parser.add_argument('--embeddings', action='store_true', help="also build the chunk embedding index")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="processes used to extract pages of each PDF")
+    parser.add_argument('--timeout', type=float, default=0, help="per-book extraction timeout in seconds (0 = none)")
+    args = parser.parse_args(argv)
+
+    processor = PDFProcessor()
+    processor.textbook_dir = args.textbook_dir
+    processor.index_dir = args.index_dir
+    processor.extract_workers = args.workers
+
+    textbooks = discover_textbooks(args.textbook_dir)
+    if not textbooks:
+        print(f"No textbook PDFs found in {args.textbook_dir}")
+        return 1
+
+    failures = 0
+    for subject, class_level, pdf_path in textbooks:
+        started = time.perf_counter()
+        status = ingest_textbook(processor, subject, class_level, pdf_path, force=args.force,
+                                 timeout=args.timeout or None, embeddings=args.embeddings)
+        if "failed" in status:
+            failures += 1
+        print(f"{subject} class {class_level}: {status} in {time.perf_counter() - started:.1f}s")
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
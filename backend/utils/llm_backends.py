@@ -0,0 +1,216 @@
+import itertools
+import math
+from collections import Counter
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from config import Config
+from .bm25 import tokenize
+from .chunker import UNIT_BOUNDARY
+from .llm_client import AsyncLLMClient, LLMClient, LLMStats, RateLimiter
+
+LLM_BACKENDS = ('openai', 'local', 'extractive')
+
+# Sentences quoted by the extractive backend
+EXTRACTIVE_SENTENCES = 5
+
+
+class ChatCompletionBackend:
+    """Any OpenAI-compatible chat completions endpoint: OpenAI itself or a local llama.cpp/vLLM server"""
+
+    generative = True
+
+    def __init__(self, name: str, model: str, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 limiter: Optional[RateLimiter] = None, stats: Optional[LLMStats] = None):
+        self.name = name
+        self.model = model
+        self._client_args = {"api_key": api_key, "base_url": base_url, "limiter": limiter, "stats": stats}
+        self.client = LLMClient(**self._client_args)
+        self._async_client = None
+
+    @property
+    def async_client(self) -> AsyncLLMClient:
+        # Created on first use so sync-only deployments never open an async pool
+        if self._async_client is None:
+            self._async_client = AsyncLLMClient(**self._client_args)
+        return self._async_client
+
+    def complete(self, messages: List[Dict[str, str]], max_tokens: int = 1500, temperature: float = 0.3,
+                 query: str = "", context: str = "") -> str:
+        return self.client.chat(messages, model=self.model, max_tokens=max_tokens, temperature=temperature)
+
+    def stream(self, messages: List[Dict[str, str]], max_tokens: int = 1500, temperature: float = 0.3,
+               query: str = "", context: str = "") -> Iterator[str]:
+        return self.client.stream_chat(messages, model=self.model, max_tokens=max_tokens, temperature=temperature)
+
+    async def acomplete(self, messages: List[Dict[str, str]], max_tokens: int = 1500, temperature: float = 0.3,
+                        query: str = "", context: str = "") -> str:
+        return await self.async_client.chat(messages, model=self.model, max_tokens=max_tokens,
+                                            temperature=temperature)
+
+    def astream(self, messages: List[Dict[str, str]], max_tokens: int = 1500, temperature: float = 0.3,
+                query: str = "", context: str = "") -> AsyncIterator[str]:
+        return self.async_client.stream_chat(messages, model=self.model, max_tokens=max_tokens,
+                                             temperature=temperature)
+
+
+class ExtractiveBackend:
+    """No model at all: quotes the retrieved sentences that best match the question"""
+
+    name = 'extractive'
+    generative = False
+
+    def complete(self, messages: List[Dict[str, str]], max_tokens: int = 1500, temperature: float = 0.3,
+                 query: str = "", context: str = "") -> str:
+        excerpts = _parse_context(context)
+        if not excerpts:
+            return "No relevant content found in the textbook for this question."
+
+        # Best match first; the answer paragraph keeps textbook order so it reads naturally
+        ranked = _best_sentences(query, excerpts, EXTRACTIVE_SENTENCES)
+        in_order = sorted(ranked, key=lambda item: item[2])
+        references = []
+        for label, _, _ in in_order:
+            if label and label not in references:
+                references.append(label)
+
+        lines = ["**Answer from Samacheer Kalvi Textbook:**", ' '.join(sentence for _, sentence, _ in in_order), "",
+                 "**Key Points:**"]
+        lines.extend(f"• {sentence}" for _, sentence, _ in ranked[:3])
+        if references:
+            lines.extend(["", "**Textbook Reference:**"])
+            lines.extend(references)
+
+        return '\n'.join(lines)
+
+    def stream(self, messages: List[Dict[str, str]], max_tokens: int = 1500, temperature: float = 0.3,
+               query: str = "", context: str = "") -> Iterator[str]:
+        yield self.complete(messages, max_tokens, temperature, query=query, context=context)
+
+    async def acomplete(self, messages: List[Dict[str, str]], max_tokens: int = 1500, temperature: float = 0.3,
+                        query: str = "", context: str = "") -> str:
+        # A few milliseconds of string work; not worth a thread hop
+        return self.complete(messages, max_tokens, temperature, query=query, context=context)
+
+    async def astream(self, messages: List[Dict[str, str]], max_tokens: int = 1500, temperature: float = 0.3,
+                      query: str = "", context: str = "") -> AsyncIterator[str]:
+        yield self.complete(messages, max_tokens, temperature, query=query, context=context)
+
+
+def complete_with_fallback(backend: Any, fallback: Optional[Any], messages: List[Dict[str, str]],
+                           **params: Any) -> Tuple[str, Any]:
+    """Completion text and the backend that produced it, switching to the fallback if the call fails"""
+    try:
+        return backend.complete(messages, **params), backend
+    except Exception as e:
+        if fallback is None:
+            raise
+        print(f"Error from {backend.name} backend, using {fallback.name}: {str(e)}")
+        return fallback.complete(messages, **params), fallback
+
+
+def open_stream(backend: Any, fallback: Optional[Any], messages: List[Dict[str, str]],
+                **params: Any) -> Tuple[Iterator[str], Any]:
+    """Start a stream, switching to the fallback if it fails before the first delta"""
+    stream = backend.stream(messages, **params)
+    try:
+        first = next(stream, None)
+    except Exception as e:
+        if fallback is None:
+            raise
+        print(f"Error from {backend.name} backend, using {fallback.name}: {str(e)}")
+        return fallback.stream(messages, **params), fallback
+
+    if first is None:
+        return iter(()), backend
+    return itertools.chain([first], stream), backend
+
+
+async def acomplete_with_fallback(backend: Any, fallback: Optional[Any], messages: List[Dict[str, str]],
+                                  **params: Any) -> Tuple[str, Any]:
+    """Async equivalent of complete_with_fallback"""
+    try:
+        return await backend.acomplete(messages, **params), backend
+    except Exception as e:
+        if fallback is None:
+            raise
+        print(f"Error from {backend.name} backend, using {fallback.name}: {str(e)}")
+        return await fallback.acomplete(messages, **params), fallback
+
+
+async def aopen_stream(backend: Any, fallback: Optional[Any], messages: List[Dict[str, str]],
+                       **params: Any) -> Tuple[AsyncIterator[str], Any]:
+    """Async equivalent of open_stream"""
+    stream = backend.astream(messages, **params)
+    try:
+        first = await stream.__anext__()
+    except StopAsyncIteration:
+        return _achain([], stream), backend
+    except Exception as e:
+        if fallback is None:
+            raise
+        print(f"Error from {backend.name} backend, using {fallback.name}: {str(e)}")
+        return fallback.astream(messages, **params), fallback
+
+    return _achain([first], stream), backend
+
+
+async def _achain(head: List[str], stream: AsyncIterator[str]) -> AsyncIterator[str]:
+    for delta in head:
+        yield delta
+    async for delta in stream:
+        yield delta
+
+
+def create_backend(name: str, stats: Optional[LLMStats] = None, api_key: Optional[str] = None) -> Any:
+    """Build a backend by name; an empty name means none"""
+    if not name:
+        return None
+    if name == 'openai':
+        return ChatCompletionBackend('openai', Config.LLM_MODEL, api_key=api_key, stats=stats)
+    if name == 'local':
+        # A local server has no per-minute quota to respect
+        return ChatCompletionBackend('local', Config.LOCAL_LLM_MODEL, api_key=Config.LOCAL_LLM_API_KEY,
+                                     base_url=Config.LOCAL_LLM_URL, limiter=RateLimiter(), stats=stats)
+    if name == 'extractive':
+        return ExtractiveBackend()
+    raise ValueError(f"Unknown LLM backend: {name} (expected one of {', '.join(LLM_BACKENDS)})")
+
+
+def _parse_context(context: str) -> List[Tuple[str, str]]:
+    """Split assembled context back into (label, text) excerpts"""
+    excerpts = []
+    for block in context.split('\n\n'):
+        block = block.strip()
+        if not block:
+            continue
+        label, _, text = block.partition('\n')
+        if label.startswith('[') and label.endswith(']'):
+            excerpts.append((label, text))
+        else:
+            excerpts.append(("", block))
+    return excerpts
+
+
+def _best_sentences(query: str, excerpts: List[Tuple[str, str]], count: int) -> List[Tuple[str, str, int]]:
+    """Highest scoring (label, sentence, position) triples by idf-weighted query term overlap"""
+    sentences = []
+    for label, text in excerpts:
+        for sentence in UNIT_BOUNDARY.split(text):
+            sentence = ' '.join(sentence.split())
+            if len(sentence.split()) >= 4:
+                sentences.append((label, sentence, set(tokenize(sentence))))
+
+    if not sentences:
+        return [(label, ' '.join(text.split()[:60]), 0) for label, text in excerpts[:1]]
+
+    document_frequency = Counter(term for _, _, terms in sentences for term in terms)
+    query_terms = set(tokenize(query))
+
+    def score(item: Tuple[str, str, set]) -> float:
+        matched = query_terms & item[2]
+        weight = sum(math.log(1 + len(sentences) / document_frequency[term]) for term in matched)
+        # Prefer shorter sentences among equally relevant ones
+        return weight / math.log(2 + len(item[1].split()))
+
+    ranked = sorted(range(len(sentences)), key=lambda i: score(sentences[i]), reverse=True)[:count]
+    return [(sentences[i][0], sentences[i][1], i) for i in ranked]
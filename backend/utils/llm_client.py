@@ -0,0 +1,353 @@
+import asyncio
+import email.utils
+import hashlib
+import json
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+import httpx
+import openai
+
+from config import Config
+from .chunker import estimate_tokens
+
+# HTTP statuses worth retrying: timeouts, lock conflicts, rate limits and server errors
+RETRYABLE_STATUSES = (408, 409, 429)
+
+
+class RateLimitTimeout(Exception):
+    """Raised when the local rate limiter would make a call wait longer than allowed"""
+
+
+class TokenBucket:
+    """Continuously refilling budget of `per_minute` units; a rate of 0 means unlimited"""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` units are available"""
+        if not self.rate:
+            return 0.0
+        self._refill(now)
+        # A request larger than the whole bucket waits for a full bucket instead of forever
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount: float) -> None:
+        if self.rate:
+            self.level -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets shared by every call in the process.
+
+    Callers reserve capacity up front and then sleep for the returned delay, so the
+    same limiter serves threads and asyncio tasks.
+    """
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int, max_wait: float) -> float:
+        """Claim one request and `tokens` tokens, returning how long to wait before sending"""
+        with self._lock:
+            now = time.monotonic()
+            delay = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+            if delay > max_wait:
+                raise RateLimitTimeout(f"LLM rate limit: would wait {delay:.1f}s")
+            # Going into debt keeps later callers queued behind this one
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            return delay
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds the server asked us to wait, from Retry-After or retry-after-ms headers"""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+
+    headers = response.headers
+    if headers.get('retry-after-ms'):
+        try:
+            return float(headers['retry-after-ms']) / 1000.0
+        except ValueError:
+            pass
+
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    # An HTTP date; anything unparseable falls back to the normal backoff
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, parsed.timestamp() - time.time()) if parsed else None
+
+
+def retry_delay(error: Exception, attempt: int, base: float, cap: float) -> Optional[float]:
+    """Backoff before retry number `attempt`, or None if the error is not retryable"""
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code not in RETRYABLE_STATUSES and error.status_code < 500:
+            return None
+    elif not isinstance(error, openai.APIConnectionError):
+        return None
+
+    # Full jitter spreads a burst of retries instead of sending them back in lockstep
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    server_delay = retry_after(error)
+    if server_delay is not None:
+        delay = max(delay, min(server_delay, cap))
+    return delay
+
+
+def prompt_key(model: str, messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> str:
+    """Identity of a completion request, used to coalesce identical in-flight prompts"""
+    payload = json.dumps([model, messages, max_tokens, temperature], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _request_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+    """Tokens a call counts against the per-minute budget: prompt estimate plus max_tokens"""
+    return sum(estimate_tokens(message["content"]) for message in messages) + max_tokens
+
+
+def _record_stream_usage(stats: 'LLMStats', messages: List[Dict[str, str]], deltas: int) -> None:
+    """Streams carry no usage block, so count the prompt estimate and one token per delta"""
+    stats.add(prompt_tokens=sum(estimate_tokens(message["content"]) for message in messages),
+              completion_tokens=deltas)
+
+
+class LLMStats:
+    """Counters shared by the sync and async clients"""
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.limiter_wait_seconds = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    def add(self, **counts: Any) -> None:
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def record_usage(self, usage: Any) -> None:
+        if usage is not None:
+            self.add(prompt_tokens=usage.prompt_tokens or 0, completion_tokens=usage.completion_tokens or 0)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: value for name, value in vars(self).items() if not name.startswith('_')}
+
+
+class LLMClient:
+    """Chat completions over a pooled keep-alive connection with timeouts, retries,
+    client-side rate limiting and coalescing of identical in-flight prompts"""
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 timeout: float = Config.LLM_TIMEOUT, max_retries: int = Config.LLM_MAX_RETRIES,
+                 max_connections: int = Config.LLM_MAX_CONNECTIONS,
+                 limiter: Optional[RateLimiter] = None, stats: Optional[LLMStats] = None):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.limiter = limiter or shared_rate_limiter()
+        self.stats = stats or LLMStats()
+        # Retries are handled here so they share the limiter and honour Retry-After
+        self.client = openai.OpenAI(
+            api_key=api_key or Config.OPENAI_API_KEY,
+            base_url=base_url or Config.OPENAI_BASE_URL,
+            timeout=timeout,
+            max_retries=0,
+            http_client=httpx.Client(
+                timeout=timeout,
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+            )
+        )
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def chat(self, messages: List[Dict[str, str]], model: str = "gpt-4", max_tokens: int = 1500,
+             temperature: float = 0.3) -> str:
+        """Completion text for the messages, shared with any identical call already in flight"""
+        key = prompt_key(model, messages, max_tokens, temperature)
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+
+        if not owner:
+            self.stats.add(coalesced=1)
+            return future.result()
+
+        try:
+            response = self._create(messages, model=model, max_tokens=max_tokens, temperature=temperature)
+            self.stats.record_usage(response.usage)
+            future.set_result(response.choices[0].message.content)
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+        return future.result()
+
+    def stream_chat(self, messages: List[Dict[str, str]], model: str = "gpt-4", max_tokens: int = 1500,
+                    temperature: float = 0.3) -> Iterator[str]:
+        """Completion text deltas as they arrive; retried only until the stream opens"""
+        stream = self._create(messages, model=model, max_tokens=max_tokens, temperature=temperature, stream=True)
+        deltas = 0
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    deltas += 1
+                    yield chunk.choices[0].delta.content
+        finally:
+            _record_stream_usage(self.stats, messages, deltas)
+
+    def _create(self, messages: List[Dict[str, str]], **params: Any) -> Any:
+        """One completions call behind the rate limiter, retried with jittered backoff"""
+        attempt = 0
+        while True:
+            delay = self.limiter.reserve(_request_tokens(messages, params["max_tokens"]), self.timeout)
+            if delay:
+                self.stats.add(limiter_wait_seconds=delay)
+                time.sleep(delay)
+
+            try:
+                self.stats.add(requests=1)
+                return self.client.chat.completions.create(messages=messages, **params)
+            except Exception as e:
+                backoff = retry_delay(e, attempt, Config.LLM_BACKOFF_BASE, Config.LLM_BACKOFF_MAX)
+                if isinstance(e, openai.RateLimitError):
+                    self.stats.add(rate_limited=1)
+                if backoff is None or attempt >= self.max_retries:
+                    self.stats.add(errors=1)
+                    raise
+                self.stats.add(retries=1)
+                attempt += 1
+                time.sleep(backoff)
+
+
+class AsyncLLMClient:
+    """asyncio counterpart of LLMClient, sharing its rate limiter and counters"""
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 timeout: float = Config.LLM_TIMEOUT, max_retries: int = Config.LLM_MAX_RETRIES,
+                 max_connections: int = Config.LLM_MAX_CONNECTIONS,
+                 limiter: Optional[RateLimiter] = None, stats: Optional[LLMStats] = None):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.limiter = limiter or shared_rate_limiter()
+        self.stats = stats or LLMStats()
+        self.client = openai.AsyncOpenAI(
+            api_key=api_key or Config.OPENAI_API_KEY,
+            base_url=base_url or Config.OPENAI_BASE_URL,
+            timeout=timeout,
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                timeout=timeout,
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+            )
+        )
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def chat(self, messages: List[Dict[str, str]], model: str = "gpt-4", max_tokens: int = 1500,
+                   temperature: float = 0.3) -> str:
+        key = prompt_key(model, messages, max_tokens, temperature)
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats.add(coalesced=1)
+        else:
+            task = asyncio.ensure_future(self._complete(key, messages, model=model, max_tokens=max_tokens,
+                                                        temperature=temperature))
+            # Retrieved here so a failure nobody waited on is not reported as unhandled
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self._inflight[key] = task
+
+        # The call runs in its own task: a cancelled caller, even the one that started
+        # it, only stops waiting, and the others sharing the prompt still get the answer
+        return await asyncio.shield(task)
+
+    async def _complete(self, key: str, messages: List[Dict[str, str]], **params: Any) -> str:
+        try:
+            response = await self._create(messages, **params)
+            self.stats.record_usage(response.usage)
+            return response.choices[0].message.content
+        finally:
+            del self._inflight[key]
+
+    async def stream_chat(self, messages: List[Dict[str, str]], model: str = "gpt-4", max_tokens: int = 1500,
+                          temperature: float = 0.3) -> AsyncIterator[str]:
+        stream = await self._create(messages, model=model, max_tokens=max_tokens,
+                                    temperature=temperature, stream=True)
+        deltas = 0
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    deltas += 1
+                    yield chunk.choices[0].delta.content
+        finally:
+            _record_stream_usage(self.stats, messages, deltas)
+
+    async def _create(self, messages: List[Dict[str, str]], **params: Any) -> Any:
+        attempt = 0
+        while True:
+            delay = self.limiter.reserve(_request_tokens(messages, params["max_tokens"]), self.timeout)
+            if delay:
+                self.stats.add(limiter_wait_seconds=delay)
+                await asyncio.sleep(delay)
+
+            try:
+                self.stats.add(requests=1)
+                return await self.client.chat.completions.create(messages=messages, **params)
+            except Exception as e:
+                backoff = retry_delay(e, attempt, Config.LLM_BACKOFF_BASE, Config.LLM_BACKOFF_MAX)
+                if isinstance(e, openai.RateLimitError):
+                    self.stats.add(rate_limited=1)
+                if backoff is None or attempt >= self.max_retries:
+                    self.stats.add(errors=1)
+                    raise
+                self.stats.add(retries=1)
+                attempt += 1
+                await asyncio.sleep(backoff)
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def shared_rate_limiter() -> RateLimiter:
+    """Process-wide limiter so every client draws from the same per-minute budgets"""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter(Config.LLM_REQUESTS_PER_MINUTE, Config.LLM_TOKENS_PER_MINUTE)
+    return _limiter
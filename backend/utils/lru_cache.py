@@ -0,0 +1,98 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator
+
+import numpy as np
+
+
+def deep_sizeof(obj: Any) -> int:
+    """Approximate memory of nested dicts, lists, strings, numbers and arrays"""
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key) + deep_sizeof(value) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_sizeof(item) for item in obj)
+    return size
+
+
+class SizedLRUCache:
+    """Dict-like LRU cache that evicts least recently used entries beyond a byte budget"""
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[Any], int]):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._entries))
+
+    def peek(self, key: str, default: Any = None) -> Any:
+        """Look up an entry without counting a hit or refreshing its recency"""
+        return self._entries.get(key, default)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        # Sized outside the lock; measuring a large entry can take a moment
+        size = self.sizeof(value)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = value
+            self._sizes[key] = size
+            self.total_bytes += size
+
+            # The newest entry always stays, even if it alone exceeds the budget
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._entries:
+                return default
+            return self._remove(key)
+
+    def _remove(self, key: str) -> Any:
+        self.total_bytes -= self._sizes.pop(key)
+        return self._entries.pop(key)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries = {key: self._sizes[key] for key in self._entries}
+        return {
+            "entries": len(entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entry_bytes": entries
+        }
@@ -0,0 +1,225 @@
+"""In-process metrics with Prometheus text exposition.
+
+Stage timers are a perf_counter pair plus one locked bucket increment, cheap
+enough to leave on. Each worker process exports its own series; scrape every
+worker, or aggregate with the `instance` label.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+PREFIX = 'insightslm'
+
+# Seconds; spans a cached lookup (~1ms) to a long GPT-4 answer (~60s)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Stage durations of the current request, when a request is being timed
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar('request_timings', default=None)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values"""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+
+        for label_values, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, label_values, le)} {cumulative}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {series[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter keyed by label values"""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *label_values: str) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = dict(self._values)
+        for label_values, value in sorted(snapshot.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+def sample_lines(name: str, help_text: str, metric_type: str,
+                 samples: List[Tuple[Dict[str, Any], float]]) -> List[str]:
+    """Exposition lines for values read from existing stats at scrape time"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        names = tuple(labels)
+        lines.append(f"{name}{_format_labels(names, tuple(labels[key] for key in names))} {value}")
+    return lines
+
+
+class MetricsRegistry:
+    """Owns the hot-path metrics plus collectors that read other components' stats on scrape"""
+
+    def __init__(self):
+        self.stage_seconds = Histogram(f"{PREFIX}_stage_seconds",
+                                       "Time spent in each stage of request handling", ('stage',))
+        self.request_seconds = Histogram(f"{PREFIX}_request_seconds",
+                                         "HTTP request latency until the response is returned", ('endpoint',))
+        self.requests_total = Counter(f"{PREFIX}_requests_total", "HTTP requests handled",
+                                      ('endpoint', 'status'))
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def register_collector(self, collector: Callable[[], List[str]]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in (self.stage_seconds, self.request_seconds, self.requests_total):
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                print(f"Error collecting metrics: {str(e)}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    """Record a stage duration globally and in the current request's breakdown"""
+    registry.stage_seconds.observe(seconds, stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Time the enclosed block as one stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def start_request_timing() -> None:
+    """Begin collecting a per-stage breakdown for the request on this thread"""
+    _request_timings.set({})
+
+
+def finish_request_timing() -> Dict[str, float]:
+    """Stop collecting and return the stage breakdown in seconds"""
+    timings = _request_timings.get() or {}
+    _request_timings.set(None)
+    return timings
+
+
+def server_timing_header(timings: Dict[str, float], total: float) -> str:
+    """Server-Timing header value, e.g. "search;dur=12.5, llm;dur=840.0, total;dur=861.2" """
+    parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ', '.join(parts)
+
+
+def service_collector(ai_service: Any, pdf_processor: Any, batcher_factory: Callable[[], Any]) -> Callable[[], List[str]]:
+    """Collector for cache hit ratios, embedding batch sizes and LLM token counts"""
+
+    def collect() -> List[str]:
+        lines = []
+
+        answer_cache = ai_service.answer_cache
+        if answer_cache is not None:
+            stats = answer_cache.stats()
+            lines += sample_lines(f"{PREFIX}_answer_cache_lookups_total", "Answer cache lookups by result", "counter", [
+                ({"result": "hit"}, stats["hits"]),
+                ({"result": "semantic_hit"}, stats["semantic_hits"]),
+                ({"result": "miss"}, stats["misses"])
+            ])
+            lines += sample_lines(f"{PREFIX}_answer_cache_hit_ratio", "Answer cache hit ratio", "gauge",
+                                  [({}, stats["hit_ratio"])])
+
+        caches = pdf_processor.cache_stats()
+        lines += sample_lines(f"{PREFIX}_cache_lookups_total", "Textbook cache lookups by result", "counter",
+                              [({"cache": name, "result": result}, stats[key])
+                               for name, stats in caches.items() for result, key in (("hit", "hits"), ("miss", "misses"))])
+        lines += sample_lines(f"{PREFIX}_cache_hit_ratio", "Textbook cache hit ratio", "gauge",
+                              [({"cache": name}, stats["hit_ratio"]) for name, stats in caches.items()])
+        lines += sample_lines(f"{PREFIX}_cache_bytes", "Approximate memory held by each textbook cache", "gauge",
+                              [({"cache": name}, stats["bytes"]) for name, stats in caches.items()])
+        lines += sample_lines(f"{PREFIX}_cache_evictions_total", "Textbook cache evictions", "counter",
+                              [({"cache": name}, stats["evictions"]) for name, stats in caches.items()])
+
+        batcher = batcher_factory()
+        if batcher is not None:
+            stats = batcher.stats()
+            name = f"{PREFIX}_embedding_batch_size"
+            lines += [f"# HELP {name} Queries encoded per embedding model call", f"# TYPE {name} histogram"]
+            cumulative = 0
+            for bound, count in stats["batch_size_histogram"].items():
+                cumulative += count
+                lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+            lines += [f"{name}_sum {stats['items']}", f"{name}_count {stats['batches']}"]
+
+        llm = ai_service.llm_stats.as_dict()
+        lines += sample_lines(f"{PREFIX}_llm_tokens_total", "LLM prompt and completion tokens", "counter", [
+            ({"kind": "prompt"}, llm["prompt_tokens"]),
+            ({"kind": "completion"}, llm["completion_tokens"])
+        ])
+        lines += sample_lines(f"{PREFIX}_llm_calls_total", "LLM calls by outcome", "counter", [
+            ({"outcome": outcome}, llm[outcome])
+            for outcome in ("requests", "retries", "rate_limited", "coalesced", "errors")
+        ])
+        lines += sample_lines(f"{PREFIX}_llm_limiter_wait_seconds_total", "Time spent waiting on the local LLM rate limiter",
+                              "counter", [({}, llm["limiter_wait_seconds"])])
+        return lines
+
+    return collect
@@ -0,0 +1,182 @@
+"""Sentence embeddings through ONNX Runtime instead of PyTorch.
+
+Export the model once (needs sentence-transformers, torch and onnxruntime), from
+the backend directory:
+
+    python -m utils.onnx_encoder [--model all-MiniLM-L6-v2] [--no-int8]
+
+then serve with EMBEDDING_BACKEND=onnx, and EMBEDDING_QUANTIZE=int8 for the
+dynamically quantized graph. Serving needs only onnxruntime and tokenizers.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from config import Config
+
+SETTINGS_FILE = 'encoder.json'
+MODEL_FILES = {'none': 'model.onnx', 'int8': 'model.int8.onnx'}
+POOLING_MODES = ('mean', 'cls')
+
+
+def onnx_model_dir(model_name: str, root: Optional[str] = None) -> str:
+    """Directory holding the exported graph, tokenizer and settings for a model"""
+    return os.path.join(root or Config.ONNX_MODEL_DIR, re.sub(r'[^A-Za-z0-9_.-]+', '-', model_name))
+
+
+class OnnxEncoder:
+    """Drop-in for SentenceTransformer.encode backed by an exported ONNX graph"""
+
+    def __init__(self, model_dir: str, quantize: str = 'none', threads: int = 0):
+        if quantize not in MODEL_FILES:
+            raise ValueError(f"Unsupported embedding quantization: {quantize}")
+
+        # Imported here so the torch backend does not need onnxruntime installed
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, SETTINGS_FILE), 'r', encoding='utf-8') as file:
+            self.settings = json.load(file)
+        if self.settings["pooling"] not in POOLING_MODES:
+            raise ValueError(f"Unsupported pooling mode: {self.settings['pooling']}")
+
+        self.model_path = os.path.join(model_dir, MODEL_FILES[quantize])
+        if not os.path.exists(self.model_path):
+            raise FileNotFoundError(f"{self.model_path} not found; run `python -m utils.onnx_encoder` first")
+
+        self.quantize = quantize
+        self.threads = threads
+        self.max_seq_length = self.settings["max_seq_length"]
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=self.max_seq_length)
+        self.tokenizer.enable_padding(pad_id=self.settings["pad_id"], pad_token=self.settings["pad_token"])
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_session(self) -> Any:
+        # The session starts its thread pools when created and they do not survive
+        # fork(), so each worker process opens its own on first encode
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    import onnxruntime
+                    options = onnxruntime.SessionOptions()
+                    if self.threads > 0:
+                        options.intra_op_num_threads = self.threads
+                    self._session = onnxruntime.InferenceSession(self.model_path, options,
+                                                                 providers=['CPUExecutionProvider'])
+                    self._pid = os.getpid()
+        return self._session
+
+    def encode(self, texts: List[str], batch_size: int = 32, show_progress_bar: bool = False,
+               **kwargs: Any) -> np.ndarray:
+        """Normalized float32 embeddings, one row per text"""
+        if not texts:
+            return np.zeros((0, self.settings["dim"]), dtype=np.float32)
+
+        session = self._get_session()
+        embeddings = np.empty((len(texts), self.settings["dim"]), dtype=np.float32)
+
+        # Longest first, as sentence-transformers does, so each batch pads to similar lengths
+        order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            embeddings[rows] = self._encode_batch(session, [texts[i] for i in rows])
+
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return embeddings / norms
+
+    def _encode_batch(self, session: Any, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        inputs = {
+            "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            "attention_mask": mask,
+            "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+        }
+        hidden = session.run(None, {name: inputs[name] for name in self.settings["inputs"]})[0]
+
+        if self.settings["pooling"] == 'cls':
+            return hidden[:, 0]
+
+        weights = mask[:, :, None].astype(np.float32)
+        return (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+
+
+def export_model(model_name: str, output_dir: str, int8: bool = True) -> Dict[str, Any]:
+    """Export a sentence-transformers model to ONNX, plus an int8 copy, and return its settings"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device='cpu')
+    transformer, pooling = model[0], model[1]
+    tokenizer = transformer.tokenizer
+
+    pooling_mode = pooling.get_pooling_mode_str()
+    if pooling_mode not in POOLING_MODES:
+        raise ValueError(f"Cannot export {model_name}: unsupported pooling mode {pooling_mode}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer.save_pretrained(output_dir)
+
+    sample = tokenizer(["An example sentence to trace the graph."], return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+
+    class LastHiddenState(torch.nn.Module):
+        def __init__(self, auto_model: Any):
+            super().__init__()
+            self.auto_model = auto_model
+
+        def forward(self, *args: Any) -> Any:
+            return self.auto_model(**dict(zip(input_names, args))).last_hidden_state
+
+    model_path = os.path.join(output_dir, MODEL_FILES['none'])
+    axes = {0: 'batch', 1: 'sequence'}
+    with torch.no_grad():
+        torch.onnx.export(LastHiddenState(transformer.auto_model).eval(),
+                          tuple(sample[name] for name in input_names), model_path,
+                          input_names=input_names, output_names=['last_hidden_state'],
+                          dynamic_axes={name: axes for name in input_names + ['last_hidden_state']},
+                          opset_version=14, do_constant_folding=True)
+
+    if int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(model_path, os.path.join(output_dir, MODEL_FILES['int8']), weight_type=QuantType.QInt8)
+
+    settings = {
+        "model": model_name,
+        "dim": model.get_sentence_embedding_dimension(),
+        "max_seq_length": model.max_seq_length,
+        "pooling": pooling_mode,
+        "inputs": input_names,
+        "pad_id": tokenizer.pad_token_id,
+        "pad_token": tokenizer.pad_token
+    }
+    with open(os.path.join(output_dir, SETTINGS_FILE), 'w', encoding='utf-8') as file:
+        json.dump(settings, file, indent=2)
+
+    return settings
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export the sentence embedding model to ONNX")
+    parser.add_argument('--model', default=Config.EMBEDDING_MODEL)
+    parser.add_argument('--output-dir', default=Config.ONNX_MODEL_DIR, help="root directory for exported models")
+    parser.add_argument('--no-int8', action='store_true', help="skip the dynamically quantized int8 graph")
+    args = parser.parse_args(argv)
+
+    output_dir = onnx_model_dir(args.model, args.output_dir)
+    settings = export_model(args.model, output_dir, int8=not args.no_int8)
+    print(f"Exported {args.model} ({settings['dim']}-d, {settings['pooling']} pooling) to {output_dir}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
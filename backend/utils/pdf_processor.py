@@ -1,242 +1,603 @@
 import PyPDF2
+import glob
+import heapq
 import os
 import re
-from typing import List, Dict, Any, Optional
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 import json
-from sentence_transformers import SentenceTransformer
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+from config import Config
+from .chapters import MAX_TOPICS, is_chapter_heading, is_topic
+from .chunk_index import ChunkIndex, file_sha256, normalize_embeddings
+from .chunker import assemble_context, chunk_spans, chunk_text
+from .corpus import TextbookArtifact, _normalize_lines
+from .embeddings import embedding_model_id, get_embedding_model, get_query_batcher
+from .lru_cache import SizedLRUCache, deep_sizeof
+from .metrics import timed
+from .retrieval import SEARCH_MODES, lexical_floor, reciprocal_rank_fusion
+from .single_flight import SingleFlight, file_lock
+from .topic_index import compact_structure
+
+# Page cleaning, compiled once: collapse whitespace, drop Tamil script (U+0B80–U+0BFF)
+# and NULs, then break lines before chapter and unit headings
+WHITESPACE = re.compile(r'\s+')
+DROPPED_CHARS = str.maketrans('', '', ''.join(map(chr, range(0x0B80, 0x0C00))) + '\x00')
+HEADING_BREAK = re.compile(r'(Chapter \d+|CHAPTER \d+|Unit \d+|UNIT \d+)')
+
+# Map subject to PDF filename, formatted with the class level
+PDF_FILES = {
+    "social": "tn-class-{class_level}-social-science.pdf",
+    "science": "tn-class-{class_level}-science.pdf",
+    "mathematics": "tn-class-{class_level}-mathematics.pdf",
+    "english": "tn-class-{class_level}-english.pdf",
+    "tamil": "tn-class-{class_level}-tamil.pdf"
+}
+
+def discover_textbooks(textbook_dir: str) -> List[Tuple[str, str, str]]:
+    """Find (subject, class level, path) for every PDF matching the PDF_FILES mapping"""
+    patterns = {
+        subject: re.compile(re.escape(filename).replace(re.escape('{class_level}'), r'(\d+)') + '$')
+        for subject, filename in PDF_FILES.items()
+    }
+    textbooks = []
+
+    if not os.path.isdir(textbook_dir):
+        return textbooks
+
+    for filename in sorted(os.listdir(textbook_dir)):
+        for subject, pattern in patterns.items():
+            match = pattern.match(filename)
+            if match:
+                textbooks.append((subject, match.group(1), os.path.join(textbook_dir, filename)))
+                break
+
+    return textbooks
+
 
 class PDFProcessor:
     def __init__(self):
         self.textbook_path = "textbooks/"
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.content_cache = {}
-        self.embeddings_cache = {}
+        self.textbook_dir = Config.TEXTBOOK_DIR
+        self.index_dir = Config.INDEX_DIR
+        self.model_name = Config.EMBEDDING_MODEL
+        self.chunk_words = Config.CHUNK_WORDS
+        self.chunk_overlap = Config.CHUNK_OVERLAP_WORDS
+        self.extract_workers = Config.PDF_EXTRACT_WORKERS
+        self.retrieval_dtype = Config.RETRIEVAL_DTYPE
+        # Both caches evict least recently used books beyond their byte budgets
+        self.content_cache = SizedLRUCache(Config.CONTENT_CACHE_MAX_BYTES, _textbook_nbytes)
+        self.embeddings_cache = SizedLRUCache(Config.INDEX_CACHE_MAX_BYTES, lambda index: index.nbytes)
+        # Concurrent cache misses for the same book wait on one load instead of each doing it
+        self.single_flight = SingleFlight()
+        self.shard_workers = Config.SHARD_SEARCH_WORKERS
+        self._shard_executor = None
+        self._shard_executor_pid = None
+        self._shard_lock = threading.Lock()
+
+    @property
+    def model(self):
+        """Shared embedding model, loaded on first use"""
+        return get_embedding_model(self.model_name)
+
+    @property
+    def chunking(self) -> str:
+        """Chunker settings, stored with artifacts and indexes so a change triggers a rebuild"""
+        return f"sentences:{self.chunk_words}:{self.chunk_overlap}"
         
-    def extract_text_from_pdf(self, pdf_path: str) -> str:
+    def extract_text_from_pdf(self, pdf_path: str, timeout: Optional[float] = None) -> str:
         """Extract text from PDF file"""
         try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                text = ""
-                
-                for page_num, page in enumerate(pdf_reader.pages):
-                    page_text = page.extract_text()
-                    # Clean and structure the text
-                    cleaned_text = self._clean_text(page_text)
-                    if cleaned_text.strip():
-                        text += f"\n--- Page {page_num + 1} ---\n{cleaned_text}\n"
-                
-                return text
+            return self._join_pages(self.extract_pages(pdf_path, timeout=timeout))
         except Exception as e:
             print(f"Error extracting text from {pdf_path}: {str(e)}")
             return ""
+
+    def extract_pages(self, pdf_path: str, timeout: Optional[float] = None,
+                      workers: Optional[int] = None) -> List[Tuple[int, str]]:
+        """Extract cleaned, non-empty page text as (page number, text) pairs"""
+        return list(self.iter_pages(pdf_path, timeout=timeout, workers=workers))
+
+    def iter_pages(self, pdf_path: str, timeout: Optional[float] = None,
+                   workers: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+        """Yield cleaned, non-empty pages in order, holding only a few in memory at a time"""
+        workers = workers or self.extract_workers
+        deadline = time.monotonic() + timeout if timeout else None
+
+        if workers > 1:
+            yield from self._iter_pages_parallel(pdf_path, workers, deadline)
+            return
+
+        with open(pdf_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            yield from self._iter_page_range(pdf_reader, 0, len(pdf_reader.pages), deadline)
+
+    def _extract_page_range(self, pdf_reader: Any, start: int, end: int,
+                            deadline: Optional[float] = None) -> List[Tuple[int, str]]:
+        """Extract and clean pages [start, end) of an open PDF"""
+        return list(self._iter_page_range(pdf_reader, start, end, deadline))
+
+    def _iter_page_range(self, pdf_reader: Any, start: int, end: int,
+                         deadline: Optional[float] = None) -> Iterator[Tuple[int, str]]:
+        for page_num in range(start, end):
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError("PDF extraction exceeded the configured timeout")
+
+            # Clean and structure the text
+            cleaned_text = self._clean_text(pdf_reader.pages[page_num].extract_text())
+            if cleaned_text.strip():
+                yield (page_num + 1, cleaned_text)
+
+    def _iter_pages_parallel(self, pdf_path: str, workers: int,
+                             deadline: Optional[float] = None) -> Iterator[Tuple[int, str]]:
+        """Extract page ranges in a process pool and yield them in page order"""
+        with open(pdf_path, 'rb') as file:
+            page_count = len(PyPDF2.PdfReader(file).pages)
+
+        # Several contiguous ranges per worker so uneven pages still balance out
+        range_size = max(1, -(-page_count // (workers * 4)))
+        ranges = [(start, min(start + range_size, page_count)) for start in range(0, page_count, range_size)]
+
+        executor = ProcessPoolExecutor(max_workers=min(workers, len(ranges) or 1))
+        try:
+            # Only a couple of ranges per worker are queued ahead of the consumer, so
+            # finished pages do not pile up while earlier ones are still being written
+            pending = []
+            next_range = 0
+            while pending or next_range < len(ranges):
+                while next_range < len(ranges) and len(pending) < workers * 2:
+                    start, end = ranges[next_range]
+                    pending.append(executor.submit(_extract_page_range_worker, pdf_path, start, end))
+                    next_range += 1
+
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                yield from pending.pop(0).result(timeout=remaining)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _join_pages(self, pages: List[Tuple[int, str]]) -> str:
+        """Join cleaned pages into the full text with page markers"""
+        return ''.join(f"\n--- Page {page_num} ---\n{page_text}\n" for page_num, page_text in pages)
     
     def _clean_text(self, text: str) -> str:
         """Clean and structure extracted text"""
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Remove Tamil text (Unicode range U+0B80–U+0BFF)
-        text = re.sub(r'[\u0B80-\u0BFF]+', '', text)
-        
-        # Fix common OCR issues
-        text = text.replace('', '')
-        text = text.replace('\x00', '')
+        # Whitespace is collapsed before characters are dropped, so text either
+        # side of removed Tamil keeps both of its spaces
+        text = WHITESPACE.sub(' ', text).translate(DROPPED_CHARS)
         
-        # Structure the text better
-        # Add line breaks before chapter headings
-        text = re.sub(r'(Chapter \d+|CHAPTER \d+)', r'\n\n\1', text)
-        text = re.sub(r'(Unit \d+|UNIT \d+)', r'\n\n\1', text)
-        
-        return text.strip()
+        # Add line breaks before chapter and unit headings
+        return HEADING_BREAK.sub(r'\n\n\1', text).strip()
     
     def load_textbook_content(self, subject: str, class_level: str = "10") -> Dict[str, Any]:
         """Load and process textbook content"""
         cache_key = f"{subject}_{class_level}"
         
-        if cache_key in self.content_cache:
-            return self.content_cache[cache_key]
+        cached = self.content_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
-        # Map subject to PDF filename
-        pdf_files = {
-            "social": f"tn-class-{class_level}-social-science.pdf",
-            "science": f"tn-class-{class_level}-science.pdf",
-            "mathematics": f"tn-class-{class_level}-mathematics.pdf",
-            "english": f"tn-class-{class_level}-english.pdf",
-            "tamil": f"tn-class-{class_level}-tamil.pdf"
-        }
+        return self.single_flight.do(('content', cache_key), lambda: self._load_and_cache(subject, class_level))
+    
+    def _load_and_cache(self, subject: str, class_level: str) -> Dict[str, Any]:
+        cache_key = f"{subject}_{class_level}"
         
-        pdf_filename = pdf_files.get(subject)
+        # A load that finished between our cache miss and joining the flight
+        cached = self.content_cache.peek(cache_key)
+        if cached is not None:
+            return cached
+        
+        with timed('pdf_load'):
+            textbook_data = self._load_textbook(subject, class_level)
+        
+        # Cache the content
+        if textbook_data.get("success"):
+            self.content_cache[cache_key] = textbook_data
+        
+        return textbook_data
+    
+    def _load_textbook(self, subject: str, class_level: str = "10") -> Dict[str, Any]:
+        """Load a textbook's artifact from disk or build it, without touching the cache"""
+        cache_key = f"{subject}_{class_level}"
+        
+        pdf_filename = PDF_FILES.get(subject)
         if not pdf_filename:
             return {"success": False, "message": "Subject not found"}
         
-        pdf_path = os.path.join("public/textbooks", pdf_filename)
+        pdf_path = os.path.join(self.textbook_dir, pdf_filename.format(class_level=class_level))
         
         if not os.path.exists(pdf_path):
             return {"success": False, "message": "Textbook PDF not found"}
         
-        # Extract text from PDF
-        full_text = self.extract_text_from_pdf(pdf_path)
+        # Prefer the artifact precompiled by `python -m utils.ingest`
+        artifact = TextbookArtifact.load_fresh(self.index_dir, cache_key, pdf_path)
         
-        if not full_text:
-            return {"success": False, "message": "Could not extract text from PDF"}
-        
-        # Structure the content
-        structured_content = self._structure_content(full_text, subject)
+        if artifact is None:
+            # One worker per host extracts the PDF; the others wait, then map its artifact
+            with file_lock(self._lock_path(cache_key), Config.BUILD_LOCK_TIMEOUT):
+                artifact = TextbookArtifact.load_fresh(self.index_dir, cache_key, pdf_path)
+                if artifact is None:
+                    artifact = self._build_artifact(cache_key, pdf_path)
+            
+            if artifact is None:
+                return {"success": False, "message": "Could not extract text from PDF"}
         
-        # Cache the content
-        self.content_cache[cache_key] = {
+        # Chapter text lives once, in the topic index; the full text stays in the artifact buffer
+        return {
             "success": True,
-            "content": structured_content,
-            "full_text": full_text
+            "content": artifact.structured_content(subject),
+            "pdf_path": pdf_path,
+            "pdf_sha256": artifact.sha256,
+            "artifact": artifact
         }
-        
-        return self.content_cache[cache_key]
+    
+    def _build_artifact(self, cache_key: str, pdf_path: str) -> Optional[TextbookArtifact]:
+        """Extract a PDF inline and save its artifact for next time"""
+        try:
+            # Streams page text to disk and serves it memory-mapped
+            return TextbookArtifact.compile(self, pdf_path, self.index_dir, cache_key, timeout=Config.PDF_TIMEOUT)
+        except OSError as e:
+            # Index directory not writable: keep the text in memory instead
+            print(f"Error saving corpus artifact for {cache_key}: {str(e)}")
+            return TextbookArtifact.build(self, pdf_path, timeout=Config.PDF_TIMEOUT)
+    
+    def remove_textbook(self, cache_key: str) -> None:
+        """Stop serving a textbook whose PDF is gone and delete its saved artifact and indexes"""
+        self.embeddings_cache.pop(cache_key, None)
+        self.content_cache.pop(cache_key, None)
+
+        # The corpus artifact and every model's embedding index are named after the book.
+        # Lock and in-progress .tmp files stay so concurrent builders are not disturbed
+        pattern = os.path.join(glob.escape(self.index_dir), f"{glob.escape(cache_key)}.*")
+        for path in glob.glob(pattern):
+            if path.endswith(('.json', '.npy', '.txt')):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    print(f"Error removing {path}: {str(e)}")
+    
+    def _lock_path(self, name: str) -> str:
+        """Lock file that serializes building one artifact or index across worker processes"""
+        return os.path.join(self.index_dir, f"{name}.lock")
     
     def _structure_content(self, text: str, subject: str) -> Dict[str, Any]:
         """Structure the textbook content into chapters and topics"""
         chapters = {}
-        current_chapter = None
-        current_content = []
         
-        lines = text.split('\n')
+        for title, start, end in self._chapter_spans(text):
+            content = _normalize_lines(text[start:end])
+            if content:
+                chapters[title] = {
+                    "title": title,
+                    "content": content,
+                    "topics": self._extract_topics(content)
+                }
         
-        for line in lines:
-            line = line.strip()
+        return compact_structure(subject, chapters)
+
+    def _chapter_spans(self, text: str) -> List[Tuple[str, int, int]]:
+        """Find (heading, body start, body end) character spans for each chapter"""
+        spans = []
+        current_chapter = None
+        body_start = 0
+        position = 0
+
+        for raw_line in text.split('\n'):
+            line_start = position
+            position += len(raw_line) + 1
+            line = raw_line.strip()
             if not line:
                 continue
-            
+
             # Detect chapter headings
-            chapter_match = re.match(r'(Chapter|CHAPTER)\s+(\d+)', line, re.IGNORECASE)
-            if chapter_match:
-                # Save previous chapter
-                if current_chapter and current_content:
-                    chapters[current_chapter] = {
-                        "title": current_chapter,
-                        "content": '\n'.join(current_content),
-                        "topics": self._extract_topics('\n'.join(current_content))
-                    }
-                
-                # Start new chapter
-                current_chapter = line
-                current_content = []
-            else:
+            if is_chapter_heading(line):
                 if current_chapter:
-                    current_content.append(line)
-        
-        # Save last chapter
-        if current_chapter and current_content:
-            chapters[current_chapter] = {
-                "title": current_chapter,
-                "content": '\n'.join(current_content),
-                "topics": self._extract_topics('\n'.join(current_content))
-            }
-        
-        return {
-            "subject": subject,
-            "chapters": chapters,
-            "total_chapters": len(chapters)
-        }
+                    spans.append((current_chapter, body_start, line_start))
+
+                current_chapter = line
+                body_start = min(position, len(text))
+
+        if current_chapter:
+            spans.append((current_chapter, body_start, len(text)))
+
+        return spans
     
     def _extract_topics(self, chapter_content: str) -> List[str]:
         """Extract topics from chapter content"""
         topics = []
         
-        # Look for numbered sections, bold headings, etc.
-        lines = chapter_content.split('\n')
-        
-        for line in lines:
+        # Numbered sections ("1.1", "2.3") and lines that look like headings
+        for line in chapter_content.split('\n'):
             line = line.strip()
-            
-            # Match patterns like "1.1", "2.3", etc.
-            if re.match(r'^\d+\.\d+', line):
+            if is_topic(line):
                 topics.append(line)
-            # Match patterns that look like headings (all caps, or title case)
-            elif len(line) > 10 and len(line) < 100:
-                if line.isupper() or line.istitle():
-                    topics.append(line)
+                if len(topics) == MAX_TOPICS:
+                    break
         
-        return topics[:10]  # Limit to 10 topics per chapter
+        return topics
     
-    def search_content(self, query: str, subject: str, class_level: str = "10") -> str:
-        """Search for relevant content based on query"""
-        # Load textbook content
+    def get_chunk_index(self, subject: str, class_level: str = "10") -> Optional[ChunkIndex]:
+        """Load the chunk embedding index for a textbook, building it on first use"""
+        cache_key = f"{subject}_{class_level}"
+
+        cached = self.embeddings_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        return self.single_flight.do(('index', cache_key), lambda: self._load_and_cache_index(subject, class_level))
+
+    def _load_and_cache_index(self, subject: str, class_level: str) -> Optional[ChunkIndex]:
+        cache_key = f"{subject}_{class_level}"
+
+        cached = self.embeddings_cache.peek(cache_key)
+        if cached is not None:
+            return cached
+
         textbook_data = self.load_textbook_content(subject, class_level)
-        
+
         if not textbook_data.get("success"):
+            return None
+
+        with timed('index_load'):
+            index = self._load_chunk_index(cache_key, textbook_data)
+        self.embeddings_cache[cache_key] = index
+        return index
+
+    def _load_chunk_index(self, cache_key: str, textbook_data: Dict[str, Any]) -> ChunkIndex:
+        """Load a textbook's chunk index from disk or build it, without touching the cache"""
+        pdf_hash = textbook_data.get("pdf_sha256") or file_sha256(textbook_data["pdf_path"])
+        model_id = embedding_model_id(self.model_name)
+        load = lambda: ChunkIndex.load(self.index_dir, cache_key, pdf_hash, model_id, self.chunking,
+                                       dtype=self.retrieval_dtype)
+        index = load()
+
+        if index is None:
+            # Encoding every chunk is the slowest step of a cold start, so it too runs once per host
+            with file_lock(self._lock_path(f"{cache_key}.index"), Config.BUILD_LOCK_TIMEOUT):
+                index = load()
+                if index is None:
+                    index = self._build_chunk_index(cache_key, textbook_data, pdf_hash)
+
+        # Build the inverted index at load time rather than on the first lexical query
+        if Config.SEARCH_MODE != 'dense':
+            index.bm25
+
+        return index
+
+    def _build_chunk_index(self, cache_key: str, textbook_data: Dict[str, Any], pdf_hash: str) -> ChunkIndex:
+        """Chunk and encode a textbook, saving the index for other workers and restarts"""
+        artifact = textbook_data["artifact"]
+        with timed('chunking'):
+            if artifact.chunking == self.chunking:
+                chunks, page_spans, chapters = artifact.chunks()
+            else:
+                chunks, page_spans, chapters = self._split_into_chunks(artifact.full_text)
+        with timed('chunk_encode'):
+            index = ChunkIndex.build(chunks, page_spans, chapters, self.model, embedding_model_id(self.model_name),
+                                     pdf_hash, self.chunking, dtype=self.retrieval_dtype)
+        try:
+            index.save(self.index_dir, cache_key)
+        except OSError as e:
+            print(f"Error saving chunk index for {cache_key}: {str(e)}")
+        return index
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Memory use and hit counts of the content and chunk index caches"""
+        return {
+            "content_cache": self.content_cache.stats(),
+            "index_cache": self.embeddings_cache.stats()
+        }
+
+    def encode_query(self, query: str) -> np.ndarray:
+        """Encode a query into a normalized embedding"""
+        # Concurrent queries share one batched model call when batching is enabled
+        batcher = get_query_batcher()
+        with timed('query_encode'):
+            if batcher is not None and batcher.model_name == self.model_name:
+                return batcher.encode(query)
+            return normalize_embeddings(self.model.encode([query]))[0]
+
+    def search_content(self, query: str, subject: str, class_level: str = "10",
+                       query_embedding: Optional[np.ndarray] = None, top_k: Optional[int] = None,
+                       threshold: Optional[float] = None, mode: Optional[str] = None,
+                       token_budget: Optional[int] = None) -> str:
+        """Search for relevant content based on query"""
+        index = self.get_chunk_index(subject, class_level)
+
+        if index is None or not len(index):
             return ""
-        
-        full_text = textbook_data.get("full_text", "")
-        
-        # Split text into chunks for better search
-        chunks = self._split_into_chunks(full_text, chunk_size=500)
-        
-        if not chunks:
-            return ""
-        
-        # Create embeddings for query and chunks
-        query_embedding = self.model.encode([query])
-        chunk_embeddings = self.model.encode(chunks)
-        
-        # Calculate similarities
-        similarities = cosine_similarity(query_embedding, chunk_embeddings)[0]
-        
-        # Get top 3 most relevant chunks
-        top_indices = np.argsort(similarities)[-3:][::-1]
-        
-        relevant_content = []
-        for idx in top_indices:
-            if similarities[idx] > 0.3:  # Threshold for relevance
-                relevant_content.append(chunks[idx])
-        
-        return '\n\n'.join(relevant_content)
-    
-    def _split_into_chunks(self, text: str, chunk_size: int = 500) -> List[str]:
-        """Split text into chunks for processing"""
-        words = text.split()
+
+        mode = mode or Config.SEARCH_MODE
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+
+        # One query encode plus one matrix-vector product against the prebuilt index
+        if query_embedding is None and mode != 'bm25':
+            query_embedding = self.encode_query(query)
+
+        # Best chunks above the relevance threshold
+        with timed('similarity'):
+            matches = index.search(
+                query_embedding,
+                top_k=top_k or Config.RETRIEVAL_TOP_K,
+                threshold=Config.RETRIEVAL_THRESHOLD if threshold is None else threshold,
+                query_text=query,
+                mode=mode,
+                candidates=Config.SEARCH_CANDIDATES
+            )
+        relevant_content = [index.chunk_record(*match) for match in matches]
+
+        # Best chunks first, each labelled with its chapter and pages, cut off at the token budget
+        with timed('context_assembly'):
+            return assemble_context(relevant_content, token_budget or Config.CONTEXT_TOKEN_BUDGET)
+
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Encode several queries into normalized embeddings with one model call"""
+        with timed('query_encode'):
+            return normalize_embeddings(self.model.encode(queries, batch_size=len(queries), show_progress_bar=False))
+
+    def search_content_batch(self, queries: List[str], subject: str, class_level: str = "10",
+                             query_embeddings: Optional[np.ndarray] = None, top_k: Optional[int] = None,
+                             threshold: Optional[float] = None, mode: Optional[str] = None,
+                             token_budget: Optional[int] = None) -> List[str]:
+        """search_content for many queries against one book: one encode and one scoring pass"""
+        if not queries:
+            return []
+
+        index = self.get_chunk_index(subject, class_level)
+
+        if index is None or not len(index):
+            return ["" for _ in queries]
+
+        mode = mode or Config.SEARCH_MODE
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+
+        if query_embeddings is None and mode != 'bm25':
+            query_embeddings = self.encode_queries(queries)
+
+        with timed('similarity'):
+            rankings = index.search_many(
+                query_embeddings,
+                queries,
+                top_k=top_k or Config.RETRIEVAL_TOP_K,
+                threshold=Config.RETRIEVAL_THRESHOLD if threshold is None else threshold,
+                mode=mode,
+                candidates=Config.SEARCH_CANDIDATES
+            )
+
+        with timed('context_assembly'):
+            return [assemble_context([index.chunk_record(*match) for match in ranking],
+                                     token_budget or Config.CONTEXT_TOKEN_BUDGET)
+                    for ranking in rankings]
+
+    def search_shards(self, query: str, shards: Optional[List[Tuple[str, str]]] = None,
+                      top_k: Optional[int] = None, threshold: Optional[float] = None,
+                      mode: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Search several books at once and merge their best chunks into one ranking.
+
+        Each (subject, class level) book is a shard searched on its own thread; the
+        query is encoded once. Results carry subject, class and book attribution.
+        Dense and shortlist results merge on cosine similarity. Hybrid fuses ranks
+        once, over the dense and BM25 candidates of all books together, because a
+        per-book fusion scores every book's best chunk alike however relevant it is;
+        its results keep the cosine similarity as "score" and add "rrf_score".
+        BM25 scores use each book's own term statistics, so bm25 merges approximately.
+        """
+        if shards is None:
+            shards = self.available_shards()
+        if not shards:
+            return []
+
+        mode = mode or Config.SEARCH_MODE
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+
+        top_k = top_k or Config.RETRIEVAL_TOP_K
+        threshold = Config.RETRIEVAL_THRESHOLD if threshold is None else threshold
+        query_embedding = None if mode == 'bm25' else self.encode_query(query)
+        search = lambda shard: self._search_shard(shard[0], shard[1], query, query_embedding, top_k, threshold, mode)
+
+        # Scoring is NumPy work that releases the GIL, so books are scored side by side
+        with timed('shard_search'):
+            if len(shards) == 1:
+                results = [search(shards[0])]
+            else:
+                results = list(self._get_shard_executor().map(search, shards))
+
+        # Each shard returned its own top candidates per ranking, so the global ones are among them
+        merged = []
+        for ranking in range(2 if mode == 'hybrid' else 1):
+            candidates = [((shard, idx), score) for shard, (_, rankings, _) in enumerate(results) if rankings
+                          for idx, score in rankings[ranking]]
+            merged.append(heapq.nlargest(Config.SEARCH_CANDIDATES if mode == 'hybrid' else top_k,
+                                         candidates, key=lambda candidate: candidate[1]))
+
+        if mode != 'hybrid':
+            return [self._shard_record(shards[shard], results[shard][0], idx, score)
+                    for (shard, idx), score in merged[0]]
+
+        # "score" stays the cosine similarity, as in every other mode; the fused value is separate
+        return [self._shard_record(shards[shard], results[shard][0], idx, results[shard][2][idx], fused)
+                for (shard, idx), fused in reciprocal_rank_fusion(merged, top_k)]
+
+    def available_shards(self, subjects: Optional[List[str]] = None,
+                         class_levels: Optional[List[str]] = None) -> List[Tuple[str, str]]:
+        """(subject, class level) of every textbook on disk, optionally filtered"""
+        return [(subject, class_level) for subject, class_level, _ in discover_textbooks(self.textbook_dir)
+                if (not subjects or subject in subjects) and (not class_levels or class_level in class_levels)]
+
+    def _search_shard(self, subject: str, class_level: str, query: str, query_embedding: Optional[np.ndarray],
+                      top_k: int, threshold: float,
+                      mode: str) -> Tuple[Optional[ChunkIndex], List[List[Tuple[int, float]]], Dict[int, float]]:
+        """One book's index, ranked (chunk, score) lists and candidate similarities; a failed book contributes none.
+
+        Hybrid returns the dense and BM25 candidate lists unfused, for search_shards to fuse
+        across books, with BM25 hits below the dense threshold already dropped; every other
+        mode returns its single top-k ranking and no similarities.
+        """
+        try:
+            index = self.get_chunk_index(subject, class_level)
+            if index is None or not len(index):
+                return None, [], {}
+
+            if mode == 'hybrid':
+                dense = index.search_batch(query_embedding[None, :], Config.SEARCH_CANDIDATES, threshold)[0]
+                lexical, similarity = lexical_floor(index.retriever, query_embedding, dense,
+                                                    index.bm25.search(query, Config.SEARCH_CANDIDATES), threshold)
+                return index, [dense, lexical], similarity
+
+            return index, [index.search(query_embedding, top_k=top_k, threshold=threshold, query_text=query,
+                                        mode=mode, candidates=Config.SEARCH_CANDIDATES)], {}
+        except Exception as e:
+            print(f"Error searching {subject}_{class_level}: {str(e)}")
+            return None, [], {}
+
+    @staticmethod
+    def _shard_record(shard: Tuple[str, str], index: ChunkIndex, idx: int, score: float,
+                      rrf_score: Optional[float] = None) -> Dict[str, Any]:
+        """A chunk record attributed to its book"""
+        subject, class_level = shard
+        book = f"Class {class_level} {subject.title()}"
+        return {**index.chunk_record(idx, score, rrf_score), "subject": subject, "class": class_level, "book": book}
+
+    def _get_shard_executor(self) -> ThreadPoolExecutor:
+        # Threads do not survive fork, so each worker process creates its own pool
+        if self._shard_executor is None or self._shard_executor_pid != os.getpid():
+            with self._shard_lock:
+                if self._shard_executor is None or self._shard_executor_pid != os.getpid():
+                    self._shard_executor = ThreadPoolExecutor(max_workers=self.shard_workers,
+                                                              thread_name_prefix='shard-search')
+                    self._shard_executor_pid = os.getpid()
+        return self._shard_executor
+
+    def _split_into_chunks(self, text: str) -> Tuple[List[str], List[Tuple[int, int]], List[Optional[str]]]:
+        """Split text into overlapping sentence chunks with their pages and chapters"""
         chunks = []
-        
-        for i in range(0, len(words), chunk_size):
-            chunk = ' '.join(words[i:i + chunk_size])
-            if chunk.strip():
-                chunks.append(chunk)
-        
-        return chunks
+        page_spans = []
+        chapters = []
+
+        for start, end, first_page, last_page, chapter in self._chunk_spans(text):
+            chunks.append(chunk_text(text, start, end))
+            page_spans.append((first_page, last_page))
+            chapters.append(chapter)
+
+        return chunks, page_spans, chapters
+
+    def _chunk_spans(self, text: str) -> List[Tuple[int, int, int, int, Optional[str]]]:
+        """Character (start, end, first page, last page, chapter) spans for _split_into_chunks"""
+        return chunk_spans(text, self.chunk_words, self.chunk_overlap)
     
-    def get_topic_content(self, subject: str, topic: str) -> str:
+    def get_topic_content(self, subject: str, topic: str, class_level: str = "10") -> str:
         """Get content for a specific topic"""
-        textbook_data = self.load_textbook_content(subject)
+        textbook_data = self.load_textbook_content(subject, class_level)
         
         if not textbook_data.get("success"):
             return ""
         
-        chapters = textbook_data["content"]["chapters"]
-        
-        # Search for topic in all chapters
-        for chapter_name, chapter_data in chapters.items():
-            content = chapter_data["content"]
-            if topic.lower() in content.lower():
-                # Extract relevant section
-                lines = content.split('\n')
-                relevant_lines = []
-                found_topic = False
-                
-                for line in lines:
-                    if topic.lower() in line.lower():
-                        found_topic = True
-                    
-                    if found_topic:
-                        relevant_lines.append(line)
-                        
-                        # Stop at next major heading or after 20 lines
-                        if len(relevant_lines) > 20 or (len(relevant_lines) > 5 and re.match(r'^\d+\.\d+', line)):
-                            break
-                
-                return '\n'.join(relevant_lines)
-        
-        return ""
+        # Heading dict hit or one substring search over the prebuilt lowercase buffer
+        return textbook_data["content"]["topic_index"].lookup(topic)
     
     def get_chapter_structure(self, subject: str, class_level: str = "10") -> Dict[str, Any]:
         """Get the structure of chapters and topics"""
@@ -261,3 +622,16 @@ class PDFProcessor:
             "class": class_level,
             "chapters": structure
         }
+
+
+def _textbook_nbytes(textbook_data: Dict[str, Any]) -> int:
+    """Approximate memory of a content cache entry"""
+    content = textbook_data["content"]
+    return (content["topic_index"].nbytes + deep_sizeof(content["chapters"])
+            + textbook_data["artifact"].nbytes)
+
+
+def _extract_page_range_worker(pdf_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Process pool entry point: reopen the PDF and extract one page range"""
+    with open(pdf_path, 'rb') as file:
+        return PDFProcessor()._extract_page_range(PyPDF2.PdfReader(file), start, end)
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import List, Dict, Any, Optional
+
+from config import Config
+from .answer_cache import normalize_question
+
+OPTION_LETTERS = "ABCD"
+
+
+def parse_quiz_questions(raw: str) -> List[Dict[str, Any]]:
+    """Parse an LLM quiz response into validated question records"""
+    text = re.sub(r'^```(?:json)?|```$', '', raw.strip(), flags=re.MULTILINE).strip()
+
+    try:
+        data = json.loads(text)
+    except ValueError:
+        # Fall back to the outermost JSON array in the response
+        start, end = text.find('['), text.rfind(']')
+        if start == -1 or end <= start:
+            return []
+        try:
+            data = json.loads(text[start:end + 1])
+        except ValueError:
+            return []
+
+    if isinstance(data, dict):
+        data = data.get("questions", [])
+    if not isinstance(data, list):
+        return []
+
+    questions = []
+    for item in data:
+        question = validate_question(item)
+        if question is not None:
+            questions.append(question)
+
+    return questions
+
+
+def validate_question(item: Any) -> Optional[Dict[str, Any]]:
+    """Normalize one multiple choice question, or return None if it is unusable"""
+    if not isinstance(item, dict):
+        return None
+
+    question = str(item.get("question", "")).strip()
+    options = item.get("options")
+    if not question or not isinstance(options, list) or len(options) != 4:
+        return None
+
+    options = [str(option).strip() for option in options]
+    if not all(options):
+        return None
+
+    answer = item.get("correct_answer")
+    if isinstance(answer, str):
+        answer = answer.strip()
+        if answer.isdigit():
+            answer = int(answer)
+        elif len(answer) == 1 and answer.upper() in OPTION_LETTERS:
+            answer = OPTION_LETTERS.index(answer.upper())
+        elif answer in options:
+            answer = options.index(answer)
+
+    if isinstance(answer, bool) or not isinstance(answer, int) or not 0 <= answer < len(options):
+        return None
+
+    return {
+        "question": question,
+        "options": options,
+        "correct_answer": answer,
+        "explanation": str(item.get("explanation", "")).strip(),
+        "page_reference": str(item.get("page_reference", "")).strip()
+    }
+
+
+class QuizBank:
+    """Validated quiz questions stored per (subject, topic) in a SQLite file shared by workers"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections must not be used across fork(), so each worker process
+        # opens its own on first use; callers hold self._lock
+        if self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            with conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS questions ("
+                    "topic TEXT, question_hash TEXT, record TEXT, "
+                    "PRIMARY KEY (topic, question_hash))"
+                )
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    @staticmethod
+    def _topic_key(subject: str, topic: str, class_level: str) -> str:
+        return f"{subject}_{class_level}:{normalize_question(topic)}"
+
+    def count(self, subject: str, topic: str, class_level: str = "10") -> int:
+        with self._lock:
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM questions WHERE topic = ?", (self._topic_key(subject, topic, class_level),)
+            ).fetchone()[0]
+
+    def add(self, subject: str, topic: str, questions: List[Dict[str, Any]], class_level: str = "10") -> int:
+        """Store questions, skipping duplicates; returns how many were new"""
+        topic_key = self._topic_key(subject, topic, class_level)
+        rows = [
+            (topic_key, hashlib.sha1(normalize_question(q["question"]).encode('utf-8')).hexdigest(),
+             json.dumps(q, ensure_ascii=False))
+            for q in questions
+        ]
+
+        with self._lock, self._connection() as conn:
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO questions VALUES (?, ?, ?)", rows)
+            return conn.total_changes - before
+
+    def sample(self, subject: str, topic: str, count: int, class_level: str = "10") -> List[Dict[str, Any]]:
+        """Pick up to count distinct questions at random"""
+        # SQLite treats a negative LIMIT as no limit at all
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT record FROM questions WHERE topic = ? ORDER BY RANDOM() LIMIT ?",
+                (self._topic_key(subject, topic, class_level), max(count, 0))
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def invalidate(self, subject: str, class_level: str) -> None:
+        """Drop every question for one textbook, e.g. after its PDF was replaced"""
+        prefix = f"{subject}_{class_level}:"
+        with self._lock, self._connection() as conn:
+            conn.execute("DELETE FROM questions WHERE substr(topic, 1, ?) = ?", (len(prefix), prefix))
+
+    def clear(self) -> None:
+        with self._lock, self._connection() as conn:
+            conn.execute("DELETE FROM questions")
+
+
+def create_quiz_bank() -> Optional[QuizBank]:
+    """Open the question bank configured in Config, or None if it is disabled"""
+    if not Config.QUIZ_BANK_PATH:
+        return None
+    return QuizBank(Config.QUIZ_BANK_PATH)
@@ -0,0 +1,128 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+RETRIEVAL_DTYPES = ('float32', 'float16', 'int8')
+SEARCH_MODES = ('dense', 'bm25', 'hybrid', 'shortlist')
+
+# Reciprocal rank fusion constant from Cormack et al.; dampens the weight of top ranks
+RRF_K = 60
+
+
+def top_k_indices(scores: np.ndarray, k: int, threshold: float) -> List[Tuple[int, float]]:
+    """Top-k (index, score) pairs above threshold, best first, without sorting every score"""
+    n = scores.shape[0]
+    if n == 0 or k <= 0:
+        return []
+
+    if k < n:
+        candidates = np.argpartition(scores, n - k)[n - k:]
+    else:
+        candidates = np.arange(n)
+
+    candidates = candidates[scores[candidates] > threshold]
+    ordered = candidates[np.argsort(scores[candidates])[::-1]]
+
+    return [(int(idx), float(scores[idx])) for idx in ordered]
+
+
+class DenseRetriever:
+    """Dot-product scoring over a pre-normalized embedding matrix, optionally quantized"""
+
+    # Quantized matrices are widened to float32 this many rows at a time
+    BLOCK_ROWS = 8192
+
+    def __init__(self, embeddings: np.ndarray, dtype: str = 'float32'):
+        if dtype not in RETRIEVAL_DTYPES:
+            raise ValueError(f"Unsupported retrieval dtype: {dtype}")
+
+        self.dtype = dtype
+        self.scales = None
+
+        if dtype == 'float32':
+            # Keeps a memory-mapped float32 matrix mapped instead of copying it
+            self.matrix = embeddings if embeddings.dtype == np.float32 else embeddings.astype(np.float32)
+        elif dtype == 'float16':
+            self.matrix = np.asarray(embeddings, dtype=np.float16)
+        else:
+            # Symmetric per-row int8 quantization
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+            scales = np.abs(embeddings).max(axis=1) / 127.0 if len(embeddings) else np.zeros(0, np.float32)
+            scales[scales == 0] = 1.0
+            self.matrix = np.round(embeddings / scales[:, None]).astype(np.int8)
+            self.scales = scales.astype(np.float32)
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def score(self, queries: np.ndarray) -> np.ndarray:
+        """Cosine similarities of normalized queries (q, d) against every row: (q, n)"""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+
+        if self.dtype == 'float32':
+            if queries.shape[0] == 1:
+                return (self.matrix @ queries[0])[None, :]
+            return queries @ self.matrix.T
+
+        scores = np.empty((queries.shape[0], len(self)), dtype=np.float32)
+        for start in range(0, len(self), self.BLOCK_ROWS):
+            end = min(start + self.BLOCK_ROWS, len(self))
+            block = queries @ self.matrix[start:end].astype(np.float32).T
+            if self.scales is not None:
+                block *= self.scales[start:end]
+            scores[:, start:end] = block
+
+        return scores
+
+    def score_rows(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Cosine similarities of one normalized query against a subset of rows"""
+        block = self.matrix[rows]
+        if self.dtype == 'float32':
+            return block @ np.asarray(query, dtype=np.float32)
+
+        scores = block.astype(np.float32) @ np.asarray(query, dtype=np.float32)
+        if self.scales is not None:
+            scores *= self.scales[rows]
+        return scores
+
+    def search(self, queries: np.ndarray, k: int = 3, threshold: float = 0.3) -> List[List[Tuple[int, float]]]:
+        """Top-k matches for each query in one scoring pass"""
+        return [top_k_indices(row, k, threshold) for row in self.score(queries)]
+
+
+def reciprocal_rank_fusion(rankings: List[List[Tuple[int, float]]], k: int) -> List[Tuple[int, float]]:
+    """Fuse ranked (index, score) lists into the top-k by reciprocal rank"""
+    fused = {}
+    for ranking in rankings:
+        for rank, (idx, _) in enumerate(ranking):
+            fused[idx] = fused.get(idx, 0.0) + 1.0 / (RRF_K + rank + 1)
+
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def lexical_floor(retriever: DenseRetriever, query: np.ndarray, dense: List[Tuple[int, float]],
+                  lexical: List[Tuple[int, float]], threshold: float) -> Tuple[List[Tuple[int, float]], Dict[int, float]]:
+    """BM25 hits whose cosine similarity also clears threshold, and the similarity of every hybrid candidate.
+
+    Without this floor a chunk sharing one word with the query would be fused into the results.
+    """
+    similarity = dict(dense)
+    rows = np.fromiter((idx for idx, _ in lexical if idx not in similarity), dtype=np.int64)
+    if len(rows):
+        similarity.update(zip(rows.tolist(), retriever.score_rows(query, rows).tolist()))
+    return [(idx, score) for idx, score in lexical if similarity[idx] > threshold], similarity
+
+
+def shortlist_search(retriever: DenseRetriever, candidates: List[Tuple[int, float]], query: np.ndarray,
+                     k: int, threshold: float) -> Optional[List[Tuple[int, float]]]:
+    """Dense re-scoring of lexical candidates only; None if there are too few to choose from"""
+    if len(candidates) < k:
+        return None
+
+    rows = np.fromiter((idx for idx, _ in candidates), dtype=np.int64, count=len(candidates))
+    scores = retriever.score_rows(query, rows)
+    return [(int(rows[pos]), score) for pos, score in top_k_indices(scores, k, threshold)]
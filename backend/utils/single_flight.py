@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator
+
+try:
+    import fcntl
+except ImportError:
+    # No flock on Windows: each worker process builds its own copy
+    fcntl = None
+
+from .metrics import timed
+
+
+class SingleFlight:
+    """Runs one call per key at a time; concurrent callers with the same key share its result"""
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            future.set_result(func())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+        return future.result()
+
+    def stats(self) -> Dict[str, int]:
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._inflight)}
+
+
+@contextmanager
+def file_lock(path: str, timeout: float) -> Iterator[bool]:
+    """Hold an exclusive lock on path across processes; yields False if it could not be taken in time"""
+    if fcntl is None or timeout <= 0:
+        yield False
+        return
+
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        file = open(path, 'a')
+    except OSError as e:
+        # Unwritable index directory: artifacts are built in memory anyway, so go without the lock
+        print(f"Error opening {path}: {str(e)}, building without it")
+        yield False
+        return
+
+    with file:
+        acquired = False
+        deadline = time.monotonic() + timeout
+
+        # Polled rather than blocking so a stuck holder cannot hang requests forever
+        with timed('build_lock_wait'):
+            while True:
+                try:
+                    fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    acquired = True
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        print(f"Error acquiring {path}: still held after {timeout}s, building without it")
+                        break
+                    time.sleep(0.05)
+
+        try:
+            yield acquired
+        finally:
+            # The kernel also drops the lock if this process dies while holding it
+            if acquired:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
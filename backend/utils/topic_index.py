@@ -0,0 +1,146 @@
+import re
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import List, Dict, Any, Optional, Tuple
+
+SECTION_HEADING = re.compile(r'^\d+\.\d+')
+
+# A topic section runs for at most this many lines after its first line...
+MAX_SECTION_LINES = 20
+# ...and ends early at a numbered heading once it has at least this many
+MIN_SECTION_LINES = 5
+
+
+class TopicIndex:
+    """One text buffer for a textbook's chapters, with line and heading offsets for fast topic lookups"""
+
+    def __init__(self, chapters: Dict[str, Dict[str, Any]]):
+        texts = []
+        topics = []
+        # Character (start, end) of each chapter's content inside self.text
+        self.chapter_spans: Dict[str, Tuple[int, int]] = {}
+        # Cumulative line counts: one past the last line of each chapter
+        self.chapter_line_ends = array('q')
+        position = 0
+        line_count = 0
+
+        for title, chapter_data in chapters.items():
+            content = chapter_data["content"]
+            texts.append(content)
+            self.chapter_spans[title] = (position, position + len(content))
+            position += len(content) + 1
+            line_count += content.count('\n') + 1
+            self.chapter_line_ends.append(line_count)
+            topics.extend(chapter_data.get("topics", []))
+
+        self.text = '\n'.join(texts)
+        self.line_count = line_count
+        lines = self.text.split('\n') if line_count else []
+
+        # Line start offsets, plus a sentinel one past the final line
+        self.line_starts = _line_starts(lines)
+
+        # Lowercasing can change the length of a few characters, so the lowercase
+        # buffer keeps its own line offsets when that happens
+        self.lower = self.text.lower()
+        if len(self.lower) == len(self.text):
+            self.lower_starts = self.line_starts
+        else:
+            self.lower_starts = _line_starts(self.lower.split('\n') if line_count else [])
+
+        self.section_starts = array('q', (i for i, line in enumerate(lines) if SECTION_HEADING.match(line)))
+
+        # Headings and extracted topics resolve to their first occurrence with a dict hit
+        self.headings: Dict[str, Optional[int]] = {}
+        for heading in topics + [lines[i] for i in self.section_starts]:
+            key = heading.lower()
+            if key not in self.headings:
+                self.headings[key] = self._find_line(key)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the buffers and offset tables"""
+        size = sys.getsizeof(self.text) + sys.getsizeof(self.headings)
+        if self.lower is not self.text:
+            size += sys.getsizeof(self.lower)
+        offsets = [self.line_starts, self.section_starts, self.chapter_line_ends]
+        if self.lower_starts is not self.line_starts:
+            offsets.append(self.lower_starts)
+        size += sum(table.buffer_info()[1] * table.itemsize for table in offsets)
+        size += sum(sys.getsizeof(key) for key in self.headings)
+        return size
+
+    def chapter_text(self, title: str) -> str:
+        """Normalized content of one chapter"""
+        span = self.chapter_spans.get(title)
+        if span is None:
+            return ""
+        return self.text[span[0]:span[1]]
+
+    def _lines(self, first: int, last: int) -> str:
+        """Lines first..last inclusive, joined by newlines"""
+        return self.text[self.line_starts[first]:self.line_starts[last + 1] - 1]
+
+    def _find_line(self, key: str) -> Optional[int]:
+        """Index of the first line containing key, or None"""
+        if not self.line_count or '\n' in key:
+            return None
+        position = self.lower.find(key)
+        if position < 0:
+            return None
+        return bisect_right(self.lower_starts, position) - 1
+
+    def section(self, start: int) -> str:
+        """Slice from a topic's first line to the next numbered heading, within its chapter"""
+        chapter_end = self.chapter_line_ends[bisect_right(self.chapter_line_ends, start)]
+        last = min(start + MAX_SECTION_LINES, chapter_end - 1)
+
+        heading = bisect_left(self.section_starts, start + MIN_SECTION_LINES)
+        if heading < len(self.section_starts):
+            last = min(last, self.section_starts[heading])
+
+        return self._lines(start, last)
+
+    def lookup(self, topic: str) -> str:
+        """Content for a topic: the section starting at its first mention"""
+        key = topic.lower()
+
+        if key in self.headings:
+            start = self.headings[key]
+        else:
+            start = self._find_line(key)
+
+        if start is None:
+            return ""
+        return self.section(start)
+
+
+def _line_starts(lines: List[str]) -> array:
+    """Start offset of each line in the newline-joined text, plus a trailing sentinel"""
+    starts = array('q')
+    position = 0
+    for line in lines:
+        starts.append(position)
+        position += len(line) + 1
+    starts.append(position)
+    return starts
+
+
+def compact_structure(subject: str, chapters: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Structured content whose chapter text lives only in the TopicIndex buffer"""
+    topic_index = TopicIndex(chapters)
+
+    return {
+        "subject": subject,
+        "chapters": {
+            title: {
+                "title": chapter_data["title"],
+                "topics": chapter_data["topics"],
+                "span": topic_index.chapter_spans[title]
+            }
+            for title, chapter_data in chapters.items()
+        },
+        "total_chapters": len(chapters),
+        "topic_index": topic_index
+    }